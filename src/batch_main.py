@@ -0,0 +1,34 @@
+import argparse
+import logging
+from typing import Optional
+
+from lib.batch.manifest import load_manifest
+from lib.batch.runner import run_batch
+from lib.batch.sink import DirectoryResultSink
+from lib.logger.logger import initialize_logger
+from lib.model.enum.stage import Stage
+
+logger: Optional[logging.Logger] = None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Analyze every portfolio of a batch manifest.')
+    parser.add_argument('manifest', help='JSON manifest of portfolios, see lib.batch.manifest.load_manifest')
+    parser.add_argument('output_dir', help='Directory receiving one sub-directory of results per portfolio')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--memory-limit-mb', type=int, default=None,
+                        help='Peak resident memory of a worker above which it is replaced, see run_batch')
+    args = parser.parse_args()
+
+    portfolios = load_manifest(args.manifest)
+    logger.info("Begin batch analysis of %d portfolios.", len(portfolios))
+    report = run_batch(portfolios, DirectoryResultSink(args.output_dir), max_workers=args.workers,
+                       memory_limit_mb=args.memory_limit_mb)
+    for portfolio_id, error in report.failed.items():
+        logger.error("%s: %s", portfolio_id, error)
+    logger.info("Throughput: %.1f portfolios/min.", report.items_per_minute)
+
+
+if __name__ == "__main__":
+    logger = initialize_logger(Stage.PROD, structured=True)
+    main()
@@ -0,0 +1,70 @@
+"""
+Compare the pandas and Polars backends side by side, from the raw CSV export to MetricsResult.
+
+    cd src && python -m benchmarks.bench_backends --trades 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable
+
+from benchmarks.synthetic_ledger import synthetic_holdings, synthetic_ledger, write_questrade_export
+from lib.ingestion.ingest_transaction import ingest_transaction
+from lib.logger.logger import initialize_logger
+from lib.metric_processor.capital_gain import CapitalGainProcessor
+from lib.metric_processor.dividend import DividendProcessor
+from lib.metric_processor.processor import process_metrics
+from lib.model.enum.account_category import AccountCategory
+from lib.model.enum.backend import Backend
+from lib.model.enum.stage import Stage
+
+
+def _time(function: Callable[[], object]) -> float:
+    begin = time.perf_counter()
+    function()
+    return time.perf_counter() - begin
+
+
+def _ingest(filepath: str, backend: Backend):
+    ledger = ingest_transaction(filepath, backend=backend)
+    return ledger.collect() if backend == Backend.POLARS else ledger  # the Polars scan is lazy
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--trades', type=int, default=20000)
+    args = parser.parse_args()
+
+    initialize_logger(Stage.PROD)
+    holdings_df = synthetic_holdings()
+    holdings_date = datetime(2023, 12, 31)
+    start, end = datetime(2024, 1, 1), datetime(2024, 12, 31)
+
+    with tempfile.TemporaryDirectory() as directory:
+        filepath = os.path.join(directory, 'transactions.csv')
+        write_questrade_export(synthetic_ledger(args.trades), filepath)
+
+        timings = {}
+        for backend in Backend:
+            ledger = _ingest(filepath, backend)
+            timings[backend] = {
+                'ingest_transaction': _time(lambda: _ingest(filepath, backend)),
+                'CapitalGainProcessor': _time(lambda: CapitalGainProcessor(holdings_df, holdings_date).process(
+                    ledger, start, end, AccountCategory.MARGIN)),
+                'DividendProcessor': _time(lambda: DividendProcessor(holdings_df).process(
+                    ledger, start, end, AccountCategory.MARGIN)),
+                'process_metrics (CSV to result)': _time(lambda: process_metrics(
+                    ingest_transaction(filepath, backend=backend), holdings_df, holdings_date, start, end)),
+            }
+
+    print(f"{args.trades} transactions")
+    print(f"{'':32} {'pandas':>10} {'polars':>10}")
+    for stage in timings[Backend.PANDAS]:
+        pandas_seconds, polars_seconds = timings[Backend.PANDAS][stage], timings[Backend.POLARS][stage]
+        print(f"{stage:32} {pandas_seconds:9.3f}s {polars_seconds:9.3f}s ({pandas_seconds / polars_seconds:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Compare one `process_metrics_windows` sweep with separate `process_metrics` calls per window.
+
+    cd src && python -m benchmarks.bench_metric_windows --trades 2000
+"""
+import argparse
+import time
+from datetime import datetime
+
+from benchmarks.synthetic_ledger import synthetic_holdings, synthetic_ledger
+from lib.logger.logger import initialize_logger
+from lib.metric_processor.processor import process_metrics
+from lib.metric_processor.window import calendar_windows, process_metrics_windows, trailing_twelve_months, \
+    year_to_date
+from lib.model.enum.stage import Stage
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--trades', type=int, default=2000)
+    args = parser.parse_args()
+
+    initialize_logger(Stage.PROD)
+    txn_df = synthetic_ledger(args.trades)
+    holdings_df = synthetic_holdings()
+    holdings_date = datetime(2023, 12, 31)
+    start, end = datetime(2024, 1, 1), datetime(2024, 12, 31)
+    windows = (calendar_windows(start, end, 'M') + calendar_windows(start, end, 'Q')
+               + calendar_windows(start, end, 'Y') + [year_to_date(end), trailing_twelve_months(end)])
+
+    begin = time.perf_counter()
+    process_metrics_windows(txn_df, holdings_df, holdings_date, windows=windows)
+    cube_seconds = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    for window in windows:
+        process_metrics(txn_df, holdings_df, holdings_date, window.start, window.end)
+    separate_seconds = time.perf_counter() - begin
+
+    print(f"{len(windows)} windows over {args.trades} transactions")
+    print(f"process_metrics_windows: {cube_seconds:8.3f}s")
+    print(f"process_metrics x {len(windows)}:   {separate_seconds:8.3f}s ({separate_seconds / cube_seconds:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Throughput of the static report export: quarterly reports of many synthetic portfolios, rendered
+cold and then again with a warm figure cache.
+
+    cd src && python -m benchmarks.bench_reports --portfolios 50 --trades 2000
+"""
+import argparse
+import json
+import os
+import tempfile
+
+from benchmarks.synthetic_ledger import SYMBOLS, synthetic_ledger, write_questrade_export
+from lib.batch.manifest import load_manifest
+from lib.logger.logger import initialize_logger
+from lib.metric_processor.window import calendar_windows
+from lib.model.enum.stage import Stage
+from lib.report.export import export_reports, report_tasks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--portfolios', type=int, default=50)
+    parser.add_argument('--trades', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    initialize_logger(Stage.PROD)
+    with tempfile.TemporaryDirectory() as directory:
+        statements = os.path.join(directory, 'statements')
+        os.makedirs(statements)
+        for account in ['margin', 'tfsa']:
+            with open(os.path.join(statements, f'{account}-20231231.csv'), 'w') as f:
+                f.write('Symbol,Description,Quantity,AverageCost\n')
+                f.writelines(f'{symbol},{symbol},10000,100\n' for symbol in SYMBOLS)
+
+        manifest = []
+        for i in range(args.portfolios):
+            write_questrade_export(synthetic_ledger(args.trades, seed=i), os.path.join(directory, f'{i}.csv'))
+            manifest.append({'portfolio_id': f'portfolio-{i}', 'transaction_files': [f'{i}.csv'],
+                             'statements_filepath': 'statements', 'baseline_date': '2023-12-31'})
+        manifest_filepath = os.path.join(directory, 'manifest.json')
+        with open(manifest_filepath, 'w') as f:
+            json.dump(manifest, f)
+
+        tasks = report_tasks(load_manifest(manifest_filepath), calendar_windows('2024-01-01', '2024-12-31', 'Q'))
+        output_dir = os.path.join(directory, 'reports')
+        for run in ['cold', 'warm figure cache']:
+            report = export_reports(tasks, output_dir, max_workers=args.workers)
+            print(f'{run:<20} {report.succeeded}/{report.total} reports in {report.elapsed_seconds:6.1f}s '
+                  f'({report.items_per_minute:,.0f} reports/min)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from lib.model.enum.account_category import AccountCategory
+
+SYMBOLS = ['AAPL', 'AMD', 'AMZN', 'GOOG', 'JPM', 'MSFT', 'NVDA', 'TSLA']
+
+
+def synthetic_ledger(n_trades: int, start_date: str = '2024-01-01', days: int = 365,
+                     seed: int = 0) -> pd.DataFrame:
+    """
+    Generate a preprocessed ledger of random round-trip trades and dividends, in the shape of
+    `ingest_transaction` output.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp(start_date) + pd.to_timedelta(np.sort(rng.integers(0, days, n_trades)), unit='D')
+    symbols = rng.choice(SYMBOLS, n_trades)
+    is_buy = rng.random(n_trades) < 0.55
+    is_dividend = rng.random(n_trades) < 0.05
+    quantity = rng.integers(1, 20, n_trades).astype(float)
+
+    df = pd.DataFrame({
+        'Date': dates,
+        'Action': np.where(is_dividend, 'DIV', np.where(is_buy, 'Buy', 'Sell')),
+        'Symbol': symbols,
+        'Description': np.where(is_dividend, 'CASH DIV ON 10 SHS REC 01/01/24 PAY 01/15/24', ''),
+        'Quantity': np.where(is_dividend, 0.0, np.where(is_buy, quantity, -quantity)),
+        'Price': np.where(is_dividend, 0.0, rng.uniform(50, 500, n_trades).round(2)),
+        'Commission': np.where(is_dividend, 0.0, -4.95),
+        'Net Amount': np.where(is_dividend, rng.uniform(1, 50, n_trades).round(2), 0.0),
+        'Currency': 'USD',
+        'Activity Type': np.where(is_dividend, 'Dividends', 'Trades'),
+        'Account Category': rng.choice([AccountCategory.MARGIN, AccountCategory.TFSA_RRSP], n_trades),
+    })
+    return df
+
+
+def synthetic_holdings() -> pd.DataFrame:
+    """Large enough baseline holdings that random sells rarely exceed the position."""
+    return pd.DataFrame([{'Symbol': symbol, 'Quantity': 10_000, 'AverageCost': 100.0, 'Account Category': category}
+                         for category in AccountCategory for symbol in SYMBOLS])
+
+
+def write_questrade_export(txn_df: pd.DataFrame, filepath: str) -> None:
+    """Write a ledger from `synthetic_ledger` as a raw Questrade CSV export, the input of `ingest_transaction`."""
+    settlement_date = txn_df['Date'].dt.strftime('%Y-%m-%d %I:%M:%S %p')
+    export = txn_df.assign(**{
+        'Transaction Date': settlement_date,
+        'Settlement Date': settlement_date,
+        'Gross Amount': txn_df['Quantity'] * txn_df['Price'],
+        'Account #': 12345678,
+        'Account Type': np.where(txn_df['Account Category'] == AccountCategory.MARGIN, 'Individual Margin',
+                                 'Individual TFSA'),
+    })
+    export[['Transaction Date', 'Settlement Date', 'Action', 'Symbol', 'Description', 'Quantity', 'Price',
+            'Gross Amount', 'Commission', 'Net Amount', 'Currency', 'Account #', 'Activity Type',
+            'Account Type']].to_csv(filepath, index=False)
@@ -0,0 +1,321 @@
+"""
+Polars implementation of ingestion and of the trade and dividend processors.
+
+Polars (with pyarrow for the conversion to pandas) is an optional dependency, installed with
+`poetry install --extras polars`. Ledgers are Polars lazy frames: CSV files are scanned and parsed on
+all cores, and filters and projections are pushed down into the scan by the query optimizer. Results
+are converted to the pandas DataFrames of the pandas backend, so MetricsResult and the dashboard are
+the same for both backends.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from lib.ingestion.dividend_description import DIVIDEND_DESCRIPTION_COLUMNS, DIVIDEND_DESCRIPTION_PATTERN, \
+    WITHHOLDING_TAX_PATTERN
+from lib.model.enum.account_category import AccountCategory
+from lib.metric_processor.position_book import PositionBook
+from lib.metric_processor.superficial_loss import SUPERFICIAL_LOSS_WINDOW, ReplacementShares
+from lib.model.enum.action import Action
+from lib.model.position import Position
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+# Position of a row in the ingested ledger; the counterpart of the pandas index label, so that anomalies
+# reported by the (pandas) ledger validator can be matched to Polars rows.
+ROW_INDEX = 'Row'
+
+SETTLEMENT_DATE_FORMAT = '%Y-%m-%d %I:%M:%S %p'
+
+# Columns read by the processors; `processed_ledger` projects the ledger on them before collecting it
+PROCESSED_COLUMNS = [ROW_INDEX, 'Date', 'Account Category', 'Activity Type', 'Action', 'Symbol', 'Quantity', 'Price',
+                     'Commission', 'Net Amount', 'Description', *DIVIDEND_DESCRIPTION_COLUMNS]
+
+
+def is_available() -> bool:
+    return pl is not None
+
+
+def require_polars() -> None:
+    if pl is None:
+        raise ImportError("The Polars backend requires the optional dependencies polars and pyarrow, "
+                          "install them with `poetry install --extras polars`.")
+
+
+def is_polars_frame(obj) -> bool:
+    return pl is not None and isinstance(obj, (pl.DataFrame, pl.LazyFrame))
+
+
+def scan_transaction(filepath: str) -> 'pl.LazyFrame':
+    """
+    Polars counterpart of `ingest_transaction`: the same preprocessing, as a lazy query over the CSV file.
+
+    :param filepath:
+    :return: LazyFrame sorted by 'Date', with the ROW_INDEX column.
+    """
+    require_polars()
+    ledger = pl.scan_csv(filepath, schema_overrides={'Symbol': pl.String, 'Description': pl.String})
+    return (preprocess_transaction(ledger)
+            .sort('Date', maintain_order=True)
+            .with_row_index(ROW_INDEX))
+
+
+def preprocess_transaction(ledger: 'pl.LazyFrame') -> 'pl.LazyFrame':
+    """
+    Polars counterpart of `lib.ingestion.ingest_transaction.preprocess_transaction`.
+
+    :param ledger: Raw transaction rows as exported by Questrade.
+    :return:
+    """
+    is_margin = pl.col('Account Type').str.contains('Margin', literal=True)
+    ledger = (ledger
+              .with_columns(pl.col('Settlement Date').str.strptime(pl.Datetime('ns'), SETTLEMENT_DATE_FORMAT)
+                            .alias('Date'))
+              .filter(~pl.col('Description').str.contains('(?i)DLR').fill_null(False)
+                      & ~pl.col('Currency').str.contains('(?i)CAD').fill_null(False))
+              .with_columns(pl.when(is_margin).then(pl.lit(AccountCategory.MARGIN.value))
+                            .otherwise(pl.lit(AccountCategory.TFSA_RRSP.value))
+                            .alias('Account Category')))
+    return parse_dividend_description(ledger)
+
+
+def parse_dividend_description(ledger: 'pl.LazyFrame') -> 'pl.LazyFrame':
+    """
+    Polars counterpart of `lib.ingestion.dividend_description.parse_dividend_description`, using the same
+    patterns.
+
+    :param ledger: Transaction data with 'Description' and 'Activity Type' columns.
+    :return: The transaction data with the DIVIDEND_DESCRIPTION_COLUMNS added (null/False for other rows).
+    """
+    is_dividend = pl.col('Activity Type') == 'Dividends'
+    description = pl.when(is_dividend).then(pl.col('Description'))
+    fields = description.str.extract_groups('(?i)' + DIVIDEND_DESCRIPTION_PATTERN.pattern)
+    return ledger.with_columns(**{
+        'Dividend Shares': fields.struct.field('shares').str.replace_all(',', '', literal=True).cast(pl.Float64),
+        'Record Date': fields.struct.field('record').str.strptime(pl.Datetime('ns'), '%m/%d/%y'),
+        'Pay Date': fields.struct.field('pay').str.strptime(pl.Datetime('ns'), '%m/%d/%y'),
+        'Withholding Tax': (description.str.contains('(?i)' + WITHHOLDING_TAX_PATTERN.pattern).fill_null(False)
+                            | (is_dividend & (pl.col('Net Amount') < 0)).fill_null(False)),
+    })
+
+
+def scan_baseline(paths: Dict[str, Tuple[str, AccountCategory]]) -> Dict[str, 'pl.LazyFrame']:
+    """
+    Polars counterpart of the per-account statement reading of `ingest_baseline`.
+
+    :param paths: Account name -> (statement CSV path, account category).
+    :return: Account name -> LazyFrame of the holdings.
+    """
+    require_polars()
+    return {account_name: pl.scan_csv(path, schema_overrides={'Symbol': pl.String})
+            .with_columns(pl.lit(account_category.value).alias('Account Category'))
+            for account_name, (path, account_category) in paths.items()}
+
+
+def with_row_index(ledger: Union['pl.DataFrame', 'pl.LazyFrame']) -> 'pl.LazyFrame':
+    ledger = ledger.lazy()
+    if ROW_INDEX not in ledger.collect_schema().names():
+        ledger = ledger.with_row_index(ROW_INDEX)
+    return ledger
+
+
+def to_pandas(frame: Union['pl.DataFrame', 'pl.LazyFrame']) -> pd.DataFrame:
+    """
+    Convert a Polars frame to the pandas frame of the pandas backend; the ROW_INDEX column becomes the index.
+
+    :param frame:
+    :return:
+    """
+    if isinstance(frame, pl.LazyFrame):
+        frame = frame.collect()
+    frame = frame.with_columns(pl.col(pl.Datetime).cast(pl.Datetime('ns')))
+    if ROW_INDEX in frame.columns:
+        frame = frame.with_columns(pl.col(ROW_INDEX).cast(pl.Int64))
+    df = frame.to_pandas()
+    if ROW_INDEX in df.columns:
+        df = df.set_index(ROW_INDEX)
+        df.index.name = None
+    return df
+
+
+def from_pandas(df: pd.DataFrame) -> 'pl.DataFrame':
+    """
+    Convert a pandas ledger to Polars, keeping its index labels in the ROW_INDEX column.
+
+    :param df:
+    :return:
+    """
+    require_polars()
+    return pl.from_pandas(df.rename_axis(ROW_INDEX).reset_index())
+
+
+def processed_ledger(ledger: Union['pl.DataFrame', 'pl.LazyFrame'],
+                     account_categories: Iterable[AccountCategory],
+                     activity_types: Iterable[str]) -> Tuple['pl.DataFrame', pd.Timestamp, pd.Timestamp]:
+    """
+    Collect the rows and columns of the ledger that the processors read: the account category and activity
+    type filters and the PROCESSED_COLUMNS projection are pushed into the lazy query. The first and last
+    dates of the whole ledger, the default date range, are collected in the same pass.
+
+    :param ledger:
+    :param account_categories:
+    :param activity_types:
+    :return: The processed rows with their ROW_INDEX, the first date and the last date of the ledger.
+    """
+    ledger = with_row_index(ledger)
+    names = ledger.collect_schema().names()
+    processed = (ledger
+                 .filter(pl.col('Account Category').is_in([category.value for category in account_categories])
+                         & pl.col('Activity Type').is_in(list(activity_types)))
+                 .select([column for column in PROCESSED_COLUMNS if column in names]))
+    date_range = ledger.select(pl.col('Date').min().alias('First'), pl.col('Date').max().alias('Last'))
+    processed, date_range = pl.collect_all([processed, date_range])
+    first, last = date_range.row(0)
+    return processed, pd.Timestamp(first), pd.Timestamp(last)
+
+
+def filter_account(ledger: Union['pl.DataFrame', 'pl.LazyFrame'],
+                   account_category: AccountCategory) -> Union['pl.DataFrame', 'pl.LazyFrame']:
+    return ledger.filter(pl.col('Account Category') == account_category.value)
+
+
+def realized_gains(ledger: Union['pl.DataFrame', 'pl.LazyFrame'],
+                   positions: Dict[str, Position],
+                   holdings_date: pd.Timestamp,
+                   start_date: pd.Timestamp,
+                   end_date: pd.Timestamp,
+                   invalid_rows: Iterable[int],
+                   deny_superficial_losses: bool = True) -> Tuple[float, pd.DataFrame, pd.DataFrame, pd.DataFrame,
+                                                                  pd.DataFrame]:
+    """
+    Polars counterpart of the trade loops of CapitalGainProcessor.
+
+    The filters and the projection to the traded columns run in one optimized query. The average cost is a
+    sequential recurrence, so the selected trades are then applied in order to a PositionBook from the
+    Arrow columns, and only the realized rows are aggregated per day by Polars.
+
+    :param ledger: Trades of one account category, with the ROW_INDEX column.
+    :param positions: Baseline positions by symbol; updated in place.
+    :param holdings_date:
+    :param start_date:
+    :param end_date:
+    :param invalid_rows: ROW_INDEX values of the trades to skip, see `LedgerReport.invalid_trade_index`.
+    :param deny_superficial_losses: Deny the superficial losses, for the taxable account categories.
+    :return: total realized, daily realized (Date, Realized Gain, Realized Loss), realized trades
+             (Date, Symbol, Realized, Denied Loss, Row), the same for every applied sell, including the sells
+             before the start date, and the position after each applied trade (Date, Symbol, Quantity,
+             Average Cost).
+    """
+    start_date, end_date = pd.Timestamp(start_date).to_pydatetime(), pd.Timestamp(end_date).to_pydatetime()
+    date = pl.col('Date')
+    is_before = (date > pd.Timestamp(holdings_date).to_pydatetime()) & (date < start_date)
+    is_during = (date >= start_date) & (date <= end_date)
+    is_replacement = (date > end_date) & (date <= (pd.Timestamp(end_date) + SUPERFICIAL_LOSS_WINDOW).to_pydatetime())
+    is_buy = pl.col('Action') == Action.BUY.value
+    trades = (ledger.lazy()
+              .filter((pl.col('Activity Type') == 'Trades')
+                      & pl.col('Action').is_in([Action.BUY.value, Action.SELL.value])
+                      & ~pl.col(ROW_INDEX).is_in(list(invalid_rows))
+                      & (is_before | is_during | is_replacement))
+              .select(date.cast(pl.Datetime('ns')), 'Symbol', ROW_INDEX, is_buy.alias('Is Buy'),
+                      pl.col('Quantity').abs(), 'Price', pl.col('Commission').abs(), is_during.alias('During'),
+                      (is_before | is_during).alias('Applied'),
+                      pl.when(is_buy).then(pl.col('Quantity').abs()).otherwise(-pl.col('Quantity').abs())
+                      .cast(pl.Float64).alias('Signed Quantity'))
+              .collect())
+
+    replacement_shares = None
+    if deny_superficial_losses:
+        replacement_shares = ReplacementShares(trades.select('Date', 'Symbol', 'Signed Quantity').to_pandas(),
+                                               {symbol: position.quantity for symbol, position in positions.items()})
+    book = PositionBook(positions, replacement_shares)
+    applied = trades.filter(pl.col('Applied'))
+    realized_rows: List[int] = []
+    realized: List[float] = []
+    denied_losses: List[float] = []
+    realized_during: List[bool] = []
+    position_history: List[tuple] = []
+    for row, (date_, symbol, is_buy_, quantity, price, commission, during) in enumerate(zip(
+            *(applied[column].to_list() for column in ['Date', 'Symbol', 'Is Buy', 'Quantity', 'Price',
+                                                       'Commission', 'During']))):
+        if is_buy_:
+            book.buy(symbol, quantity, price, commission)
+        else:
+            realized_gain, denied = book.sell(symbol, date_, quantity, price, commission)
+            realized_rows.append(row)
+            realized.append(realized_gain)
+            denied_losses.append(denied)
+            realized_during.append(during)
+        position_history.append((date_, symbol, book.positions[symbol].quantity, book.positions[symbol].avg_price))
+
+    realized_history = (applied.select(pl.col('Date', 'Symbol', ROW_INDEX)
+                                       .gather(pl.Series(realized_rows, dtype=pl.UInt32)))
+                        .with_columns(pl.Series('Realized', realized, dtype=pl.Float64),
+                                      pl.Series('Denied Loss', denied_losses, dtype=pl.Float64)))
+    realized_symbols = realized_history.filter(pl.Series(realized_during, dtype=pl.Boolean))
+    days = pl.DataFrame({'Date': pl.datetime_range(start_date, end_date, '1d', time_unit='ns', eager=True)})
+    daily_realized = (days
+                      .join(realized_symbols.group_by('Date').agg(
+                          pl.col('Realized').clip(lower_bound=0).sum().alias('Realized Gain'),
+                          (-pl.col('Realized').clip(upper_bound=0)).sum().alias('Realized Loss')),
+                          on='Date', how='left')
+                      .sort('Date')
+                      .fill_null(0.0))
+    # the row of each sell is a column here, not the index
+    columns = ['Date', 'Symbol', 'Realized', 'Denied Loss', ROW_INDEX]
+    realized_symbols = to_pandas(realized_symbols).rename_axis(ROW_INDEX).reset_index()[columns]
+    realized_history = to_pandas(realized_history).rename_axis(ROW_INDEX).reset_index()[columns]
+    position_history = pd.DataFrame(position_history, columns=['Date', 'Symbol', 'Quantity', 'Average Cost']).astype(
+        {'Date': 'datetime64[ns]', 'Symbol': object, 'Quantity': float, 'Average Cost': float})
+    return (float(realized_symbols['Realized'].sum()), to_pandas(daily_realized), realized_symbols, realized_history,
+            position_history)
+
+
+def monthly_dividends(ledger: Union['pl.DataFrame', 'pl.LazyFrame'],
+                      start_date: pd.Timestamp,
+                      end_date: pd.Timestamp) -> Tuple[float, Optional[pd.DataFrame], Optional[pd.DataFrame]]:
+    """
+    Polars counterpart of the aggregation of DividendProcessor. The total, the monthly table and the
+    payments are collected together, so the dividend rows are only filtered once.
+
+    :param ledger:
+    :param start_date:
+    :param end_date:
+    :return: total (net) dividends, Month, Symbol, Gross Dividends, Withholding Tax, Net Dividends, Shares,
+             Dividend Per Share, and the payments (Date, Symbol, Record Date, Gross Dividends); both None without
+             a 'Description' column.
+    """
+    date = pl.col('Date')
+    dividends = ledger.lazy().filter((pl.col('Activity Type') == 'Dividends')
+                                     & (date >= pd.Timestamp(start_date).to_pydatetime())
+                                     & (date <= pd.Timestamp(end_date).to_pydatetime()))
+    total = dividends.select(pl.col('Net Amount').sum())
+    columns = dividends.collect_schema().names()
+    if 'Description' not in columns:
+        return total.collect().item(), None, None
+
+    if not set(DIVIDEND_DESCRIPTION_COLUMNS).issubset(columns):
+        dividends = parse_dividend_description(dividends)
+    is_tax = pl.col('Withholding Tax')
+    monthly = (dividends
+               .filter(pl.col('Symbol').is_not_null())  # as pandas groupby drops missing keys
+               .sort('Record Date', nulls_last=False, maintain_order=True)
+               .group_by(date.dt.truncate('1mo').alias('Month'), 'Symbol')
+               .agg(pl.col('Net Amount').filter(~is_tax).sum().alias('Gross Dividends'),
+                    (-pl.col('Net Amount').filter(is_tax).sum()).alias('Withholding Tax'),
+                    pl.col('Dividend Shares').drop_nulls().last().alias('Shares'),
+                    (pl.col('Net Amount') / pl.col('Dividend Shares')).filter(~is_tax).drop_nulls().sum()
+                    .alias('Dividend Per Share'),
+                    (pl.col('Dividend Shares').filter(~is_tax).is_not_null().any()).alias('Has Shares'))
+               .with_columns((pl.col('Gross Dividends') - pl.col('Withholding Tax')).alias('Net Dividends'),
+                             pl.when(pl.col('Has Shares')).then(pl.col('Dividend Per Share'))
+                             .alias('Dividend Per Share'))
+               .drop('Has Shares')
+               .sort('Month', 'Symbol'))
+    payments = dividends.filter(~is_tax).select('Date', 'Symbol', 'Record Date',
+                                                pl.col('Net Amount').alias('Gross Dividends'))
+    total, monthly, payments = pl.collect_all([total, monthly, payments])
+    return total.item(), to_pandas(monthly), to_pandas(payments)
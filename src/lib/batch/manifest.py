@@ -0,0 +1,47 @@
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+
+
+@dataclass
+class PortfolioSpec:
+    """Class to represent one portfolio of a batch manifest."""
+    portfolio_id: str
+    transaction_files: List[str]
+    statements_filepath: str
+    baseline_date: datetime
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    corporate_actions_filepath: Optional[str] = None
+
+
+def load_manifest(filepath: str) -> List[PortfolioSpec]:
+    """
+    Load a batch manifest. The manifest is a JSON list of portfolios, e.g.
+
+        [{"portfolio_id": "smith", "transaction_files": ["smith/txns.csv"], "statements_filepath": "smith/statements",
+          "baseline_date": "2024-01-31", "start_date": "2024-02-01", "end_date": "2024-12-31",
+          "corporate_actions_filepath": "corporate_actions.csv"}]
+
+    start_date, end_date and corporate_actions_filepath are optional.
+    Relative paths are resolved against the directory of the manifest.
+
+    :param filepath: Path of the manifest JSON file.
+    :return: A list of PortfolioSpec in manifest order.
+    """
+    base_dir = os.path.dirname(os.path.abspath(filepath))
+    with open(filepath) as f:
+        entries = json.load(f)
+
+    return [PortfolioSpec(
+        portfolio_id=str(entry['portfolio_id']),
+        transaction_files=[os.path.join(base_dir, path) for path in entry['transaction_files']],
+        statements_filepath=os.path.join(base_dir, entry['statements_filepath']),
+        baseline_date=datetime.strptime(entry['baseline_date'], '%Y-%m-%d'),
+        start_date=entry.get('start_date'),
+        end_date=entry.get('end_date'),
+        corporate_actions_filepath=(os.path.join(base_dir, entry['corporate_actions_filepath'])
+                                    if entry.get('corporate_actions_filepath') else None),
+    ) for entry in entries]
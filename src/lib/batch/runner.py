@@ -0,0 +1,182 @@
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from lib.batch.manifest import PortfolioSpec
+from lib.batch.sink import ResultSink
+from lib.ingestion.corporate_actions import load_corporate_actions
+from lib.ingestion.ingest_baseline import ingest_baseline, statement_files
+from lib.ingestion.ingest_transaction import ingest_transaction
+from lib.logger.logger import get_logger, initialize_logger
+from lib.metric_processor.processor import MetricsResult, process_metrics
+from lib.model.enum.account_category import AccountCategory
+from lib.model.enum.stage import Stage
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Per-worker cache size of ingested files; portfolios sharing statements or transaction files reuse them
+INGESTION_CACHE_SIZE = 32
+
+# Tasks processed by a pool worker before it is replaced, releasing the memory it accumulated
+MAX_TASKS_PER_CHILD = 100
+
+# Smallest memory limit per worker: a worker that has imported the pipeline is already resident in about 135 MB
+MIN_MEMORY_LIMIT_MB = 256
+
+# Resident memory limit of this worker process, set by _initialize_worker
+_memory_limit_mb: Optional[int] = None
+
+
+class WorkerMemoryExceeded(Exception):
+    """Raised by a worker whose peak resident memory exceeded the limit, instead of processing a portfolio."""
+
+
+@dataclass
+class BatchReport:
+    """Class to represent the outcome of a batch run."""
+    total: int
+    succeeded: int
+    failed: Dict[str, str] = field(default_factory=dict)  # portfolio id -> error
+    elapsed_seconds: float = 0.0
+
+    @property
+    def items_per_minute(self) -> float:
+        """Throughput in succeeded items per minute: portfolios for `run_batch`, reports for `export_reports`."""
+        return self.succeeded * 60 / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+def run_batch(portfolios: List[PortfolioSpec],
+              sink: ResultSink,
+              max_workers: Optional[int] = None,
+              memory_limit_mb: Optional[int] = None,
+              max_tasks_per_child: Optional[int] = MAX_TASKS_PER_CHILD,
+              stage: Stage = Stage.PROD) -> BatchReport:
+    """
+    Process many portfolios across a pool of worker processes. Each result is handed to the sink
+    in the parent process as soon as its portfolio finishes.
+
+    Workers import the pipeline once and keep their ingestion caches warm across portfolios; they are
+    recycled after `max_tasks_per_child` portfolios to release memory. With `memory_limit_mb`, a worker
+    whose peak resident memory (`ru_maxrss`) exceeds the limit after a portfolio hands its next portfolios
+    back with WorkerMemoryExceeded; they are resubmitted, and the worker is replaced once these count up to
+    `max_tasks_per_child`. Workers are spawned rather than forked when `max_tasks_per_child` is set, so their
+    peak memory is their own. The limit is not enforced where the `resource` module is unavailable (Windows).
+
+    :param portfolios: Portfolios to process, see `load_manifest`.
+    :param sink: Receives each portfolio's results.
+    :param max_workers: Defaults to the number of CPUs.
+    :param memory_limit_mb: Resident memory limit per worker (optional), at least MIN_MEMORY_LIMIT_MB.
+    :param max_tasks_per_child: Portfolios processed by a worker before it is replaced (optional, required
+                                with `memory_limit_mb`).
+    :param stage: Logging stage of the workers.
+    :return: BatchReport including the throughput in portfolios per minute.
+    """
+    if memory_limit_mb is not None:
+        if memory_limit_mb < MIN_MEMORY_LIMIT_MB:
+            raise ValueError(f"memory_limit_mb must be at least {MIN_MEMORY_LIMIT_MB}, the memory of a worker "
+                             f"that has imported the pipeline: {memory_limit_mb}.")
+        if max_tasks_per_child is None:
+            raise ValueError("memory_limit_mb requires max_tasks_per_child, workers over the limit are only "
+                             "replaced after max_tasks_per_child tasks.")
+    logger = get_logger()
+    report = BatchReport(total=len(portfolios), succeeded=0)
+    start = time.perf_counter()
+
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 initializer=_initialize_worker,
+                                 initargs=(stage, memory_limit_mb),
+                                 max_tasks_per_child=max_tasks_per_child) as executor:
+            futures = {executor.submit(run_portfolio, portfolio): portfolio for portfolio in portfolios}
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    portfolio = futures.pop(future)  # release the result once it is written
+                    try:
+                        sink.write(portfolio.portfolio_id, future.result())
+                        report.succeeded += 1
+                    except WorkerMemoryExceeded:
+                        futures[executor.submit(run_portfolio, portfolio)] = portfolio
+                    except Exception as e:
+                        logger.error("Portfolio %s failed: %r", portfolio.portfolio_id, e)
+                        report.failed[portfolio.portfolio_id] = repr(e)
+    finally:
+        sink.close()
+
+    report.elapsed_seconds = time.perf_counter() - start
+    logger.info("Processed %d/%d portfolios in %.1fs (%.1f portfolios/min).", report.succeeded, report.total,
+                report.elapsed_seconds, report.items_per_minute)
+    return report
+
+
+def _initialize_worker(stage: Stage, memory_limit_mb: Optional[int]) -> None:
+    global _memory_limit_mb
+    initialize_logger(stage, structured=True)
+    if resource is not None:
+        _memory_limit_mb = memory_limit_mb
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_portfolio(portfolio: PortfolioSpec) -> Dict[AccountCategory, MetricsResult]:
+    """
+    Metrics of one portfolio, reusing the ingestion caches of the process.
+
+    :raises WorkerMemoryExceeded: In a pool worker that has exceeded its memory limit, see `run_batch`.
+    """
+    if _memory_limit_mb is not None and _peak_rss_mb() > _memory_limit_mb:
+        raise WorkerMemoryExceeded(f"Worker {os.getpid()} peaked at {_peak_rss_mb():.0f} MB, over the limit "
+                                   f"of {_memory_limit_mb} MB.")
+    txn_df = _load_transactions(tuple((path, os.path.getmtime(path)) for path in portfolio.transaction_files))
+    holdings_df = _load_baseline(portfolio.statements_filepath, portfolio.baseline_date,
+                                 _statement_mtimes(portfolio.statements_filepath, portfolio.baseline_date))
+    corporate_actions = (_load_corporate_actions(portfolio.corporate_actions_filepath,
+                                                 os.path.getmtime(portfolio.corporate_actions_filepath))
+                         if portfolio.corporate_actions_filepath else None)
+    # the cached frames are shared by every portfolio of the worker, hand out copies
+    return process_metrics(txn_df=txn_df.copy(), holdings_df=holdings_df.copy(),
+                           holdings_date=portfolio.baseline_date,
+                           start_date=portfolio.start_date, end_date=portfolio.end_date,
+                           corporate_actions=corporate_actions.copy() if corporate_actions is not None else None)
+
+
+def _statement_mtimes(statements_filepath: str, baseline_date: datetime) -> Tuple[Tuple[str, float], ...]:
+    # the statements read by ingest_baseline, so that a corrected statement is re-ingested
+    return tuple((path, os.path.getmtime(path)) for path, _, _ in statement_files(statements_filepath,
+                                                                                  date=baseline_date))
+
+
+@lru_cache(maxsize=INGESTION_CACHE_SIZE)
+def _load_transactions(files: Tuple[Tuple[str, float], ...]) -> pd.DataFrame:
+    # keyed on (path, mtime) so an updated file is re-ingested
+    df = pd.concat([ingest_transaction(path) for path, _ in files], ignore_index=True)
+    return df.sort_values(by='Date', kind='stable').reset_index(drop=True)
+
+
+@lru_cache(maxsize=INGESTION_CACHE_SIZE)
+def _load_baseline(statements_filepath: str, baseline_date: datetime,
+                   statement_mtimes: Tuple[Tuple[str, float], ...]) -> pd.DataFrame:
+    # keyed on the statement files and their mtimes, see _statement_mtimes
+    baseline = ingest_baseline(date=baseline_date, filepath=statements_filepath)
+    if not baseline:
+        return pd.DataFrame(columns=['Symbol', 'Quantity', 'AverageCost', 'Account Category'])
+    return pd.concat(baseline.values(), ignore_index=True)
+
+
+@lru_cache(maxsize=INGESTION_CACHE_SIZE)
+def _load_corporate_actions(filepath: str, mtime: float) -> pd.DataFrame:
+    return load_corporate_actions(filepath)
@@ -0,0 +1,46 @@
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import Dict
+
+from lib.metric_processor.processor import MetricsResult
+from lib.model.enum.account_category import AccountCategory
+
+
+class ResultSink(ABC):
+    """Receives the metrics of each portfolio as soon as it finishes."""
+
+    @abstractmethod
+    def write(self, portfolio_id: str, results: Dict[AccountCategory, MetricsResult]) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class DirectoryResultSink(ResultSink):
+    """
+    Writes each portfolio to `<output_dir>/<portfolio_id>/`:
+    - summary.json: account category -> summary
+    - <account category>-<table>.csv: daily_realized, daily_realized_symbols and every detail table
+    """
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+
+    def write(self, portfolio_id: str, results: Dict[AccountCategory, MetricsResult]) -> None:
+        portfolio_dir = os.path.join(self.output_dir, portfolio_id)
+        os.makedirs(portfolio_dir, exist_ok=True)
+
+        summaries = {}
+        for account_category, result in results.items():
+            summaries[account_category.value] = {key: float(value) for key, value in result.summary.items()}
+            tables = {'daily_realized': result.daily_realized,
+                      'daily_realized_symbols': result.daily_realized_symbols,
+                      **result.details}
+            for name, df in tables.items():
+                if df is not None:
+                    df.to_csv(os.path.join(portfolio_dir, f'{account_category.value}-{name}.csv'), index=False)
+
+        with open(os.path.join(portfolio_dir, 'summary.json'), 'w') as f:
+            json.dump(summaries, f, indent=2)
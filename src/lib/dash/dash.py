@@ -1,9 +1,11 @@
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Optional
 
 import pandas as pd
-from dash import Dash, html, dcc, Output, Input
-import plotly.express as px
+from dash import Dash, html, dcc, Output, Input, State, ctx
+from dash.exceptions import PreventUpdate
+from plotly.subplots import make_subplots
+import plotly.graph_objects as go
 from dash.dash_table import DataTable
 from dash_table import FormatTemplate
 
@@ -13,23 +15,36 @@ from lib.metric_processor.processor import process_metrics
 
 from lib.metric_processor.processor import MetricsResult
 
+from lib.metric_processor.rolling import ROLLING_WINDOWS
+
 from lib.logger.logger import get_logger
 
+from lib.report.figures import daily_details, monthly_realized_figure
+
+from lib.watch.live_ledger import LiveLedger
+
 TXN_FILEPATH = '../data/all_txns.csv'
 STATEMENTS_FILEPATH = '../data/statements'
 BASELINE_DATE = '2023-12-31'
 
+# How often open sessions check a LiveLedger for new results
+WATCH_REFRESH_MS = 500
+
 # Global variables to store analysis result
 analysis_result: Dict[AccountCategory, MetricsResult] = {}
 
 
-def create_dash_app(txn_df: pd.DataFrame, baseline_df: pd.DataFrame, baseline_date: datetime) -> Dash:
+def create_dash_app(txn_df: pd.DataFrame, baseline_df: pd.DataFrame, baseline_date: datetime,
+                    live_ledger: Optional[LiveLedger] = None) -> Dash:
     """
     Create a Dash app to display the analysis result.
 
     :param txn_df: DataFrame containing transaction data.
     :param baseline_df: DataFrame containing holdings data.
     :param baseline_date: The baseline date for the holdings data.
+    :param live_ledger: In watch mode, each session reads the results of its own date range from the
+                        LiveLedger instead, starting from the watched range, and redraws within WATCH_REFRESH_MS
+                        of a new version (txn_df and baseline_df are then unused).
     :return: Dash app
     """
     global analysis_result, analysis_updated
@@ -39,6 +54,8 @@ def create_dash_app(txn_df: pd.DataFrame, baseline_df: pd.DataFrame, baseline_da
 
     # Create dropdown options for account categories
     account_options = [{'label': account.name, 'value': account.name} for account in AccountCategory]
+    # in watch mode sessions start on the watched range, whose results the LiveLedger keeps up to date
+    start_date, end_date = live_ledger.watched_range() if live_ledger is not None else ('2024-01-01', '2024-12-31')
 
     app.layout = html.Div([
         dcc.Dropdown(
@@ -48,40 +65,64 @@ def create_dash_app(txn_df: pd.DataFrame, baseline_df: pd.DataFrame, baseline_da
         ),
         dcc.DatePickerRange(
             id='date-range-picker',
-            start_date='2024-01-01',
-            end_date='2024-12-31'
+            start_date=start_date,
+            end_date=end_date
         ),
-        # Hidden div to trigger upon analysis result update
+        # Hidden div to trigger upon analysis result update; holds the LiveLedger version in watch mode
         html.Div(id='analysis_result_updated', style={'display': 'none'}),
+        dcc.Interval(id='watch-interval', interval=WATCH_REFRESH_MS, disabled=live_ledger is None),
         html.Div(id='summary'),
         dcc.Graph(id='monthly-bar-chart'),
-        html.Div(id='daily-details')
+        html.Div(id='daily-details'),
+        dcc.Dropdown(
+            id='rolling-window-dropdown',
+            options=[{'label': f'{window} days', 'value': window} for window in ROLLING_WINDOWS],
+            value=ROLLING_WINDOWS[0]
+        ),
+        dcc.Dropdown(id='rolling-symbol-dropdown', placeholder='All symbols'),
+        dcc.Graph(id='rolling-chart'),
+        dcc.Graph(id='drawdown-chart')
     ])
 
     @app.callback(
         Output('analysis_result_updated', 'children'),
         [Input('date-range-picker', 'start_date'),
-         Input('date-range-picker', 'end_date')]
+         Input('date-range-picker', 'end_date'),
+         Input('watch-interval', 'n_intervals')],
+        State('analysis_result_updated', 'children')
     )
-    def update_analysis_result(start_date, end_date):
+    def update_analysis_result(start_date, end_date, _, rendered_version):
         global analysis_result
-        analysis_result = process_metrics(txn_df=txn_df, holdings_df=baseline_df, start_date=start_date,
-                                          end_date=end_date,
-                                          holdings_date=baseline_date)
-        logger.info(f"Analysis result updated.")
-        return
+        if live_ledger is None:
+            analysis_result = process_metrics(txn_df=txn_df, holdings_df=baseline_df, start_date=start_date,
+                                              end_date=end_date,
+                                              holdings_date=baseline_date)
+            logger.info("Analysis result updated.")
+            return
+
+        if ctx.triggered_id == 'watch-interval' and live_ledger.version == rendered_version:
+            raise PreventUpdate  # nothing changed, the session keeps its figures
+        # computed here once for the callbacks of this session, other sessions keep their own date range
+        live_ledger.results_for(start_date, end_date)
+        logger.info("Analysis result updated to version %d.", live_ledger.version)
+        return live_ledger.version
+
+    def session_result(start_date, end_date) -> Dict[AccountCategory, MetricsResult]:
+        if live_ledger is None:
+            return analysis_result
+        return live_ledger.results_for(start_date, end_date)
 
     @app.callback(
         [Output('summary', 'children'),
          Output('monthly-bar-chart', 'figure')],
         [Input('account-category-dropdown', 'value'),
-         Input('analysis_result_updated', 'children')]  # Trigger on analysis result update
+         Input('analysis_result_updated', 'children')],  # Trigger on analysis result update
+        [State('date-range-picker', 'start_date'),
+         State('date-range-picker', 'end_date')]
     )
-    def update_dashboard(selected_account, _):
-        global analysis_result
-
+    def update_dashboard(selected_account, _, start_date, end_date):
         account_category = AccountCategory[selected_account]
-        result = analysis_result[account_category]
+        result = session_result(start_date, end_date)[account_category]
 
         # Create summary table
         summary_table = DataTable(
@@ -96,47 +137,26 @@ def create_dash_app(txn_df: pd.DataFrame, baseline_df: pd.DataFrame, baseline_da
             }
         )
 
-        # Aggregate data by month
-        daily_realized = result.daily_realized
-        daily_realized['Month'] = daily_realized['Date'].dt.to_period('M')
-        monthly_realized = daily_realized.groupby('Month').agg({
-            'Realized Gain': 'sum',
-            'Realized Loss': 'sum'
-        }).reset_index()
-        monthly_realized['Month'] = monthly_realized['Month'].dt.to_timestamp()
-
-        # Create bar chart
-        fig = px.bar(monthly_realized, x='Month', y=['Realized Gain', 'Realized Loss'],
-                     barmode='group', title='Monthly Realized Gain/Loss')
-        fig.update_layout(xaxis=dict(dtick="M1"))  # show label for every month
-
-        return summary_table, fig
+        return summary_table, monthly_realized_figure(result.daily_realized)
 
     @app.callback(
         Output('daily-details', 'children'),
         [Input('monthly-bar-chart', 'clickData'),
          Input('account-category-dropdown', 'value'),
-         Input('analysis_result_updated', 'children')]
+         Input('analysis_result_updated', 'children')],
+        [State('date-range-picker', 'start_date'),
+         State('date-range-picker', 'end_date')]
     )
-    def display_daily_details(click_data, selected_account, _):
-        global analysis_result
-
+    def display_daily_details(click_data, selected_account, _, start_date, end_date):
         if click_data is None:
             return html.Div()
 
         account_category = AccountCategory[selected_account]
-        result = analysis_result[account_category]
-        daily_realized_symbols = result.daily_realized_symbols
+        result = session_result(start_date, end_date)[account_category]
 
         month = click_data['points'][0]['x']
         is_gain = click_data['points'][0]['curveNumber'] == 0
 
-        month_str = pd.to_datetime(month).strftime('%Y-%m')
-        daily_details = daily_realized_symbols[
-            (daily_realized_symbols['Date'].dt.strftime('%Y-%m') == month_str) &
-            (daily_realized_symbols['Realized'] > 0 if is_gain else daily_realized_symbols['Realized'] < 0)
-            ]
-
         return html.Ul([
             html.Li(
                 children=[
@@ -152,7 +172,49 @@ def create_dash_app(txn_df: pd.DataFrame, baseline_df: pd.DataFrame, baseline_da
                     )
                 ],
                 style={'list-style-type': 'none'}  # Remove bullet points
-            ) for _, row in daily_details.iterrows()
+            ) for _, row in daily_details(result.daily_realized_symbols, month, is_gain).iterrows()
         ])
 
+    @app.callback(
+        [Output('rolling-symbol-dropdown', 'options'),
+         Output('rolling-chart', 'figure'),
+         Output('drawdown-chart', 'figure')],
+        [Input('account-category-dropdown', 'value'),
+         Input('rolling-window-dropdown', 'value'),
+         Input('rolling-symbol-dropdown', 'value'),
+         Input('analysis_result_updated', 'children')],
+        [State('date-range-picker', 'start_date'),
+         State('date-range-picker', 'end_date')]
+    )
+    def update_rolling_charts(selected_account, window, symbol, _, start_date, end_date):
+        account_category = AccountCategory[selected_account]
+        result = session_result(start_date, end_date)[account_category]
+        rolling_symbols = result.details['rolling_symbols']
+        symbol_options = [{'label': s, 'value': s} for s in sorted(rolling_symbols['Symbol'].unique())]
+
+        if symbol:
+            rolling = rolling_symbols[(rolling_symbols['Symbol'] == symbol) & (rolling_symbols['Window'] == window)]
+            title = f'{symbol} rolling {window}-day metrics'
+        else:
+            rolling = result.details['rolling']
+            rolling = rolling[rolling['Window'] == window]
+            title = f'Rolling {window}-day metrics'
+
+        rolling_fig = make_subplots(specs=[[{'secondary_y': True}]])
+        for column in ['Realized P&L', 'Dividends']:
+            rolling_fig.add_trace(go.Scatter(x=rolling['Date'], y=rolling[column], name=column))
+        for column in ['Win Rate', 'Volatility']:
+            rolling_fig.add_trace(go.Scatter(x=rolling['Date'], y=rolling[column], name=column,
+                                             line={'dash': 'dot'}), secondary_y=True)
+        rolling_fig.update_layout(title=title)
+
+        drawdown = result.details['drawdown']
+        # separate filled traces, so that the drawdown is not stacked on top of the cumulative P&L
+        drawdown_fig = go.Figure([go.Scatter(x=drawdown['Date'], y=drawdown[column], name=column, fill='tozeroy')
+                                  for column in ['Cumulative Realized', 'Drawdown']])
+        drawdown_fig.update_layout(
+            title=f"Cumulative Realized P&L (max drawdown ${result.summary['max_drawdown']:,.2f})")
+
+        return symbol_options, rolling_fig, drawdown_fig
+
     return app
@@ -0,0 +1,126 @@
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from lib.model.enum.corporate_action_type import CorporateActionType
+
+CORPORATE_ACTION_COLUMNS = ['Date', 'Symbol', 'Type', 'Ratio', 'New Symbol']
+
+
+def load_corporate_actions(filepath: str) -> pd.DataFrame:
+    """
+    Load the corporate actions table. The CSV file has the columns
+    - Date: effective date (YYYY-MM-DD); transactions settled before it are adjusted.
+    - Symbol: symbol the action applies to.
+    - Type: Split, Consolidation or Symbol Change.
+    - Ratio: new shares per old share, e.g. 4 for a 4:1 split or 0.1 for a 1:10 consolidation.
+    - New Symbol: the new ticker of a symbol change.
+
+    :param filepath:
+    :return: DataFrame with CORPORATE_ACTION_COLUMNS, sorted by date.
+    """
+    df = pd.read_csv(filepath, dtype={'Symbol': str, 'New Symbol': str})
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+    df['Type'] = df['Type'].map(CorporateActionType)
+    df['Ratio'] = df['Ratio'].astype(float).fillna(1.0)
+    is_share_change = df['Type'].isin([CorporateActionType.SPLIT, CorporateActionType.CONSOLIDATION])
+    if (df.loc[is_share_change, 'Ratio'] <= 0).any():
+        raise ValueError(f"Corporate action ratios must be positive in {filepath}.")
+    return df[CORPORATE_ACTION_COLUMNS].sort_values(by='Date', kind='stable').reset_index(drop=True)
+
+
+def canonical_symbols(actions: pd.DataFrame, symbols: pd.Series, dates: pd.Series) -> pd.Series:
+    """
+    Resolve the symbol of each row to its latest symbol. A symbol change only renames the rows dated before
+    its effective date, so a ticker reused after the change keeps its symbol. Chains are followed from the
+    effective date of each applied change (A -> B, then B -> C, gives A -> C for the rows of A before the
+    first change and B -> C for the rows of B before the second).
+
+    Each step applies, per renamed symbol, the first change after the rows' dates with a `searchsorted`, so a
+    chain of k changes takes k vectorized steps.
+
+    :param actions: Corporate actions, see `load_corporate_actions`.
+    :param symbols: Symbol of each row.
+    :param dates: Date of each row.
+    :return: The canonical symbol of each row, with the index of `symbols`.
+    """
+    changes = actions[actions['Type'] == CorporateActionType.SYMBOL_CHANGE].sort_values(by='Date', kind='stable')
+    renames = {symbol: (group['Date'].to_numpy(), group['New Symbol'].to_numpy())
+               for symbol, group in changes.groupby('Symbol')}
+
+    canonical = symbols.to_numpy(dtype=object, copy=True)
+    as_of = pd.DatetimeIndex(dates).to_numpy()
+    pending = np.flatnonzero(pd.Series(canonical).isin(list(renames)).to_numpy())
+    while len(pending):
+        renamed = []
+        for symbol, rows in pd.Series(pending).groupby(canonical[pending]).indices.items():
+            rows = pending[rows]
+            change_dates, new_symbols = renames[symbol]
+            change = np.searchsorted(change_dates, as_of[rows], side='right')
+            is_renamed = change < len(change_dates)
+            rows, change = rows[is_renamed], change[is_renamed]
+            canonical[rows] = new_symbols[change]
+            as_of[rows] = change_dates[change]
+            renamed.append(rows)
+        # the effective dates of a chain increase, so it ends after at most one step per change
+        pending = np.concatenate(renamed)
+        pending = pending[pd.Series(canonical[pending]).isin(list(renames)).to_numpy()]
+    return pd.Series(canonical, index=symbols.index)
+
+
+def apply_corporate_actions(txn_df: pd.DataFrame,
+                            actions: pd.DataFrame,
+                            holdings_df: Optional[pd.DataFrame] = None,
+                            holdings_date: Optional[datetime] = None) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+    """
+    Express the ledger (and the baseline holdings) in today's shares of the canonical symbols:
+    rows of renamed symbols dated before the change are merged into their canonical symbol, then quantities
+    are multiplied and prices divided by the cumulative adjustment factor of all splits/consolidations
+    effective after each row.
+
+    Factors are suffix products of the ratios per symbol, computed once; each row picks its factor with
+    a `searchsorted` on its date, so the adjustment is one vectorized pass over the ledger.
+
+    :param txn_df: DataFrame containing transaction data.
+    :param actions: Corporate actions, see `load_corporate_actions`.
+    :param holdings_df: DataFrame containing holdings data (optional).
+    :param holdings_date: The date of the holdings data, required with holdings_df.
+    :return: The adjusted transaction and holdings data. 'Original Symbol' keeps the symbol as traded.
+    """
+    share_changes = actions[actions['Type'].isin([CorporateActionType.SPLIT, CorporateActionType.CONSOLIDATION])]
+    # a share change applies to the rows before it, so its symbol is resolved like theirs
+    share_changes = share_changes.assign(
+        Symbol=canonical_symbols(actions, share_changes['Symbol'], share_changes['Date']))
+    factors = {symbol: (group['Date'].to_numpy(), _suffix_products(group['Ratio'].to_numpy()))
+               for symbol, group in share_changes.groupby('Symbol')}
+
+    txn_df = _adjust(txn_df, txn_df['Date'], actions, factors, {'Quantity': 1, 'Dividend Shares': 1, 'Price': -1})
+    if holdings_df is not None:
+        holdings_dates = pd.Series(pd.Timestamp(holdings_date), index=holdings_df.index)
+        holdings_df = _adjust(holdings_df, holdings_dates, actions, factors, {'Quantity': 1, 'AverageCost': -1})
+    return txn_df, holdings_df
+
+
+def _suffix_products(ratios: np.ndarray) -> np.ndarray:
+    # factor of a row preceding action i is the product of ratios i..n-1; rows after every action get 1
+    return np.append(np.cumprod(ratios[::-1])[::-1], 1.0)
+
+
+def _adjust(df: pd.DataFrame, dates: pd.Series, actions: pd.DataFrame,
+            factors: Dict[str, Tuple[np.ndarray, np.ndarray]], columns: Dict[str, int]) -> pd.DataFrame:
+    symbols = canonical_symbols(actions, df['Symbol'], dates)
+    rows_by_symbol = pd.Series(np.arange(len(df))).groupby(symbols.to_numpy()).indices
+    dates = dates.to_numpy()
+    factor = np.ones(len(df))
+    for symbol, (action_dates, products) in factors.items():
+        rows = rows_by_symbol.get(symbol)
+        if rows is not None:
+            factor[rows] = products[np.searchsorted(action_dates, dates[rows], side='right')]
+
+    adjusted = {'Original Symbol': df['Symbol'], 'Symbol': symbols}
+    for column, power in columns.items():
+        if column in df.columns:
+            adjusted[column] = df[column] * factor ** power
+    return df.assign(**adjusted)
@@ -0,0 +1,32 @@
+import re
+
+import pandas as pd
+
+# e.g. "JPMORGAN CHASE & CO CASH DIV ON 16 SHS REC 10/04/24 PAY 10/31/24"
+DIVIDEND_DESCRIPTION_PATTERN = re.compile(
+    r'DIV ON (?P<shares>[\d,]+(?:\.\d+)?) SHS REC (?P<record>\d{2}/\d{2}/\d{2}) PAY (?P<pay>\d{2}/\d{2}/\d{2})',
+    re.IGNORECASE)
+WITHHOLDING_TAX_PATTERN = re.compile(r'TAX WITHHELD|NON-RES TAX|WITHHOLDING TAX', re.IGNORECASE)
+
+DIVIDEND_DESCRIPTION_COLUMNS = ['Dividend Shares', 'Record Date', 'Pay Date', 'Withholding Tax']
+
+
+def parse_dividend_description(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Extract the share count, record date and pay date of dividend rows, and flag withholding tax rows,
+    from the 'Description' column. Extraction runs once over the whole frame with precompiled patterns.
+
+    :param df: Transaction data with 'Description' and 'Activity Type' columns.
+    :return: The transaction data with the DIVIDEND_DESCRIPTION_COLUMNS added (NaN/NaT/False for other rows).
+    """
+    is_dividend = df['Activity Type'] == 'Dividends'
+    descriptions = df['Description'].where(is_dividend).astype('string')
+
+    fields = descriptions.str.extract(DIVIDEND_DESCRIPTION_PATTERN)
+    return df.assign(**{
+        'Dividend Shares': pd.to_numeric(fields['shares'].str.replace(',', '', regex=False)).astype(float),
+        'Record Date': pd.to_datetime(fields['record'], format='%m/%d/%y'),
+        'Pay Date': pd.to_datetime(fields['pay'], format='%m/%d/%y'),
+        'Withholding Tax': descriptions.str.contains(WITHHOLDING_TAX_PATTERN).fillna(False).astype(bool)
+                           | (is_dividend & (df['Net Amount'] < 0)),
+    })
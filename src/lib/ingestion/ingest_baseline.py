@@ -1,35 +1,131 @@
 import logging
 import os
+import re
 from datetime import datetime
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Tuple, Union
 import pandas as pd
+from lib.backend import polars_backend
+from lib.ingestion.ledger_store import LedgerStore
 from lib.model.enum.account_category import AccountCategory
 from lib.model.enum.account_name import AccountName
+from lib.model.enum.backend import Backend
 from lib.logger.logger import get_logger
 
-def ingest_baseline(date: datetime.date, filepath: str) -> Dict[str, pd.DataFrame]:
+def ingest_baseline(date: datetime.date, filepath: str, store: Optional[LedgerStore] = None,
+                    backend: Backend = Backend.PANDAS) -> Dict[str, Union[pd.DataFrame, 'polars.LazyFrame']]:
     """
-    Preprocess the baseline data for the given date.
+    Preprocess the baseline data for the given date. Statement file names are matched case-insensitively
+    against the account names, see `statement_files`.
 
     :param date: The date for which the baseline data is to be processed.
     :param filepath: The directory path where the CSV files are located.
+    :param store: If given, the baseline holdings are also bulk inserted into the ledger store.
+    :param backend: With Backend.POLARS, the values are Polars LazyFrames instead.
     :return: A dictionary with account name as key and a pandas DataFrame as value.
     """
     logger = get_logger()
     result = {}
+    paths = {}
 
+    statements = {account_name: path for path, account_name, _ in statement_files(filepath, date=date)}
     for account_name in AccountName:
-        path = f'{filepath}/{account_name.lower()}-{date.strftime("%Y%m%d")}.csv'
-        if not os.path.exists(path):
-            logger.error(f'File {path} does not exist.')
+        path = statements.get(account_name)
+        if path is None:
+            logger.error('No statement of %s dated %s in %s.', account_name, date.strftime('%Y-%m-%d'), filepath)
+            continue
+
+        account_category = account_category_of(account_name)
+
+        if backend == Backend.POLARS:
+            paths[account_name.name] = (path, account_category)
             continue
 
         df = pd.read_csv(path)
-        if account_name == AccountName.TFSA or account_name == AccountName.RRSP:
-            df['Account Category'] = AccountCategory.TFSA_RRSP
-        else:
-            df['Account Category'] = AccountCategory.MARGIN
+        df['Account Category'] = account_category
 
         result[account_name.name] = df
 
-    return result
\ No newline at end of file
+    if backend == Backend.POLARS:
+        result = polars_backend.scan_baseline(paths)
+        if store is not None:
+            store.insert_baseline(date, {account_name: polars_backend.to_pandas(holdings)
+                                         for account_name, holdings in result.items()})
+        return result
+
+    if store is not None:
+        store.insert_baseline(date, result)
+
+    return result
+
+
+# e.g. "Margin-20240131.csv", one holdings statement per account and date
+STATEMENT_FILENAME_PATTERN = re.compile(r'^(?P<account>[A-Za-z]+)-(?P<date>\d{8})\.csv$')
+_ACCOUNT_NAMES = {account_name.lower(): account_name for account_name in AccountName}
+
+
+def parse_statement_filename(filename: str) -> Optional[Tuple[AccountName, datetime]]:
+    """
+    :param filename: File name of a holdings statement, matched case-insensitively against the account names.
+    :return: The account name and statement date, or None if the file is not a holdings statement.
+    """
+    match = STATEMENT_FILENAME_PATTERN.match(filename)
+    if match is None:
+        return None
+    account_name = _ACCOUNT_NAMES.get(match['account'].lower())
+    if account_name is None:
+        return None
+    return account_name, datetime.strptime(match['date'], '%Y%m%d')
+
+
+def statement_files(filepath: str, date: Optional[datetime] = None,
+                    after: Optional[datetime] = None) -> List[Tuple[str, AccountName, datetime]]:
+    """
+    The holdings statements of a directory, the lookup shared by `ingest_baseline` and `ingest_statements`.
+
+    :param filepath: The directory path where the CSV files are located.
+    :param date: Only the statements of this date (optional).
+    :param after: Only the statements dated after this date (optional).
+    :return: Path, account name and statement date of each statement, sorted by file name.
+    """
+    statements = []
+    for entry in sorted(os.scandir(filepath), key=lambda entry: entry.name):
+        parsed = parse_statement_filename(entry.name)
+        if parsed is None:
+            continue
+        account_name, statement_date = parsed
+        if date is not None and statement_date.date() != pd.Timestamp(date).date():
+            continue
+        if after is not None and statement_date <= after:
+            continue
+        statements.append((entry.path, account_name, statement_date))
+    return statements
+
+
+def ingest_statements(filepath: str, after: Optional[datetime] = None) -> pd.DataFrame:
+    """
+    Load every holdings statement of the directory, e.g. the monthly statements following a baseline.
+    File names are matched case-insensitively against the account names.
+
+    :param filepath: The directory path where the CSV files are located.
+    :param after: Only load statements dated after this date (optional).
+    :return: DataFrame with 'Statement Date' and 'Account Category' added to the statement columns, sorted by
+             statement date.
+    """
+    statements = []
+    for path, account_name, statement_date in statement_files(filepath, after=after):
+        df = pd.read_csv(path)
+        df['Statement Date'] = statement_date
+        df['Account Category'] = account_category_of(account_name)
+        statements.append(df)
+
+    if not statements:
+        return pd.DataFrame(columns=['Statement Date', 'Symbol', 'Quantity', 'AverageCost', 'Account Category'])
+    return pd.concat(statements, ignore_index=True).sort_values(by='Statement Date', kind='stable') \
+        .reset_index(drop=True)
+
+
+def account_category_of(account_name: AccountName) -> AccountCategory:
+    """The account category whose holdings an account's statements hold."""
+    if account_name == AccountName.TFSA or account_name == AccountName.RRSP:
+        return AccountCategory.TFSA_RRSP
+    return AccountCategory.MARGIN
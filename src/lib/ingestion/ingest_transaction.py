@@ -1,22 +1,71 @@
+from typing import Optional, Union
+
 import pandas as pd
 
+from lib.backend import polars_backend
+from lib.ingestion.dividend_description import parse_dividend_description
+from lib.ingestion.ledger_store import LedgerStore
 from lib.model.enum.account_category import AccountCategory
+from lib.model.enum.backend import Backend
 
 
-def ingest_transaction(filepath: str) -> pd.DataFrame:
+def ingest_transaction(filepath: str, store: Optional[LedgerStore] = None,
+                       backend: Backend = Backend.PANDAS) -> Union[pd.DataFrame, 'polars.LazyFrame']:
     """
     Preprocess the transaction data by
     - filtering out DLR and CAD transactions.
     - categorize the account type.
+    - parse the dividend share count, record/pay date and withholding tax from the description.
     - sort by Settlement date, and keep this column as 'Date'.
 
     :param filepath:
+    :param store: If given, the preprocessed transactions are also bulk inserted into the ledger store.
+    :param backend: With Backend.POLARS, a Polars LazyFrame of the same rows is returned instead, see
+                    `lib.backend.polars_backend.scan_transaction`.
     :return:
     """
+    if backend == Backend.POLARS:
+        ledger = polars_backend.scan_transaction(filepath)
+        if store is not None:
+            store.insert_transactions(polars_backend.to_pandas(ledger), source=filepath)
+        return ledger
+
     df = pd.read_csv(filepath)
+    df = preprocess_transaction(df)
+    df = df.sort_values(by='Date', kind='stable').reset_index(drop=True)
+    if store is not None:
+        store.insert_transactions(df, source=filepath)
+    return df
+
+
+def ingest_transaction_to_store(filepath: str, store: LedgerStore, chunksize: int = 100_000) -> int:
+    """
+    Stream a transaction file into the ledger store chunk by chunk, so that files larger than memory
+    can be imported. Ordering is left to the store's indexed queries.
+
+    :param filepath:
+    :param store:
+    :param chunksize: Number of CSV rows parsed per chunk.
+    :return: Number of rows inserted.
+    """
+    inserted = 0
+    store.delete_source(filepath)
+    for chunk in pd.read_csv(filepath, chunksize=chunksize):
+        chunk = preprocess_transaction(chunk)
+        store.insert_transactions(chunk, source=filepath, replace=False)
+        inserted += len(chunk)
+    return inserted
+
+
+def preprocess_transaction(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Row-local preprocessing shared by in-memory and streaming ingestion.
+
+    :param df: Raw transaction rows as exported by Questrade.
+    :return:
+    """
     df['Date'] = pd.to_datetime(df['Settlement Date'], format='%Y-%m-%d %I:%M:%S %p')
     df = df[~df['Description'].str.contains('DLR', case=False, na=False)]
     df = df[~df['Currency'].str.contains('CAD', case=False, na=False)]
     df['Account Category'] = df['Account Type'].apply(AccountCategory.categorize)
-    df = df.sort_values(by='Date').reset_index(drop=True)
-    return df
+    return parse_dividend_description(df)
@@ -0,0 +1,278 @@
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from lib.model.enum.account_category import AccountCategory
+
+# Ledger DataFrame column -> ledger table column
+TRANSACTION_COLUMNS = {
+    'Transaction Date': 'transaction_date',
+    'Settlement Date': 'settlement_date',
+    'Date': 'date',
+    'Action': 'action',
+    'Symbol': 'symbol',
+    'Description': 'description',
+    'Quantity': 'quantity',
+    'Price': 'price',
+    'Gross Amount': 'gross_amount',
+    'Commission': 'commission',
+    'Net Amount': 'net_amount',
+    'Currency': 'currency',
+    'Account #': 'account_number',
+    'Activity Type': 'activity_type',
+    'Account Type': 'account_type',
+    'Account Category': 'account_category',
+    'Dividend Shares': 'dividend_shares',
+    'Record Date': 'record_date',
+    'Pay Date': 'pay_date',
+    'Withholding Tax': 'withholding_tax',
+}
+
+# Baseline DataFrame column -> baseline table column
+BASELINE_COLUMNS = {
+    'Symbol': 'symbol',
+    'Description': 'description',
+    'Quantity': 'quantity',
+    'AverageCost': 'average_cost',
+    'Account Category': 'account_category',
+}
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    source TEXT,
+    transaction_date TEXT,
+    settlement_date TEXT,
+    date TEXT,
+    action TEXT,
+    symbol TEXT,
+    description TEXT,
+    quantity REAL,
+    price REAL,
+    gross_amount REAL,
+    commission REAL,
+    net_amount REAL,
+    currency TEXT,
+    account_number TEXT,
+    activity_type TEXT,
+    account_type TEXT,
+    account_category TEXT,
+    dividend_shares REAL,
+    record_date TEXT,
+    pay_date TEXT,
+    withholding_tax INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_category_activity_symbol_date
+    ON transactions (account_category, activity_type, symbol, date);
+CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date);
+CREATE INDEX IF NOT EXISTS idx_transactions_source ON transactions (source);
+
+CREATE TABLE IF NOT EXISTS baseline (
+    baseline_date TEXT,
+    account_name TEXT,
+    symbol TEXT,
+    description TEXT,
+    quantity REAL,
+    average_cost REAL,
+    account_category TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_baseline_date_category ON baseline (baseline_date, account_category, symbol);
+"""
+
+
+class LedgerStore:
+    """
+    Persistent ledger database backed by an in-process SQLite file.
+
+    Transactions and baseline holdings are bulk inserted on import, and readers push their filters
+    (account category, activity type, symbol, date range) down into indexed SQL queries so that only
+    the slice a processor needs is materialized as a DataFrame. Aggregations run inside SQLite and
+    never load the full ledger into memory.
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        """
+        :param path: Path of the database file. Defaults to a transient in-memory database.
+        """
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> "LedgerStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def insert_transactions(self, df: pd.DataFrame, source: Optional[str] = None, replace: bool = True) -> None:
+        """
+        Bulk insert preprocessed transaction rows. By default rows previously imported from the same
+        source are replaced, so re-importing a file is idempotent.
+
+        :param df: Preprocessed transaction DataFrame, see `ingest_transaction`.
+        :param source: Identifier of the imported file.
+        :param replace: Delete the rows previously imported from `source` first.
+        """
+        columns = [column for column in TRANSACTION_COLUMNS if column in df.columns]
+        rows = df[columns].copy()
+        for column in ('Date', 'Record Date', 'Pay Date'):
+            if column in rows.columns:
+                rows[column] = rows[column].dt.strftime(DATE_FORMAT)
+        rows = rows.astype(object).where(rows.notna(), None)
+
+        placeholders = ', '.join('?' for _ in range(len(columns) + 1))
+        sql_columns = ', '.join(['source'] + [TRANSACTION_COLUMNS[column] for column in columns])
+        with self._connection:
+            if replace and source is not None:
+                self._connection.execute('DELETE FROM transactions WHERE source = ?', (source,))
+            self._connection.executemany(f'INSERT INTO transactions ({sql_columns}) VALUES ({placeholders})',
+                                         ((source, *row) for row in rows.itertuples(index=False, name=None)))
+
+    def delete_source(self, source: str) -> None:
+        """
+        Delete all transactions imported from the given source.
+
+        :param source: Identifier of the imported file.
+        """
+        with self._connection:
+            self._connection.execute('DELETE FROM transactions WHERE source = ?', (source,))
+
+    def insert_baseline(self, date: datetime.date, baseline: Dict[str, pd.DataFrame]) -> None:
+        """
+        Bulk insert the baseline holdings of the given date, replacing any previous import of that date.
+
+        :param date: The baseline date.
+        :param baseline: Account name -> holdings DataFrame, see `ingest_baseline`.
+        """
+        baseline_date = date.strftime('%Y-%m-%d')
+        with self._connection:
+            self._connection.execute('DELETE FROM baseline WHERE baseline_date = ?', (baseline_date,))
+            for account_name, df in baseline.items():
+                rows = pd.DataFrame({column: df[column] if column in df.columns else None
+                                     for column in BASELINE_COLUMNS})
+                rows = rows.astype(object).where(rows.notna(), None)
+                self._connection.executemany(
+                    f'INSERT INTO baseline (baseline_date, account_name, {", ".join(BASELINE_COLUMNS.values())}) '
+                    f'VALUES (?, ?, {", ".join("?" for _ in BASELINE_COLUMNS)})',
+                    ((baseline_date, account_name, *row) for row in rows.itertuples(index=False, name=None)))
+
+    def query_transactions(self,
+                           account_category: Optional[AccountCategory] = None,
+                           activity_types: Optional[Iterable[str]] = None,
+                           symbols: Optional[Iterable[str]] = None,
+                           start_date: Optional[datetime] = None,
+                           end_date: Optional[datetime] = None) -> pd.DataFrame:
+        """
+        Load the transactions matching all the given filters, sorted by date.
+
+        :param account_category:
+        :param activity_types: e.g. ['Trades', 'Dividends']
+        :param symbols:
+        :param start_date: Inclusive lower bound on 'Date'.
+        :param end_date: Inclusive upper bound on 'Date'.
+        :return: Transaction DataFrame with the same columns as `ingest_transaction`.
+        """
+        where, params = self._where(account_category, activity_types, symbols, start_date, end_date)
+        select = ', '.join(f'{column} AS "{name}"' for name, column in TRANSACTION_COLUMNS.items())
+        df = pd.read_sql_query(f'SELECT {select} FROM transactions {where} ORDER BY date, rowid',
+                               self._connection, params=params)
+        for column in ('Date', 'Record Date', 'Pay Date'):
+            df[column] = pd.to_datetime(df[column], format=DATE_FORMAT)
+        df['Account Category'] = df['Account Category'].map(AccountCategory)
+        df['Withholding Tax'] = df['Withholding Tax'].fillna(0).astype(bool)
+        return df
+
+    def query_baseline(self, date: datetime.date,
+                       account_category: Optional[AccountCategory] = None) -> pd.DataFrame:
+        """
+        Load the baseline holdings of the given date.
+
+        :param date: The baseline date.
+        :param account_category:
+        :return: Holdings DataFrame with Symbol, Description, Quantity, AverageCost, Account Category.
+        """
+        select = ', '.join(f'{column} AS "{name}"' for name, column in BASELINE_COLUMNS.items())
+        sql = f'SELECT {select} FROM baseline WHERE baseline_date = ?'
+        params = [date.strftime('%Y-%m-%d')]
+        if account_category is not None:
+            sql += ' AND account_category = ?'
+            params.append(str(account_category))
+        df = pd.read_sql_query(sql, self._connection, params=params)
+        df['Account Category'] = df['Account Category'].map(AccountCategory)
+        return df
+
+    def date_range(self) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+        """
+        :return: The first and last transaction 'Date' in the store.
+        """
+        first_date, last_date = self._connection.execute('SELECT MIN(date), MAX(date) FROM transactions').fetchone()
+        return (pd.to_datetime(first_date, format=DATE_FORMAT) if first_date else None,
+                pd.to_datetime(last_date, format=DATE_FORMAT) if last_date else None)
+
+    def dividend_totals(self,
+                        start_date: Optional[datetime] = None,
+                        end_date: Optional[datetime] = None,
+                        by_symbol: bool = False) -> pd.DataFrame:
+        """
+        Total dividends per account category (and symbol), aggregated inside the database.
+
+        :param start_date:
+        :param end_date:
+        :param by_symbol: Also group by symbol.
+        :return: DataFrame with Account Category, [Symbol,] Total Dividends
+        """
+        where, params = self._where(None, ['Dividends'], None, start_date, end_date)
+        group = 'account_category, symbol' if by_symbol else 'account_category'
+        select = 'account_category AS "Account Category"' + (', symbol AS "Symbol"' if by_symbol else '')
+        df = pd.read_sql_query(f'SELECT {select}, SUM(net_amount) AS "Total Dividends" FROM transactions {where} '
+                               f'GROUP BY {group} ORDER BY {group}', self._connection, params=params)
+        df['Account Category'] = df['Account Category'].map(AccountCategory)
+        return df
+
+    def daily_rollup(self,
+                     start_date: Optional[datetime] = None,
+                     end_date: Optional[datetime] = None,
+                     account_category: Optional[AccountCategory] = None) -> pd.DataFrame:
+        """
+        Daily totals per account category and activity type, aggregated inside the database.
+
+        :param start_date:
+        :param end_date:
+        :param account_category:
+        :return: DataFrame with Date, Account Category, Activity Type, Net Amount, Commission, Count
+        """
+        where, params = self._where(account_category, None, None, start_date, end_date)
+        df = pd.read_sql_query(
+            f'SELECT substr(date, 1, 10) AS "Date", account_category AS "Account Category", '
+            f'activity_type AS "Activity Type", SUM(net_amount) AS "Net Amount", '
+            f'SUM(commission) AS "Commission", COUNT(*) AS "Count" FROM transactions {where} '
+            f'GROUP BY 1, 2, 3 ORDER BY 1, 2, 3', self._connection, params=params)
+        df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+        df['Account Category'] = df['Account Category'].map(AccountCategory)
+        return df
+
+    @staticmethod
+    def _where(account_category, activity_types, symbols, start_date, end_date):
+        clauses = []
+        params = []
+        if account_category is not None:
+            clauses.append('account_category = ?')
+            params.append(str(account_category))
+        for column, values in (('activity_type', activity_types), ('symbol', symbols)):
+            if values is not None:
+                values = list(values)
+                clauses.append(f'{column} IN ({", ".join("?" for _ in values)})')
+                params.extend(values)
+        if start_date is not None:
+            clauses.append('date >= ?')
+            params.append(pd.Timestamp(start_date).strftime(DATE_FORMAT))
+        if end_date is not None:
+            clauses.append('date <= ?')
+            params.append(pd.Timestamp(end_date).strftime(DATE_FORMAT))
+        return ('WHERE ' + ' AND '.join(clauses)) if clauses else '', params
@@ -1,9 +1,26 @@
+import atexit
+import json
 import logging
+import queue
 import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
 
 from lib.model.enum.stage import Stage
 
 _log_instance = None
+_queue_listener: Optional[QueueListener] = None
+# the handler added by initialize_logger, and whether it is the structured one
+_handler: Optional[logging.Handler] = None
+_structured = False
+
+# Default sampling of structured logging: per message type, the first RATE_LIMIT_BURST records of every
+# RATE_LIMIT_INTERVAL seconds are written, then one in RATE_LIMIT_SAMPLE_EVERY.
+RATE_LIMIT_BURST = 10
+RATE_LIMIT_INTERVAL = 60.0
+RATE_LIMIT_SAMPLE_EVERY = 1000
 
 
 def get_logger() -> logging.Logger:
@@ -20,26 +37,137 @@ def get_logger() -> logging.Logger:
     return _log_instance
 
 
-def initialize_logger(stage: Stage) -> logging.Logger:
+def initialize_logger(stage: Stage, structured: bool = False) -> logging.Logger:
     """
     Initializes the logger with the appropriate logging level based on the stage.
 
+    By default records are formatted and written inline by a StreamHandler. In structured mode the
+    caller only enqueues records through a QueueHandler; a QueueListener thread formats them as JSON
+    lines and writes them, and a RateLimitFilter samples repeated message types before they are queued.
+    Initializing again in the other mode replaces the handler added by the previous initialization.
+
     :param stage: The current environment stage (DEV, UAT, PROD).
+    :param structured: Use non-blocking, sampled JSON logging.
     :return: An initialized logger instance.
     """
+    global _handler, _structured
     logger = logging.getLogger(__name__)
     logging_level = logging.INFO if stage == Stage.PROD else logging.DEBUG
     logger.setLevel(logging_level)
 
-    if not logger.hasHandlers():
+    # only the handler added here is checked: handlers of other loggers, e.g. the root logger, are left alone
+    if _handler in logger.handlers and _structured != structured:
+        _remove_handler(logger)
+
+    if _handler not in logger.handlers:
         console_handler: logging.Handler = logging.StreamHandler()
         console_handler.setLevel(logging_level)
 
-        formatter: logging.Formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        console_handler.setFormatter(formatter)
-
-        logger.addHandler(console_handler)
+        if structured:
+            console_handler.setFormatter(JsonFormatter())
+            _handler = _start_queue_listener(console_handler, logging_level)
+        else:
+            formatter: logging.Formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            console_handler.setFormatter(formatter)
+            _handler = console_handler
+        _structured = structured
+        logger.addHandler(_handler)
+    else:
+        _handler.setLevel(logging_level)
 
     global _log_instance
     _log_instance = logger
     return logger
+
+
+def _remove_handler(logger: logging.Logger) -> None:
+    """Remove the handler added by initialize_logger, after writing the records still queued."""
+    global _queue_listener
+    logger.removeHandler(_handler)
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        atexit.unregister(_queue_listener.stop)
+        _queue_listener = None
+
+
+def _start_queue_listener(handler: logging.Handler, logging_level: int) -> logging.Handler:
+    global _queue_listener
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _DeferredQueueHandler(log_queue)
+    queue_handler.setLevel(logging_level)
+    queue_handler.addFilter(RateLimitFilter())
+
+    _queue_listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _queue_listener.start()
+    atexit.register(_queue_listener.stop)  # flush the queue on exit
+    return queue_handler
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that enqueues records as they are: the message and the traceback are only formatted by
+    the listener thread, and the JSON output keeps the unformatted message template and the exception.
+
+    The arguments of a record are formatted after the call returns, so they must not be mutated later on.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'template': str(record.msg),
+            'module': record.module,
+            'line': record.lineno,
+        }
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed'] = record.suppressed
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Per message type (level and unformatted message template) rate limiting with sampling: within every
+    `interval` seconds the first `burst` records pass, after which only every `sample_every`-th record
+    passes (none if 0). The next record passing after a suppression carries the suppressed count.
+
+    Rejected records are dropped before their message is formatted or queued.
+    """
+
+    def __init__(self, burst: int = RATE_LIMIT_BURST, interval: float = RATE_LIMIT_INTERVAL,
+                 sample_every: int = RATE_LIMIT_SAMPLE_EVERY):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.sample_every = sample_every
+        self._lock = threading.Lock()
+        # message type -> [window start, records seen in window, records suppressed since last pass]
+        self._windows: Dict[Tuple[int, str], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.levelno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                window = self._windows[key] = [now, 0, window[2] if window else 0]
+            window[1] += 1
+            seen = window[1]
+            allowed = seen <= self.burst or (self.sample_every > 0 and (seen - self.burst) % self.sample_every == 0)
+            if not allowed:
+                window[2] += 1
+                return False
+            record.suppressed, window[2] = window[2], 0
+        return True
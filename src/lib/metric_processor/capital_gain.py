@@ -1,10 +1,15 @@
 import datetime
 from dataclasses import dataclass, astuple
-from typing import Dict, TypedDict
+from typing import Dict, Optional, TypedDict
 
+import numpy as np
 import pandas as pd
 
+from lib.backend import polars_backend
 from lib.metric_processor.base import BaseProcessor
+from lib.metric_processor.position_book import PositionBook
+from lib.metric_processor.superficial_loss import SUPERFICIAL_LOSS_CATEGORIES, SUPERFICIAL_LOSS_WINDOW, \
+    ReplacementShares
 
 from lib.model.position import Position
 
@@ -12,18 +17,40 @@ from lib.model.enum.action import Action
 
 from lib.model.enum.account_category import AccountCategory
 
+from lib.validation.ledger_validator import QUANTITY_TOLERANCE, LedgerReport, validate_ledger
+
+DAILY_REALIZED_SYMBOLS_COLUMNS = ['Date', 'Symbol', 'Realized', 'Denied Loss', 'Row']
+POSITION_HISTORY_COLUMNS = ['Date', 'Symbol', 'Quantity', 'Average Cost']
+
 
 class CapitalGainProcessor(BaseProcessor):
-    def __init__(self, holdings_df: pd.DataFrame, holdings_date: datetime.datetime):
+    def __init__(self, holdings_df: pd.DataFrame, holdings_date: datetime.datetime,
+                 ledger_report: Optional[LedgerReport] = None):
+        """
+        :param holdings_df:
+        :param holdings_date:
+        :param ledger_report: Validation report of the whole ledger (optional). Without it, each processed
+                              slice is validated, and its anomalies logged, before processing.
+        """
         super().__init__()
+        if polars_backend.is_polars_frame(holdings_df):
+            holdings_df = polars_backend.to_pandas(holdings_df)
         self.holdings_df = holdings_df
         self.holdings_date = pd.Timestamp(holdings_date)
+        self.ledger_report = ledger_report
 
     @dataclass
     class RealizedGainResult:
         total_realized: float
         daily_realized: pd.DataFrame  # Date, Realized Gain, Realized Loss
-        daily_realized_symbols: pd.DataFrame  # Date, Symbol, Realized (represented as a positive number for gain, negative for loss)
+        # Date, Symbol, Realized (represented as a positive number for gain, negative for loss, net of the denied
+        # superficial loss), Denied Loss, Row (index label of the sell in the ledger)
+        daily_realized_symbols: pd.DataFrame
+        # same columns, for every sell after the holdings date up to the end date, including the sells before the
+        # start date
+        realized_history: pd.DataFrame
+        # Date, Symbol, Quantity, Average Cost of the position after each trade applied after the holdings date
+        position_history: pd.DataFrame
 
     def process(self, df: pd.DataFrame,
                 start_date: pd.Timestamp,
@@ -34,7 +61,18 @@ class CapitalGainProcessor(BaseProcessor):
         1. the total realized gain for the given date range.
         2. the daily realized gain and loss for each day in the date range.
 
-        :param df:
+        Superficial losses of the taxable account categories (SUPERFICIAL_LOSS_CATEGORIES) are denied while
+        trades are applied, see ReplacementShares and PositionBook: the realized gains are net of the denied
+        losses, which are added to the ACB of the replacement shares.
+
+        Orphan sells, oversells and unknown actions reported by the ledger validator are skipped, so the
+        trade loop below does no checks; negative positions left by sells the report missed are logged once
+        the loop is done.
+
+        A Polars (lazy) frame is processed by `polars_backend.realized_gains`; its anomalies are matched by
+        the ROW_INDEX column instead of the index.
+
+        :param df: pandas DataFrame, or Polars DataFrame/LazyFrame.
         :param start_date:
         :param end_date:
         :param account_category:
@@ -47,97 +85,89 @@ class CapitalGainProcessor(BaseProcessor):
             symbol = row['Symbol']
             positions[symbol] = Position(quantity=row['Quantity'], avg_price=row['AverageCost'])
 
-        # init dataframe
-        daily_realized = pd.DataFrame(columns=['Date', 'Realized Gain', 'Realized Loss'])
-        daily_realized['Date'] = pd.date_range(start=start_date, end=end_date)
-        daily_realized['Realized Gain'] = 0.00
-        daily_realized['Realized Loss'] = 0.00
-        daily_realized_symbols = pd.DataFrame(columns=['Date', 'Symbol', 'Realized'])
-        daily_realized_symbols['Realized'] = daily_realized_symbols['Realized'].astype(float)
-
-        trades = df[df['Activity Type'] == 'Trades']
-
-        before_trades = trades[(trades['Date'] > self.holdings_date)
-                               & (trades['Date'] < start_date)]
-        during_trades = trades[(trades['Date'] >= start_date) & (trades['Date'] <= end_date)]
-
-        # Process before_trades to establish cost basis
-        for i, row in before_trades.iterrows():
-            symbol, quantity, price, commission, action = astuple(self._get_row_data(row))
-
-            if row['Action'] == 'Buy':
-                total_cost = quantity * price + commission
-                if symbol not in positions:
-                    positions[symbol] = Position(quantity=quantity, avg_price=total_cost / quantity)
-                else:
-                    position = positions[symbol]
-                    total_quantity = position.quantity + quantity
-                    new_avg_price = (position.avg_price * position.quantity + total_cost) / total_quantity
-                    positions[symbol] = Position(quantity=total_quantity, avg_price=new_avg_price)
-
-
-            elif row['Action'] == 'Sell':
-                if symbol not in positions:
-                    self.logger.error(f"Sell transaction found for symbol {symbol} with no prior holdings on row {i}.")
-                    continue
-
-                position = positions[symbol]
-                if position.quantity < quantity:
-                    self.logger.error(f"Attempting to sell more shares than available for {symbol} on row {i}.")
-                    continue
-
-                # Reduce the position
-                positions[symbol].quantity -= quantity
-
-        total_realized = 0.0
-        for i, row in during_trades.iterrows():
+        deny_superficial_losses = account_category in SUPERFICIAL_LOSS_CATEGORIES
+        is_polars = polars_backend.is_polars_frame(df)
+        if is_polars:
+            df = polars_backend.with_row_index(df)
+
+        ledger_report = self.ledger_report
+        if ledger_report is None:
+            ledger_report = validate_ledger(polars_backend.to_pandas(df) if is_polars else df, holdings_data,
+                                            self.holdings_date, start_date)
+            ledger_report.log_summary(self.logger)
+
+        if is_polars:
+            total_realized, daily_realized, daily_realized_symbols, realized_history, position_history = (
+                polars_backend.realized_gains(df, positions, self.holdings_date, start_date, end_date,
+                                              ledger_report.invalid_trade_index, deny_superficial_losses))
+            self._log_negative_positions(position_history)
+            return self.RealizedGainResult(total_realized=total_realized,
+                                           daily_realized=daily_realized,
+                                           daily_realized_symbols=daily_realized_symbols,
+                                           realized_history=realized_history,
+                                           position_history=position_history)
+
+        trades = df[(df['Activity Type'] == 'Trades') & df['Action'].isin([Action.BUY, Action.SELL])]
+        trades = trades.drop(index=ledger_report.invalid_trade_index, errors='ignore')
+        # trades before the range establish the cost basis; buys shortly after it can replace losses
+        is_before = (trades['Date'] > self.holdings_date) & (trades['Date'] < start_date)
+        is_during = (trades['Date'] >= start_date) & (trades['Date'] <= end_date)
+        is_applied = is_before | is_during
+        is_replacement = ((trades['Date'] > end_date)
+                          & (trades['Date'] <= pd.Timestamp(end_date) + SUPERFICIAL_LOSS_WINDOW))
+        trades = trades[is_applied | is_replacement]
+
+        replacement_shares = None
+        if deny_superficial_losses:
+            replacement_shares = ReplacementShares(trades.assign(**{
+                'Signed Quantity': np.where(trades['Action'] == Action.BUY, 1.0, -1.0) * trades['Quantity'].abs()}),
+                {symbol: position.quantity for symbol, position in positions.items()})
+        book = PositionBook(positions, replacement_shares)
+        realized_symbols = {column: [] for column in DAILY_REALIZED_SYMBOLS_COLUMNS}
+        position_history = {column: [] for column in POSITION_HISTORY_COLUMNS}
+        for i, row in trades[is_applied[trades.index]].iterrows():
             symbol, quantity, price, commission, action = astuple(self._get_row_data(row))
 
-            if row['Action'] == 'Sell':
-                if symbol not in positions:
-                    self.logger.error(f"Sell transaction found for symbol {symbol} with no prior holdings on row {i}.")
-                    continue
-
-                position = positions[symbol]
-                if position.quantity < quantity:
-                    self.logger.error(f"Attempting to sell more shares than available for {symbol} on row {i}.")
-                    continue
-
-                # Calculate realized gain (subtract commission from proceeds)
-                proceeds = (price * quantity) - commission
-                cost_basis = position.avg_price * quantity
-                realized = proceeds - cost_basis
-                # Reduce the position
-                positions[symbol].quantity -= quantity
-
-                if realized > 0:
-                    daily_realized.loc[
-                        daily_realized['Date'] == row['Date'], 'Realized Gain'] += realized
-                else:
-                    daily_realized.loc[
-                        daily_realized['Date'] == row['Date'], 'Realized Loss'] -= realized
-
-                daily_realized_symbols = pd.concat([daily_realized_symbols, pd.DataFrame({
-                    'Date': [row['Date']],
-                    'Symbol': [symbol],
-                    'Realized': [realized]
-                })])
-
-                total_realized += realized
-
-            elif row['Action'] == 'Buy':
-                total_cost = quantity * price + commission
-                if symbol not in positions:
-                    positions[symbol] = Position(quantity=quantity, avg_price=total_cost / quantity)
-                else:
-                    position = positions[symbol]
-                    total_quantity = position.quantity + quantity
-                    new_avg_price = (position.avg_price * position.quantity + total_cost) / total_quantity
-                    positions[symbol] = Position(quantity=total_quantity, avg_price=new_avg_price)
-
-        return self.RealizedGainResult(total_realized=total_realized,
+            if action == Action.BUY:
+                book.buy(symbol, quantity, price, commission)
+            else:
+                realized, denied = book.sell(symbol, row['Date'], quantity, price, commission)
+                for column, value in zip(DAILY_REALIZED_SYMBOLS_COLUMNS, (row['Date'], symbol, realized, denied, i)):
+                    realized_symbols[column].append(value)
+            position = book.positions[symbol]
+            for column, value in zip(POSITION_HISTORY_COLUMNS,
+                                     (row['Date'], symbol, position.quantity, position.avg_price)):
+                position_history[column].append(value)
+
+        position_history = pd.DataFrame(position_history).astype({'Date': 'datetime64[ns]', 'Symbol': object,
+                                                                  'Quantity': float, 'Average Cost': float})
+        self._log_negative_positions(position_history)
+
+        realized_history = pd.DataFrame(realized_symbols).astype({'Date': 'datetime64[ns]', 'Symbol': object,
+                                                                  'Realized': float, 'Denied Loss': float,
+                                                                  'Row': 'int64'})
+        daily_realized_symbols = realized_history[is_during[realized_history['Row']].to_numpy()].reset_index(drop=True)
+        realized = daily_realized_symbols['Realized']
+        dates = daily_realized_symbols['Date']
+        daily_realized = pd.DataFrame({'Date': pd.date_range(start=start_date, end=end_date)})
+        daily_realized['Realized Gain'] = daily_realized['Date'].map(
+            realized.clip(lower=0).groupby(dates).sum()).fillna(0.0)
+        daily_realized['Realized Loss'] = daily_realized['Date'].map(
+            (-realized.clip(upper=0)).groupby(dates).sum()).fillna(0.0)
+
+        return self.RealizedGainResult(total_realized=float(realized.sum()),
                                        daily_realized=daily_realized,
-                                       daily_realized_symbols=daily_realized_symbols)
+                                       daily_realized_symbols=daily_realized_symbols,
+                                       realized_history=realized_history,
+                                       position_history=position_history)
+
+    def _log_negative_positions(self, position_history: pd.DataFrame) -> None:
+        negative = position_history[position_history['Quantity'] < -QUANTITY_TOLERANCE]
+        if not negative.empty:
+            first = negative.drop_duplicates(subset='Symbol')
+            self.logger.error("Sells missed by the ledger report left negative positions: %s",
+                              ', '.join(f"{symbol} on {date:%Y-%m-%d}"
+                                        for date, symbol in zip(first['Date'], first['Symbol'])))
 
     @dataclass
     class RowData:
@@ -1,22 +1,153 @@
-from dataclasses import dataclass
-from typing import Dict
+from dataclasses import dataclass, field
+import datetime
+from typing import Dict, Optional
 
 import pandas as pd
 
+from lib.backend import polars_backend
+from lib.ingestion.dividend_description import DIVIDEND_DESCRIPTION_COLUMNS, parse_dividend_description
 from lib.metric_processor.base import BaseProcessor
+from lib.metric_processor.capital_gain import CapitalGainProcessor
+
+from lib.model.enum.account_category import AccountCategory
+
+MONTHLY_DIVIDEND_COLUMNS = ['Month', 'Symbol', 'Gross Dividends', 'Withholding Tax', 'Net Dividends', 'Shares',
+                            'Dividend Per Share']
+YIELD_ON_COST_COLUMNS = ['Symbol', 'Gross Dividends', 'Cost Basis', 'Yield On Cost', 'Annualized Yield On Cost']
+DIVIDEND_PAYMENT_COLUMNS = ['Date', 'Symbol', 'Record Date', 'Gross Dividends']
 
 
 @dataclass
 class DividendResult:
     total_dividends: float
+    total_withholding_tax: float = 0.0
+    monthly_dividends: pd.DataFrame = field(
+        default_factory=lambda: pd.DataFrame(columns=MONTHLY_DIVIDEND_COLUMNS))
+    yield_on_cost: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(columns=YIELD_ON_COST_COLUMNS))
 
 
 class DividendProcessor(BaseProcessor):
+    def __init__(self, holdings_df: Optional[pd.DataFrame] = None,
+                 holdings_date: Optional[datetime.datetime] = None):
+        """
+        :param holdings_df: Baseline holdings (optional), the position book of the yield on cost.
+        :param holdings_date: The date of the holdings (optional). With it, the trades after the holdings date
+                              update the position book, see `process`.
+        """
+        super().__init__()
+        if polars_backend.is_polars_frame(holdings_df):
+            holdings_df = polars_backend.to_pandas(holdings_df)
+        self.holdings_df = holdings_df
+        self.holdings_date = holdings_date
+
     # ignore additional positional and keyword arguments
     def process(self, df: pd.DataFrame, start_date: pd.Timestamp, end_date: pd.Timestamp,
+                account_category: Optional[AccountCategory] = None, position_history: Optional[pd.DataFrame] = None,
                 *args, **kwargs) -> DividendResult:
+        """
+        Process the DataFrame to calculate
+        1. the total (net) dividends and withholding tax for the given date range.
+        2. the gross dividends, withholding tax, share count and dividend per share per symbol and month.
+        3. the yield on cost of each symbol against the cost basis of the holdings, when given.
+
+        Share counts come from the description fields parsed at ingestion; they are parsed here in one
+        vectorized pass only when the ledger was not ingested through `ingest_transaction`. The share count
+        of a month is the one held on its last record date, and its dividend per share adds up the dividend
+        per share of each payment.
+
+        The yield on cost adds up the yield of each payment on the cost basis (average cost x shares) of the
+        position held on its record date, from the position history of CapitalGainProcessor, else from the
+        baseline holdings.
+
+        A Polars (lazy) frame is aggregated by `polars_backend.monthly_dividends`.
+
+        :param df: pandas DataFrame, or Polars DataFrame/LazyFrame.
+        :param start_date:
+        :param end_date:
+        :param account_category: Selects the holdings used as position book for yield on cost.
+        :param position_history: `position_history` of CapitalGainProcessor for the account category (optional).
+                                 It is computed from the holdings when missing and the holdings date is given.
+        :return: DividendResult
+        """
+        if polars_backend.is_polars_frame(df):
+            total_dividends, monthly_dividends, payments = polars_backend.monthly_dividends(df, start_date, end_date)
+            if monthly_dividends is None:
+                return DividendResult(total_dividends=total_dividends)
+            return self._result(df, total_dividends, monthly_dividends, payments, start_date, end_date,
+                                account_category, position_history)
+
         dividends = df[df['Activity Type'] == 'Dividends']
-        total_dividends = dividends[
-            (dividends['Date'] >= start_date) & (dividends['Date'] <= end_date)
-            ]['Net Amount'].sum()
-        return DividendResult(total_dividends=total_dividends)
+        dividends = dividends[(dividends['Date'] >= start_date) & (dividends['Date'] <= end_date)]
+        total_dividends = dividends['Net Amount'].sum()
+        if 'Description' not in dividends.columns:
+            return DividendResult(total_dividends=total_dividends)
+
+        if not set(DIVIDEND_DESCRIPTION_COLUMNS).issubset(dividends.columns):
+            dividends = parse_dividend_description(dividends)
+
+        is_tax = dividends['Withholding Tax']
+        dividends = dividends.assign(**{
+            'Month': dividends['Date'].dt.to_period('M').dt.to_timestamp(),
+            'Gross Dividends': dividends['Net Amount'].where(~is_tax, 0.0),
+            'Withholding Tax': -dividends['Net Amount'].where(is_tax, 0.0),
+        })
+        dividends['Dividend Per Share'] = (dividends['Gross Dividends'] / dividends['Dividend Shares']).where(~is_tax)
+        monthly_dividends = dividends.sort_values(by='Record Date', kind='stable').groupby(
+            ['Month', 'Symbol'], as_index=False).agg(**{
+                'Gross Dividends': ('Gross Dividends', 'sum'),
+                'Withholding Tax': ('Withholding Tax', 'sum'),
+                'Shares': ('Dividend Shares', 'last'),
+                'Dividend Per Share': ('Dividend Per Share', 'sum'),
+                'Payments With Shares': ('Dividend Per Share', 'count'),
+            })
+        monthly_dividends['Dividend Per Share'] = monthly_dividends['Dividend Per Share'].where(
+            monthly_dividends['Payments With Shares'] > 0)
+        monthly_dividends['Net Dividends'] = monthly_dividends['Gross Dividends'] - monthly_dividends['Withholding Tax']
+        payments = dividends.loc[~is_tax, DIVIDEND_PAYMENT_COLUMNS]
+        return self._result(df, total_dividends, monthly_dividends, payments, start_date, end_date, account_category,
+                            position_history)
+
+    def _result(self, df, total_dividends: float, monthly_dividends: pd.DataFrame, payments: pd.DataFrame,
+                start_date: pd.Timestamp, end_date: pd.Timestamp, account_category: Optional[AccountCategory],
+                position_history: Optional[pd.DataFrame]) -> DividendResult:
+        if position_history is None and self.holdings_df is not None and self.holdings_date is not None:
+            position_history = CapitalGainProcessor(self.holdings_df, self.holdings_date).process(
+                df, start_date, end_date, account_category).position_history
+        return DividendResult(total_dividends=total_dividends,
+                              total_withholding_tax=monthly_dividends['Withholding Tax'].sum(),
+                              monthly_dividends=monthly_dividends[MONTHLY_DIVIDEND_COLUMNS],
+                              yield_on_cost=self._yield_on_cost(payments, start_date, end_date, account_category,
+                                                                position_history))
+
+    def _yield_on_cost(self, payments: pd.DataFrame, start_date: pd.Timestamp, end_date: pd.Timestamp,
+                       account_category: Optional[AccountCategory],
+                       position_history: Optional[pd.DataFrame]) -> pd.DataFrame:
+        if self.holdings_df is None:
+            return pd.DataFrame(columns=YIELD_ON_COST_COLUMNS)
+
+        holdings = self.holdings_df
+        if account_category is not None:
+            holdings = holdings[holdings['Account Category'] == account_category]
+        baseline_cost = (holdings['Quantity'] * holdings['AverageCost']).groupby(holdings['Symbol']).sum()
+
+        # the position on the record date (else the payment date): the last trade on or before it, else the baseline
+        payments = payments.assign(**{'Held On': payments['Record Date'].fillna(payments['Date'])
+                                      .astype('datetime64[ns]')})
+        cost_basis = payments['Symbol'].map(baseline_cost)
+        if position_history is not None and not position_history.empty:
+            held = pd.merge_asof(payments.rename_axis('Payment').reset_index().sort_values(by='Held On', kind='stable'),
+                                 position_history.sort_values(by='Date', kind='stable')
+                                 .rename(columns={'Date': 'Held On'}),
+                                 on='Held On', by='Symbol', direction='backward').set_index('Payment')
+            has_trades = held['Quantity'].notna()
+            cost_basis = (held['Quantity'] * held['Average Cost']).where(has_trades, cost_basis.reindex(held.index))
+            cost_basis = cost_basis.reindex(payments.index)
+        payment_yield = payments['Gross Dividends'] / cost_basis.where(cost_basis > 0)
+
+        yield_on_cost = payments.groupby('Symbol')['Gross Dividends'].sum().to_frame()
+        yield_on_cost['Yield On Cost'] = payment_yield.groupby(payments['Symbol']).sum(min_count=1)
+        # the cost basis the dividends were weighted against
+        yield_on_cost['Cost Basis'] = yield_on_cost['Gross Dividends'] / yield_on_cost['Yield On Cost']
+        years = ((pd.Timestamp(end_date) - pd.Timestamp(start_date)).days + 1) / 365
+        yield_on_cost['Annualized Yield On Cost'] = yield_on_cost['Yield On Cost'] / years
+        return yield_on_cost.reset_index()[YIELD_ON_COST_COLUMNS]
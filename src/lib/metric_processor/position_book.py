@@ -0,0 +1,55 @@
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from lib.metric_processor.superficial_loss import ReplacementShares
+from lib.model.position import Position
+from lib.validation.ledger_validator import QUANTITY_TOLERANCE
+
+
+class PositionBook:
+    """
+    Average cost positions of one account category, updated trade by trade in ledger order.
+
+    A loss replaced within the superficial loss window is partly denied: the denied loss is added to the
+    ACB of the position held after the sale, or of the next buy when the sale closes the position.
+    """
+
+    def __init__(self, positions: Dict[str, Position], replacement_shares: Optional[ReplacementShares] = None):
+        self.positions = positions
+        self.replacement_shares = replacement_shares
+        self._pending_adjustments: Dict[str, float] = {}
+
+    def buy(self, symbol: str, quantity: float, price: float, commission: float) -> None:
+        total_cost = quantity * price + commission + self._pending_adjustments.pop(symbol, 0.0)
+        position = self.positions.get(symbol)
+        if position is None:
+            self.positions[symbol] = Position(quantity=quantity, avg_price=total_cost / quantity)
+        else:
+            total_quantity = position.quantity + quantity
+            new_avg_price = (position.avg_price * position.quantity + total_cost) / total_quantity
+            self.positions[symbol] = Position(quantity=total_quantity, avg_price=new_avg_price)
+
+    def sell(self, symbol: str, date: pd.Timestamp, quantity: float, price: float,
+             commission: float) -> Tuple[float, float]:
+        """
+        Sells are validated by the ledger validator beforehand and are not checked here: a sell of unheld
+        shares leaves a negative quantity, which the caller can detect in its position history.
+
+        :return: The realized gain net of the denied loss, and the denied loss.
+        """
+        position = self.positions.setdefault(symbol, Position(quantity=0.0, avg_price=0.0))
+
+        # Calculate realized gain (subtract commission from proceeds)
+        realized = (price * quantity) - commission - position.avg_price * quantity
+        position.quantity -= quantity
+
+        denied = 0.0
+        if realized < 0 and self.replacement_shares is not None:
+            denied = -realized * self.replacement_shares.claim(symbol, date, quantity) / quantity
+            if denied > 0:
+                if position.quantity > QUANTITY_TOLERANCE:
+                    position.avg_price += denied / position.quantity
+                else:
+                    self._pending_adjustments[symbol] = self._pending_adjustments.get(symbol, 0.0) + denied
+        return realized + denied, denied
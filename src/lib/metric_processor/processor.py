@@ -1,14 +1,33 @@
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass, field, fields
 from datetime import datetime
-from typing import Optional, Dict
+from typing import Iterable, Optional, Dict
 
 import pandas as pd
 
+from lib.backend import polars_backend
+from lib.ingestion.corporate_actions import apply_corporate_actions
+from lib.ingestion.ledger_store import LedgerStore
 from lib.logger.logger import get_logger
 
 from lib.metric_processor.capital_gain import CapitalGainProcessor
 from lib.metric_processor.dividend import DividendProcessor
+from lib.metric_processor.rolling import RollingProcessor
+from lib.metric_processor.superficial_loss import SuperficialLossProcessor
 from lib.model.enum.account_category import AccountCategory
+from lib.validation.ledger_validator import LedgerReport, validate_ledger
+
+# Activity types consumed by the processors; everything else is left in the store
+PROCESSED_ACTIVITY_TYPES = ['Trades', 'Dividends']
+
+# Processors derived from the realized gains of the CapitalGainProcessor, which must run before them
+REALIZED_DERIVED_PROCESSORS = (SuperficialLossProcessor, RollingProcessor)
+
+# Processors that run on the Polars ledger when process_metrics is given a Polars frame
+POLARS_PROCESSORS = (CapitalGainProcessor, DividendProcessor)
+
+# Columns of the Polars ledger converted to pandas, for the validator and the processors without a Polars path
+PANDAS_STAGE_COLUMNS = ['Date', 'Account Category', 'Activity Type', 'Action', 'Symbol', 'Quantity', 'Price',
+                        'Commission', 'Net Amount']
 
 
 @dataclass
@@ -20,47 +39,170 @@ class MetricsResult:
     summary: Dict[str, any]
     daily_realized: pd.DataFrame
     daily_realized_symbols: pd.DataFrame
+    details: Dict[str, pd.DataFrame] = field(default_factory=dict)  # additional per-processor tables
 
 def process_metrics(txn_df: pd.DataFrame,
                     holdings_df: pd.DataFrame,
                     holdings_date: datetime.date,
                     start_date: Optional[str],
-                    end_date: Optional[str]) -> Dict[AccountCategory, MetricsResult]:
+                    end_date: Optional[str],
+                    corporate_actions: Optional[pd.DataFrame] = None,
+                    account_categories: Optional[Iterable[AccountCategory]] = None
+                    ) -> Dict[AccountCategory, MetricsResult]:
     """
     Process the transaction data to calculate various metrics for the given date range.
 
-    :param txn_df: DataFrame containing transaction data.
-    :param holdings_df: DataFrame containing holdings data.
+    Given Polars frames (see `Backend.POLARS`), the account category and activity type filters and the
+    column projection are pushed into the lazy query, which is collected once; POLARS_PROCESSORS run on it,
+    while validation and the other processors read its PANDAS_STAGE_COLUMNS converted to pandas through
+    Arrow. The results are pandas DataFrames for either backend.
+
+    :param txn_df: DataFrame containing transaction data, pandas or Polars (lazy).
+    :param holdings_df: DataFrame containing holdings data, pandas or Polars (lazy).
     :param holdings_date: The date of the holdings data.
     :param start_date: The start date for the metrics calculation (optional).
     :param end_date: The end date for the metrics calculation (optional).
+    :param corporate_actions: Splits, consolidations and symbol changes to adjust the ledger for (optional).
+    :param account_categories: Only process these account categories (optional, defaults to all). The
+                               default date range still spans the whole ledger.
     """
     logger = get_logger()
+    account_categories = list(AccountCategory) if account_categories is None else list(account_categories)
+
+    polars_ledger = None
+    if polars_backend.is_polars_frame(txn_df):
+        polars_ledger, first_date, last_date = polars_backend.processed_ledger(txn_df, account_categories,
+                                                                               PROCESSED_ACTIVITY_TYPES)
+        pandas_columns = [column for column in PANDAS_STAGE_COLUMNS if column in polars_ledger.columns]
+        txn_df = polars_backend.to_pandas(polars_ledger.select(polars_backend.ROW_INDEX, *pandas_columns))
+    else:
+        first_date, last_date = txn_df['Date'].min(), txn_df['Date'].max()
+    if polars_backend.is_polars_frame(holdings_df):
+        holdings_df = polars_backend.to_pandas(holdings_df)
 
     results = {}
-    start_date = pd.to_datetime(start_date) if start_date else txn_df['Date'].min()
-    end_date = pd.to_datetime(end_date) if end_date else txn_df['Date'].max()
+    start_date = pd.to_datetime(start_date) if start_date else first_date
+    end_date = pd.to_datetime(end_date) if end_date else last_date
     if holdings_date > start_date:
-        logger.error(f"Holdings date {holdings_date} is after start date {start_date}.")
+        logger.error("Holdings date %s is after start date %s.", holdings_date, start_date)
         raise ValueError(f"Holdings date {holdings_date} is after start date {start_date}.")
 
-    processors = [CapitalGainProcessor(holdings_df, holdings_date), DividendProcessor()]
+    if corporate_actions is not None:
+        if polars_ledger is not None:
+            # adjusted in pandas, like the pandas ledger
+            adjusted, holdings_df = apply_corporate_actions(polars_backend.to_pandas(polars_ledger),
+                                                            corporate_actions, holdings_df, holdings_date)
+            polars_ledger = polars_backend.from_pandas(adjusted)
+            txn_df = adjusted[pandas_columns]
+        else:
+            txn_df, holdings_df = apply_corporate_actions(txn_df, corporate_actions, holdings_df, holdings_date)
 
-    for account_category in AccountCategory:
-        summary = {}
-        daily_realized_df = None
-        daily_realized_symbols_df = None
+    if polars_ledger is None and len(account_categories) < len(AccountCategory):
+        txn_df = txn_df[txn_df['Account Category'].isin(account_categories)]
 
+    # Validate the whole ledger once, so that processors run without per-row checks
+    ledger_report = validate_ledger(txn_df, holdings_df, holdings_date, start_date)
+    ledger_report.log_summary(logger)
+
+    processors = _create_processors(holdings_df, holdings_date, ledger_report)
+    for account_category in account_categories:
         account_data = txn_df[txn_df['Account Category'] == account_category]
-        for processor in processors:
-            processor_result = processor.process(account_data, start_date, end_date, account_category)
-            processor_result_dict = asdict(processor_result)
-            if isinstance(processor, CapitalGainProcessor):
-                daily_realized_df = processor_result_dict.pop('daily_realized')
-                daily_realized_symbols_df = processor_result_dict.pop('daily_realized_symbols')
+        polars_account_data = (polars_backend.filter_account(polars_ledger, account_category)
+                               if polars_ledger is not None else None)
+        results[account_category] = _process_account(processors, account_data, start_date, end_date,
+                                                      account_category, polars_account_data)
 
-            summary.update(processor_result_dict)
+    return results
 
-    results[account_category] = MetricsResult(summary, daily_realized_df, daily_realized_symbols_df)
+
+def process_metrics_from_store(store: LedgerStore,
+                               holdings_date: datetime.date,
+                               start_date: Optional[str],
+                               end_date: Optional[str]) -> Dict[AccountCategory, MetricsResult]:
+    """
+    Same as `process_metrics`, but reads the ledger from a LedgerStore. Filters are pushed down into
+    the store so each account category only loads its own trades and dividends up to the end date.
+
+    :param store: Ledger store populated by `ingest_transaction` / `ingest_baseline`.
+    :param holdings_date: The date of the baseline holdings in the store.
+    :param start_date: The start date for the metrics calculation (optional).
+    :param end_date: The end date for the metrics calculation (optional).
+    """
+    logger = get_logger()
+
+    results = {}
+    first_date, last_date = store.date_range()
+    start_date = pd.to_datetime(start_date) if start_date else first_date
+    end_date = pd.to_datetime(end_date) if end_date else last_date
+    if holdings_date > start_date:
+        logger.error("Holdings date %s is after start date %s.", holdings_date, start_date)
+        raise ValueError(f"Holdings date {holdings_date} is after start date {start_date}.")
+
+    holdings_df = store.query_baseline(holdings_date)
+    processors = _create_processors(holdings_df, holdings_date)
+    for account_category in AccountCategory:
+        account_data = store.query_transactions(account_category=account_category,
+                                                activity_types=PROCESSED_ACTIVITY_TYPES,
+                                                end_date=end_date)
+        results[account_category] = _process_account(processors, account_data, start_date, end_date,
+                                                      account_category)
 
     return results
+
+
+def _create_processors(holdings_df: pd.DataFrame, holdings_date: datetime.date,
+                       ledger_report: Optional[LedgerReport] = None) -> list:
+    return [CapitalGainProcessor(holdings_df, holdings_date, ledger_report),
+            DividendProcessor(holdings_df, holdings_date),
+            SuperficialLossProcessor(), RollingProcessor()]
+
+
+def _process_account(processors: list,
+                     account_data: pd.DataFrame,
+                     start_date: pd.Timestamp,
+                     end_date: pd.Timestamp,
+                     account_category: AccountCategory,
+                     polars_account_data=None) -> MetricsResult:
+    summary = {}
+    details = {}
+    daily_realized_df = None
+    daily_realized_symbols_df = None
+    realized_history_df = None
+    position_history_df = None
+
+    for processor in processors:
+        data = account_data
+        if polars_account_data is not None and isinstance(processor, POLARS_PROCESSORS):
+            data = polars_account_data
+        if isinstance(processor, REALIZED_DERIVED_PROCESSORS):
+            processor_result = processor.process(data, start_date, end_date, account_category, realized_history_df)
+        elif isinstance(processor, DividendProcessor):
+            # yield on cost against the positions of the CapitalGainProcessor, which runs before it
+            processor_result = processor.process(data, start_date, end_date, account_category,
+                                                 position_history=position_history_df)
+        else:
+            processor_result = processor.process(data, start_date, end_date, account_category)
+        processor_result_dict = _result_to_dict(processor_result)
+        if isinstance(processor, CapitalGainProcessor):
+            daily_realized_df = processor_result_dict.pop('daily_realized')
+            daily_realized_symbols_df = processor_result_dict.pop('daily_realized_symbols')
+            realized_history_df = processor_result_dict.pop('realized_history')
+            position_history_df = processor_result_dict.pop('position_history')
+
+        _split_result(processor_result_dict, summary, details)
+
+    return MetricsResult(summary, daily_realized_df, daily_realized_symbols_df, details)
+
+
+def _result_to_dict(processor_result) -> Dict[str, any]:
+    # shallow alternative to dataclasses.asdict, which would deep-copy every DataFrame
+    return {f.name: getattr(processor_result, f.name) for f in fields(processor_result)}
+
+
+def _split_result(processor_result_dict: Dict[str, any], summary: Dict[str, any],
+                  details: Dict[str, pd.DataFrame]) -> None:
+    for key, value in processor_result_dict.items():
+        if isinstance(value, pd.DataFrame):
+            details[key] = value
+        else:
+            summary[key] = value
@@ -0,0 +1,197 @@
+import math
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from lib.metric_processor.base import BaseProcessor
+
+from lib.model.enum.account_category import AccountCategory
+
+ROLLING_WINDOWS = (30, 90, 365)
+ROLLING_COLUMNS = ['Date', 'Window', 'Realized P&L', 'Dividends', 'Win Rate', 'Volatility', 'Drawdown']
+ROLLING_SYMBOL_COLUMNS = ['Date', 'Symbol', 'Window', 'Realized P&L', 'Dividends', 'Win Rate', 'Volatility']
+
+
+class RollingProcessor(BaseProcessor):
+    def __init__(self, windows: Sequence[int] = ROLLING_WINDOWS):
+        super().__init__()
+        self.windows = tuple(windows)
+
+    @dataclass
+    class RollingResult:
+        max_drawdown: float
+        rolling: pd.DataFrame  # Date, Window, Realized P&L, Dividends, Win Rate, Volatility, Drawdown
+        rolling_symbols: pd.DataFrame  # Date, Symbol, Window, Realized P&L, Dividends, Win Rate, Volatility
+        drawdown: pd.DataFrame  # Date, Cumulative Realized, Drawdown
+
+    def process(self, df: pd.DataFrame,
+                start_date: pd.Timestamp,
+                end_date: pd.Timestamp,
+                account_category: AccountCategory,
+                daily_realized_symbols: pd.DataFrame) -> RollingResult:
+        """
+        Rolling realized P&L, dividend income, win rate and realized-return volatility over each window
+        (in days), per account category for every day and per symbol for every day the symbol has activity,
+        plus the drawdown of cumulative realized P&L. The windows of the first days of the range include the
+        sales and dividends of the days before the start date.
+
+        Every series is produced by one streaming pass that keeps running sums over a deque of the events
+        still inside the window, and a monotonic deque for the rolling peak, so the cost is linear in
+        days x windows plus symbol events x windows.
+
+        :param df: Transaction data of the account category.
+        :param start_date:
+        :param end_date:
+        :param account_category:
+        :param daily_realized_symbols: Date, Symbol, Realized, Denied Loss, Row of the sales up to the end date,
+                                       including the sales before the start date (`realized_history` of
+                                       CapitalGainProcessor).
+        :return: RollingResult
+        """
+        # events from `history` days before the start date fill the first windows of the range
+        history = max(self.windows, default=1) - 1
+        start_day = pd.Timestamp(start_date).normalize()
+        days = pd.date_range(start=start_day - pd.Timedelta(days=history), end=pd.Timestamp(end_date).normalize())
+        events = self._daily_events(df, days[0], end_date, daily_realized_symbols)
+
+        # Per account category: one event per calendar day
+        category_events = events.groupby('Day')[['Realized', 'Dividends', 'Wins', 'Sales', 'Return Sum',
+                                                 'Return Square Sum', 'Return Count']].sum()
+        category_events = category_events.reindex(range(len(days)), fill_value=0.0)
+        # cumulative realized P&L since the day before the first event day
+        history_cumulative = np.concatenate(([0.0], np.cumsum(category_events['Realized'].to_numpy(dtype=float))))
+        cumulative = history_cumulative[history + 1:] - history_cumulative[history]
+        running_peak = np.maximum(np.maximum.accumulate(cumulative), 0.0)
+
+        rolling = []
+        for window in self.windows:
+            values = _stream(category_events, window)[history:]
+            # the peak includes the level before the window, as the running peak includes the level before
+            # the start date
+            rolling_drawdown = history_cumulative - _rolling_peak(history_cumulative, window + 1)
+            rolling.append(pd.DataFrame({
+                'Date': days[history:],
+                'Window': window,
+                'Realized P&L': values[:, 0],
+                'Dividends': values[:, 1],
+                'Win Rate': values[:, 2],
+                'Volatility': values[:, 3],
+                'Drawdown': rolling_drawdown[history + 1:],
+            }))
+
+        # Per symbol: one event per day with activity
+        rolling_symbols = []
+        for symbol, symbol_events in events.groupby('Symbol'):
+            symbol_events = symbol_events.groupby('Day').sum(numeric_only=True)
+            in_range = symbol_events.index >= history
+            if not in_range.any():
+                continue
+            for window in self.windows:
+                values = _stream(symbol_events, window)[in_range]
+                rolling_symbols.append(pd.DataFrame({
+                    'Date': days[symbol_events.index[in_range]],
+                    'Symbol': symbol,
+                    'Window': window,
+                    'Realized P&L': values[:, 0],
+                    'Dividends': values[:, 1],
+                    'Win Rate': values[:, 2],
+                    'Volatility': values[:, 3],
+                }))
+
+        drawdown = cumulative - running_peak
+        return self.RollingResult(
+            max_drawdown=float(max(-drawdown.min(), 0.0)) if len(drawdown) else 0.0,
+            rolling=pd.concat(rolling, ignore_index=True) if rolling else pd.DataFrame(columns=ROLLING_COLUMNS),
+            rolling_symbols=(pd.concat(rolling_symbols, ignore_index=True) if rolling_symbols
+                             else pd.DataFrame(columns=ROLLING_SYMBOL_COLUMNS)),
+            drawdown=pd.DataFrame({'Date': days[history:], 'Cumulative Realized': cumulative, 'Drawdown': drawdown}))
+
+    @staticmethod
+    def _daily_events(df: pd.DataFrame, start_date: pd.Timestamp, end_date: pd.Timestamp,
+                      daily_realized_symbols: pd.DataFrame) -> pd.DataFrame:
+        """
+        Aggregate sales and dividends per (day, symbol). Wins and realized returns are counted per sale:
+        the realized return of a sale is realized / cost basis, where the cost basis is the net proceeds of
+        the sell (looked up by its Row) minus the realized amount before the denied superficial loss.
+        """
+        start_day = pd.Timestamp(start_date).normalize()
+        end_day = pd.Timestamp(end_date).normalize()
+
+        sales = daily_realized_symbols.assign(Day=pd.DatetimeIndex(daily_realized_symbols['Date']).normalize())
+        sales = sales[(sales['Day'] >= start_day) & (sales['Day'] <= end_day)]
+        sells = df.reindex(sales['Row'])
+        proceeds = (sells['Price'] * sells['Quantity'].abs() - sells['Commission'].abs()).to_numpy(dtype=float)
+        realized = sales['Realized'].to_numpy(dtype=float)
+        cost_basis = proceeds - (realized - sales['Denied Loss'].to_numpy(dtype=float))
+        returns = pd.Series(np.divide(realized, cost_basis, out=np.full(len(sales), np.nan), where=cost_basis > 0))
+        sale_events = pd.DataFrame({
+            'Day': sales['Day'].to_numpy(),
+            'Symbol': sales['Symbol'].to_numpy(),
+            'Realized': realized,
+            'Dividends': 0.0,
+            'Wins': (realized > 0).astype(float),
+            'Sales': 1.0,
+            'Return Sum': returns.fillna(0.0).to_numpy(),
+            'Return Square Sum': (returns ** 2).fillna(0.0).to_numpy(),
+            'Return Count': returns.notna().astype(float).to_numpy(),
+        })
+
+        in_range = (df['Date'] >= start_day) & (df['Date'] < end_day + pd.Timedelta(days=1))
+        dividends = df[in_range & (df['Activity Type'] == 'Dividends')]
+        dividend_events = pd.DataFrame({'Day': pd.DatetimeIndex(dividends['Date']).normalize(),
+                                        'Symbol': dividends['Symbol'].to_numpy(),
+                                        'Dividends': dividends['Net Amount'].to_numpy(dtype=float)})
+
+        events = (pd.concat([sale_events, dividend_events], ignore_index=True)
+                  .fillna({column: 0.0 for column in sale_events.columns if column not in ('Day', 'Symbol')})
+                  .groupby(['Day', 'Symbol'], as_index=False).sum())
+        events['Day'] = ((events['Day'] - start_day) // pd.Timedelta(days=1)).astype(int)
+        return events
+
+
+def _stream(events: pd.DataFrame, window: int) -> np.ndarray:
+    """
+    Single pass over per-day events (indexed by day number, ascending) keeping running sums over the
+    events of the last `window` days.
+
+    :return: One row per event: realized P&L, dividends, win rate, realized-return volatility.
+    """
+    columns = ['Realized', 'Dividends', 'Wins', 'Sales', 'Return Sum', 'Return Square Sum', 'Return Count']
+    rows = events[columns].to_numpy(dtype=float)
+    in_window: Deque[Tuple[int, np.ndarray]] = deque()
+    sums = np.zeros(len(columns))
+    output = np.empty((len(rows), 4))
+
+    for i, (day, row) in enumerate(zip(events.index, rows)):
+        in_window.append((day, row))
+        sums += row
+        while in_window[0][0] <= day - window:
+            sums -= in_window.popleft()[1]
+
+        realized, dividends, wins, sales, return_sum, return_square_sum, return_count = sums
+        output[i, 0] = realized
+        output[i, 1] = dividends
+        output[i, 2] = wins / sales if sales > 0.5 else math.nan
+        if return_count > 1.5:
+            variance = (return_square_sum - return_sum ** 2 / return_count) / (return_count - 1)
+            output[i, 3] = math.sqrt(max(variance, 0.0))
+        else:
+            output[i, 3] = math.nan
+    return output
+
+
+def _rolling_peak(values: np.ndarray, window: int) -> np.ndarray:
+    """Rolling maximum over the last `window` values with a monotonic deque."""
+    peaks: Deque[int] = deque()
+    output: List[float] = []
+    for i, value in enumerate(values):
+        while peaks and values[peaks[-1]] <= value:
+            peaks.pop()
+        peaks.append(i)
+        if peaks[0] <= i - window:
+            peaks.popleft()
+        output.append(values[peaks[0]])
+    return np.array(output)
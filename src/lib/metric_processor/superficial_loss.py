@@ -0,0 +1,130 @@
+from dataclasses import dataclass
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from lib.metric_processor.base import BaseProcessor
+
+from lib.model.enum.account_category import AccountCategory
+
+SUPERFICIAL_LOSS_WINDOW = pd.Timedelta(days=30)
+# Taxable account categories: losses in registered accounts are never deductible, so never denied
+SUPERFICIAL_LOSS_CATEGORIES = (AccountCategory.MARGIN,)
+SUPERFICIAL_LOSS_COLUMNS = ['Date', 'Symbol', 'Realized', 'Sold Quantity', 'Replacement Quantity', 'Denied Loss',
+                            'Allowed Loss']
+ACB_ADJUSTMENT_COLUMNS = ['Symbol', 'Replacement Quantity', 'ACB Adjustment']
+
+
+class ReplacementShares:
+    """
+    Buys of one account category that can replace shares sold at a loss. A loss is superficial when the
+    same symbol is bought within SUPERFICIAL_LOSS_WINDOW before or after the sale and is still held at the
+    end of the window; the denied portion is loss * replacement / sold.
+
+    Window bounds are `searchsorted` on per-symbol sorted date arrays. Each bought share replaces at most
+    one loss: losses claim the earliest unclaimed buys of their window, in the order they are realized.
+    Claims only move forward in time, so each buy is used up once and a claim costs O(log n) amortized.
+    """
+
+    def __init__(self, trades: pd.DataFrame, baseline_quantity: Dict[str, float]):
+        """
+        :param trades: Date, Symbol, Signed Quantity (positive for buys) of the trades applied to the
+                       positions, and of the buys up to SUPERFICIAL_LOSS_WINDOW after the last of them.
+        :param baseline_quantity: Symbol -> quantity held before the trades.
+        """
+        self._symbols = {}
+        for symbol, group in trades.sort_values(by='Date', kind='stable').groupby('Symbol'):
+            signed = group['Signed Quantity'].to_numpy(dtype=float)
+            position = baseline_quantity.get(symbol, 0.0) + np.concatenate(([0.0], np.cumsum(signed)))
+            # dates, unclaimed bought quantity per trade, position after the first k trades, first claimable trade
+            self._symbols[symbol] = [group['Date'].to_numpy(dtype='datetime64[ns]'), np.maximum(signed, 0.0),
+                                     position, 0]
+
+    def claim(self, symbol: str, date: pd.Timestamp, sold: float) -> float:
+        """
+        Use up the replacement shares of a loss.
+
+        :param symbol:
+        :param date: Date of the sale.
+        :param sold: Quantity sold at a loss.
+        :return: The replacement quantity, at most `sold`.
+        """
+        entry = self._symbols.get(symbol)
+        if entry is None:
+            return 0.0
+        dates, unclaimed, position, first = entry
+        date = pd.Timestamp(date).to_datetime64()
+        lower = np.searchsorted(dates, date - SUPERFICIAL_LOSS_WINDOW.to_timedelta64(), side='left')
+        upper = np.searchsorted(dates, date + SUPERFICIAL_LOSS_WINDOW.to_timedelta64(), side='right')
+
+        wanted = min(sold, max(position[upper], 0.0))  # held at the end of the window
+        claimed = 0.0
+        i = max(lower, first)
+        while i < upper and claimed < wanted:
+            take = min(unclaimed[i], wanted - claimed)
+            unclaimed[i] -= take
+            claimed += take
+            if unclaimed[i] > 0:
+                break
+            i += 1
+        # buys before i are used up, or before the window of every later loss
+        entry[3] = i
+        return claimed
+
+
+class SuperficialLossProcessor(BaseProcessor):
+    @dataclass
+    class SuperficialLossResult:
+        total_denied_loss: float
+        superficial_losses: pd.DataFrame  # Date, Symbol, Realized, Sold/Replacement Quantity, Denied Loss, Allowed Loss
+        acb_adjustments: pd.DataFrame  # Symbol, Replacement Quantity, ACB Adjustment
+
+    def process(self, df: pd.DataFrame,
+                start_date: pd.Timestamp,
+                end_date: pd.Timestamp,
+                account_category: AccountCategory,
+                daily_realized_symbols: pd.DataFrame) -> SuperficialLossResult:
+        """
+        Report the superficial losses realized in the date range. CapitalGainProcessor denies them while
+        applying trades (see ReplacementShares), so its realized gains are net of the denied losses and the
+        denied losses are in the ACB of the replacement shares; this lists the denied losses and the ACB
+        adjustments per symbol.
+
+        :param df: Transaction data of the account category.
+        :param start_date:
+        :param end_date:
+        :param account_category:
+        :param daily_realized_symbols: Date, Symbol, Realized, Denied Loss, Row as produced by CapitalGainProcessor.
+        :return: SuperficialLossResult
+        """
+        losses = daily_realized_symbols[(daily_realized_symbols['Denied Loss'] > 0)
+                                        & (daily_realized_symbols['Date'] >= start_date)
+                                        & (daily_realized_symbols['Date'] <= end_date)]
+        if losses.empty:
+            return self._empty_result()
+
+        sold = df['Quantity'].abs().reindex(losses['Row']).to_numpy(dtype=float)
+        gross_loss = losses['Realized'] - losses['Denied Loss']
+        superficial_losses = pd.DataFrame({
+            'Date': losses['Date'],
+            'Symbol': losses['Symbol'],
+            'Realized': gross_loss,
+            'Sold Quantity': sold,
+            'Replacement Quantity': sold * losses['Denied Loss'] / -gross_loss,
+            'Denied Loss': losses['Denied Loss'],
+            'Allowed Loss': losses['Realized'],
+        }).sort_values(by='Date', kind='stable').reset_index(drop=True)
+        acb_adjustments = (superficial_losses.groupby('Symbol')
+                           .agg({'Replacement Quantity': 'sum', 'Denied Loss': 'sum'})
+                           .rename(columns={'Denied Loss': 'ACB Adjustment'})
+                           .reset_index())
+
+        return self.SuperficialLossResult(total_denied_loss=float(superficial_losses['Denied Loss'].sum()),
+                                          superficial_losses=superficial_losses,
+                                          acb_adjustments=acb_adjustments)
+
+    def _empty_result(self) -> SuperficialLossResult:
+        return self.SuperficialLossResult(total_denied_loss=0.0,
+                                          superficial_losses=pd.DataFrame(columns=SUPERFICIAL_LOSS_COLUMNS),
+                                          acb_adjustments=pd.DataFrame(columns=ACB_ADJUSTMENT_COLUMNS))
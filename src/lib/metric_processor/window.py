@@ -0,0 +1,132 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from lib.ingestion.corporate_actions import apply_corporate_actions
+from lib.logger.logger import get_logger
+
+from lib.metric_processor.capital_gain import CapitalGainProcessor
+from lib.metric_processor.superficial_loss import SuperficialLossProcessor
+from lib.model.enum.account_category import AccountCategory
+
+WINDOW_METRICS = ['total_realized', 'realized_gain', 'realized_loss', 'total_dividends', 'total_denied_loss']
+
+
+@dataclass
+class MetricWindow:
+    """Class to represent an inclusive range of whole days to report metrics for."""
+    label: str
+    start: pd.Timestamp
+    end: pd.Timestamp
+
+
+def calendar_windows(start_date: datetime, end_date: datetime, freq: str) -> List[MetricWindow]:
+    """
+    Split a date range into calendar periods, clipped to the range.
+
+    :param start_date:
+    :param end_date:
+    :param freq: Calendar frequency, 'M' (month), 'Q' (quarter) or 'Y' (year).
+    :return: One MetricWindow per period, labelled like '2024-01', '2024Q1' or '2024'.
+    """
+    start_date, end_date = pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date).normalize()
+    return [MetricWindow(label=str(period),
+                         start=max(period.start_time.normalize(), start_date),
+                         end=min(period.end_time.normalize(), end_date))
+            for period in pd.period_range(start=start_date, end=end_date, freq=freq)]
+
+
+def year_to_date(as_of: datetime) -> MetricWindow:
+    as_of = pd.Timestamp(as_of).normalize()
+    return MetricWindow(label='YTD', start=as_of.replace(month=1, day=1), end=as_of)
+
+
+def trailing_twelve_months(as_of: datetime) -> MetricWindow:
+    as_of = pd.Timestamp(as_of).normalize()
+    return MetricWindow(label='TTM', start=as_of - pd.DateOffset(years=1) + pd.Timedelta(days=1), end=as_of)
+
+
+def process_metrics_windows(txn_df: pd.DataFrame,
+                            holdings_df: pd.DataFrame,
+                            holdings_date: datetime.date,
+                            windows: Optional[List[MetricWindow]] = None,
+                            freq: Optional[str] = None,
+                            corporate_actions: Optional[pd.DataFrame] = None) -> pd.Series:
+    """
+    Calculate the metrics of many date windows at once.
+
+    Realized P&L of a sale does not depend on the reporting window, so the processors run a single
+    chronological sweep over the union of the windows. Each metric is then bucketed per day and every
+    window is answered from prefix sums, instead of replaying the history once per window as separate
+    `process_metrics` calls would.
+
+    :param txn_df: DataFrame containing transaction data.
+    :param holdings_df: DataFrame containing holdings data.
+    :param holdings_date: The date of the holdings data.
+    :param windows: Windows to report, e.g. `calendar_windows(...) + [year_to_date(...), trailing_twelve_months(...)]`.
+    :param freq: Calendar frequency spanning the ledger after the holdings date, used when no windows are given.
+    :param corporate_actions: Splits, consolidations and symbol changes to adjust the ledger for (optional).
+    :return: Metric values indexed by (window label, account category, metric).
+    """
+    logger = get_logger()
+
+    if corporate_actions is not None:
+        txn_df, holdings_df = apply_corporate_actions(txn_df, corporate_actions, holdings_df, holdings_date)
+
+    if windows is None:
+        if freq is None:
+            raise ValueError("Either windows or freq must be given.")
+        # the baseline holdings already include everything up to the holdings date
+        first_day = max(txn_df['Date'].min(), pd.Timestamp(holdings_date) + pd.Timedelta(days=1))
+        windows = calendar_windows(first_day, txn_df['Date'].max(), freq)
+        if not windows:
+            raise ValueError(f"No transactions after holdings date {holdings_date}.")
+
+    span_start = min(window.start for window in windows).normalize()
+    span_end = max(window.end for window in windows).normalize()
+    if holdings_date > span_start:
+        logger.error("Holdings date %s is after start date %s.", holdings_date, span_start)
+        raise ValueError(f"Holdings date {holdings_date} is after start date {span_start}.")
+
+    days = pd.date_range(start=span_start, end=span_end)
+    window_starts = days.searchsorted([window.start.normalize() for window in windows], side='left')
+    window_ends = days.searchsorted([window.end.normalize() for window in windows], side='right')
+
+    capital_gain_processor = CapitalGainProcessor(holdings_df, holdings_date)
+    superficial_loss_processor = SuperficialLossProcessor()
+
+    values = []
+    for account_category in AccountCategory:
+        account_data = txn_df[txn_df['Account Category'] == account_category]
+        realized = capital_gain_processor.process(account_data, span_start, span_end,
+                                                  account_category).daily_realized_symbols
+        denied = superficial_loss_processor.process(account_data, span_start, span_end, account_category,
+                                                    realized).superficial_losses
+        dividends = account_data[(account_data['Activity Type'] == 'Dividends')
+                                 & (account_data['Date'] >= span_start)
+                                 & (account_data['Date'] < span_end + pd.Timedelta(days=1))]
+
+        daily: Dict[str, np.ndarray] = {
+            'total_realized': _daily_sum(days, realized['Date'], realized['Realized']),
+            'realized_gain': _daily_sum(days, realized['Date'], realized['Realized'].clip(lower=0)),
+            'realized_loss': _daily_sum(days, realized['Date'], -realized['Realized'].clip(upper=0)),
+            'total_dividends': _daily_sum(days, dividends['Date'], dividends['Net Amount']),
+            'total_denied_loss': _daily_sum(days, denied['Date'], denied['Denied Loss']),
+        }
+        for metric in WINDOW_METRICS:
+            prefix = np.concatenate(([0.0], np.cumsum(daily[metric])))
+            values.append(prefix[window_ends] - prefix[window_starts])
+
+    # values is ordered (account category, metric, window); reorder to (window, account category, metric)
+    cube = np.stack(values).reshape(len(AccountCategory), len(WINDOW_METRICS), len(windows)).transpose(2, 0, 1)
+    index = pd.MultiIndex.from_product([[window.label for window in windows], list(AccountCategory), WINDOW_METRICS],
+                                       names=['Window', 'Account Category', 'Metric'])
+    return pd.Series(cube.ravel(), index=index, name='Value')
+
+
+def _daily_sum(days: pd.DatetimeIndex, dates: pd.Series, amounts: pd.Series) -> np.ndarray:
+    positions = days.searchsorted(pd.DatetimeIndex(dates).normalize())
+    return np.bincount(positions, weights=amounts.to_numpy(dtype=float), minlength=len(days))[:len(days)]
@@ -0,0 +1,10 @@
+from enum import StrEnum
+
+
+class Anomaly(StrEnum):
+    """Enum for ledger anomalies detected by the ledger validator."""
+    ORPHAN_SELL = 'Orphan Sell'
+    OVERSELL = 'Oversell'
+    DUPLICATE = 'Duplicate'
+    NON_MONOTONIC_DATE = 'Non-monotonic Date'
+    UNKNOWN_ACTION = 'Unknown Action'
@@ -0,0 +1,7 @@
+from enum import StrEnum
+
+
+class Backend(StrEnum):
+    """Enum for the DataFrame library a ledger is ingested and processed with."""
+    PANDAS = 'pandas'
+    POLARS = 'polars'  # optional dependency, see lib.backend.polars_backend
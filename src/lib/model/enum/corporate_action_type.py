@@ -0,0 +1,8 @@
+from enum import StrEnum
+
+
+class CorporateActionType(StrEnum):
+    """Enum for corporate action types."""
+    SPLIT = 'Split'
+    CONSOLIDATION = 'Consolidation'
+    SYMBOL_CHANGE = 'Symbol Change'
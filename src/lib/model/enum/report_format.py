@@ -0,0 +1,7 @@
+from enum import StrEnum
+
+
+class ReportFormat(StrEnum):
+    """Enum for the file formats of the static reports."""
+    HTML = 'html'
+    PNG = 'png'  # optional dependency, requires kaleido and a Chrome install
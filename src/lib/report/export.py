@@ -0,0 +1,337 @@
+"""
+Static HTML/PNG reports of many portfolios and periods, rendered across a pool of worker processes.
+
+Every report is a standalone page with, per account category, the summary table, the monthly realized
+bar chart with its per-month trades, and the per-symbol realized detail. What is the same for every
+report is written once:
+- `<output_dir>/assets/`: plotly.js, the stylesheet and the Plotly template. Pages reference them instead
+  of embedding them, and figures are serialized without their template.
+- `<output_dir>/.figure-cache/`: figure JSON (and PNG), keyed by a hash of the table a figure is built
+  from. Workers share it, so unchanged figures are not rebuilt across reports, portfolios or runs.
+
+PNG export requires kaleido (and a Chrome install), installed with `poetry install --extras png`.
+"""
+import hashlib
+import html
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+import plotly
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from lib.batch.manifest import PortfolioSpec
+from lib.batch.runner import MAX_TASKS_PER_CHILD, BatchReport, run_portfolio
+from lib.logger.logger import get_logger, initialize_logger
+from lib.metric_processor.processor import MetricsResult
+from lib.metric_processor.window import MetricWindow
+from lib.model.enum.account_category import AccountCategory
+from lib.model.enum.report_format import ReportFormat
+from lib.model.enum.stage import Stage
+from lib.report.figures import daily_details, monthly_realized, monthly_realized_figure, symbol_realized, \
+    symbol_realized_figure
+
+try:
+    import kaleido
+except ImportError:
+    kaleido = None
+
+REPORT_TEMPLATE = 'portfolio_report'
+ASSETS_DIR = 'assets'
+FIGURE_CACHE_DIR = '.figure-cache'
+
+# Label of the report of a portfolio over its manifest dates, when no periods are given
+FULL_PERIOD = 'full'
+
+REPORT_CSS = """body { font-family: Helvetica, Arial, sans-serif; margin: 2em; color: #2a3f5f; }
+table { border-collapse: collapse; margin: 1em 0; }
+th { background-color: rgb(230, 230, 230); font-weight: bold; }
+th, td { padding: 4px 12px; text-align: left; }
+.gain { color: green; }
+.loss { color: red; }
+.figure { height: 450px; }
+"""
+
+# Renders a figure serialized without its template, see FigureCache
+RENDER_FIGURE_JS = """window.renderFigure = function (id, figure) {
+  var layout = Object.assign({}, figure.layout, {template: window.REPORT_TEMPLATE});
+  Plotly.newPlot(id, figure.data, layout, {responsive: true});
+};
+"""
+
+FIGURES: Dict[str, Callable[[MetricsResult], pd.DataFrame]] = {
+    'monthly-realized': lambda result: result.daily_realized,
+    'symbol-realized': lambda result: result.daily_realized_symbols,
+}
+FIGURE_BUILDERS: Dict[str, Callable[[pd.DataFrame], go.Figure]] = {
+    'monthly-realized': monthly_realized_figure,
+    'symbol-realized': symbol_realized_figure,
+}
+
+
+@dataclass
+class ReportTask:
+    """Class to represent one report: a portfolio, with the dates of the period to report."""
+    portfolio: PortfolioSpec
+    period: str
+
+
+def require_kaleido() -> None:
+    if kaleido is None:
+        raise ImportError("PNG reports require the optional dependency kaleido, "
+                          "install it with `poetry install --extras png`.")
+
+
+def report_template() -> go.layout.Template:
+    template = go.layout.Template(pio.templates['plotly_white'])
+    template.layout.font = dict(family='Helvetica, Arial, sans-serif', size=12)
+    return template
+
+
+def report_tasks(portfolios: List[PortfolioSpec], windows: Optional[List[MetricWindow]] = None) -> List[ReportTask]:
+    """
+    :param portfolios: Portfolios to report, see `load_manifest`.
+    :param windows: Periods to report for every portfolio, e.g. `calendar_windows(...)`; without windows,
+                    one FULL_PERIOD report over the manifest dates of each portfolio.
+    :return: One ReportTask per portfolio and period, grouped by portfolio.
+    """
+    if windows is None:
+        return [ReportTask(portfolio=portfolio, period=FULL_PERIOD) for portfolio in portfolios]
+    return [ReportTask(portfolio=replace(portfolio, start_date=str(window.start.date()),
+                                         end_date=str(window.end.date())),
+                       period=window.label)
+            for portfolio in portfolios for window in windows]
+
+
+def export_reports(tasks: List[ReportTask],
+                   output_dir: str,
+                   formats: Sequence[ReportFormat] = (ReportFormat.HTML,),
+                   max_workers: Optional[int] = None,
+                   max_tasks_per_child: Optional[int] = MAX_TASKS_PER_CHILD,
+                   stage: Stage = Stage.PROD) -> BatchReport:
+    """
+    Render the reports across a pool of worker processes, to `<output_dir>/<portfolio_id>/<period>.html`
+    (and `<period>-<account category>-<figure>.png`).
+
+    Workers reuse the ingestion caches of `run_portfolio`, so the periods of a portfolio are ingested once
+    per worker, and register the report template once.
+
+    :param tasks: Reports to render, see `report_tasks`.
+    :param output_dir:
+    :param formats:
+    :param max_workers: Defaults to the number of CPUs.
+    :param max_tasks_per_child: Reports rendered by a worker before it is replaced (optional), as in
+                                `run_batch`.
+    :param stage: Logging stage of the workers.
+    :return: BatchReport keyed by `<portfolio_id>/<period>`, including the throughput in reports per minute.
+    """
+    if ReportFormat.PNG in formats:
+        require_kaleido()
+    logger = get_logger()
+    report = BatchReport(total=len(tasks), succeeded=0)
+    start = time.perf_counter()
+    write_assets(output_dir)
+    cache_dir = os.path.join(output_dir, FIGURE_CACHE_DIR)
+
+    with ProcessPoolExecutor(max_workers=max_workers,
+                             initializer=_initialize_worker,
+                             initargs=(stage,),
+                             max_tasks_per_child=max_tasks_per_child) as executor:
+        futures = {executor.submit(render_report, task, output_dir, tuple(formats), cache_dir):
+                   f'{task.portfolio.portfolio_id}/{task.period}' for task in tasks}
+        for future in as_completed(futures):
+            report_id = futures.pop(future)
+            try:
+                future.result()
+                report.succeeded += 1
+            except Exception as e:
+                logger.error("Report %s failed: %r", report_id, e)
+                report.failed[report_id] = repr(e)
+
+    report.elapsed_seconds = time.perf_counter() - start
+    logger.info("Rendered %d/%d reports in %.1fs (%.1f reports/min).", report.succeeded, report.total,
+                report.elapsed_seconds, report.items_per_minute)
+    return report
+
+
+def write_assets(output_dir: str) -> None:
+    """Write the files shared by every report page, once per export."""
+    assets_dir = os.path.join(output_dir, ASSETS_DIR)
+    os.makedirs(assets_dir, exist_ok=True)
+    with open(os.path.join(assets_dir, 'plotly.min.js'), 'w', encoding='utf-8') as f:
+        f.write(plotly.offline.get_plotlyjs())
+    with open(os.path.join(assets_dir, 'report.css'), 'w') as f:
+        f.write(REPORT_CSS)
+    with open(os.path.join(assets_dir, 'report-template.js'), 'w') as f:
+        template_json = pio.json.to_json_plotly(report_template().to_plotly_json())
+        f.write(f'window.REPORT_TEMPLATE = {template_json};\n' + RENDER_FIGURE_JS)
+
+
+class FigureCache:
+    """
+    Figure JSON on disk, keyed by a hash of the name of a figure and of the table it is built from.
+    Figures are serialized without their template, which is shared through the assets.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, name: str, df: pd.DataFrame) -> str:
+        digest = hashlib.sha256(f'{name}|{REPORT_TEMPLATE}|{plotly.__version__}|{list(df.columns)}'.encode())
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        return digest.hexdigest()
+
+    def figure_json(self, key: str, name: str, df: pd.DataFrame) -> str:
+        path = os.path.join(self.directory, f'{key}.json')
+        try:
+            with open(path) as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+        fig = FIGURE_BUILDERS[name](df)
+        fig.update_layout(template=None)
+        figure_json = fig.to_json()
+        self._write(path, figure_json.encode())
+        return figure_json
+
+    def png_path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.png')
+
+    def _write(self, path: str, content: bytes) -> None:
+        # workers may write the same figure concurrently; readers only ever see complete files
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+
+def render_report(task: ReportTask, output_dir: str, formats: Sequence[ReportFormat], cache_dir: str) -> List[str]:
+    """
+    Compute the metrics of one portfolio and period, and write its report.
+
+    :return: Paths of the written files.
+    """
+    results = run_portfolio(task.portfolio)
+    cache = FigureCache(cache_dir)
+    portfolio_dir = os.path.join(output_dir, task.portfolio.portfolio_id)
+    os.makedirs(portfolio_dir, exist_ok=True)
+
+    figures: Dict[AccountCategory, Dict[str, str]] = {}  # account category -> figure name -> cache key
+    sections = []
+    for account_category, result in results.items():
+        figures[account_category] = {}
+        figure_divs = {}
+        for name, table in FIGURES.items():
+            key = cache.key(name, table(result))
+            figures[account_category][name] = key
+            figure_divs[name] = _figure_div(f'{account_category.value}-{name}',
+                                            cache.figure_json(key, name, table(result)))
+        sections.append(_account_section(account_category, result, figure_divs))
+
+    paths = []
+    if ReportFormat.HTML in formats:
+        path = os.path.join(portfolio_dir, f'{task.period}.html')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(_page(task, sections))
+        paths.append(path)
+    if ReportFormat.PNG in formats:
+        paths += _write_pngs(cache, figures, os.path.join(portfolio_dir, task.period))
+    return paths
+
+
+def _initialize_worker(stage: Stage) -> None:
+    initialize_logger(stage, structured=True)
+    pio.templates[REPORT_TEMPLATE] = report_template()
+    pio.templates.default = REPORT_TEMPLATE
+
+
+def _write_pngs(cache: FigureCache, figures: Dict[AccountCategory, Dict[str, str]], path_prefix: str) -> List[str]:
+    # figures missing from the cache are rendered in one kaleido call, sharing its browser session
+    missing = {key for keys in figures.values() for key in keys.values() if not os.path.exists(cache.png_path(key))}
+    if missing:
+        missing = sorted(missing)
+        images = []
+        for key in missing:
+            with open(os.path.join(cache.directory, f'{key}.json')) as f:
+                images.append(pio.from_json(f.read()).update_layout(template=REPORT_TEMPLATE))
+        tmp_paths = [f'{cache.png_path(key)}.{os.getpid()}.tmp' for key in missing]
+        pio.write_images(images, tmp_paths, format='png')
+        for key, tmp_path in zip(missing, tmp_paths):
+            os.replace(tmp_path, cache.png_path(key))
+
+    paths = []
+    for account_category, keys in figures.items():
+        for name, key in keys.items():
+            path = f'{path_prefix}-{account_category.value}-{name}.png'
+            shutil.copyfile(cache.png_path(key), path)
+            paths.append(path)
+    return paths
+
+
+def _page(task: ReportTask, sections: List[str]) -> str:
+    portfolio = task.portfolio
+    title = html.escape(f'{portfolio.portfolio_id} - {task.period}')
+    period = html.escape(f'{portfolio.start_date or "start of ledger"} to {portfolio.end_date or "today"}')
+    assets = f'../{ASSETS_DIR}'
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<link rel="stylesheet" href="{assets}/report.css">
+<script src="{assets}/plotly.min.js"></script>
+<script src="{assets}/report-template.js"></script>
+</head>
+<body>
+<h1>{title}</h1>
+<p>{period}</p>
+{''.join(sections)}
+</body>
+</html>
+"""
+
+
+def _account_section(account_category: AccountCategory, result: MetricsResult, figure_divs: Dict[str, str]) -> str:
+    summary = pd.DataFrame({'Metric': list(result.summary), 'Value': [_money(v) for v in result.summary.values()]})
+    symbols = symbol_realized(result.daily_realized_symbols)
+    return f"""<section>
+<h2>{html.escape(account_category.name)}</h2>
+{summary.to_html(index=False, border=0)}
+{figure_divs['monthly-realized']}
+{_monthly_details(result.daily_realized, result.daily_realized_symbols)}
+{figure_divs['symbol-realized']}
+{symbols.to_html(index=False, border=0, formatters={column: _money for column in symbols.columns[1:4]})}
+</section>
+"""
+
+
+def _monthly_details(daily_realized: pd.DataFrame, daily_realized_symbols: pd.DataFrame) -> str:
+    # static counterpart of clicking a bar of the dashboard chart: the trades of every month
+    details = []
+    for row in monthly_realized(daily_realized).itertuples(index=False):
+        month, gain, loss = row
+        if not gain and not loss:
+            continue
+        items = ''.join(
+            f'<li><b>{trade.Date.date()}</b> [{html.escape(str(trade.Symbol))}] '
+            f'<span class="{"gain" if trade.Realized >= 0 else "loss"}">{_money(trade.Realized)}</span></li>'
+            for is_gain in (True, False)
+            for trade in daily_details(daily_realized_symbols, month, is_gain).itertuples(index=False))
+        details.append(f'<details><summary>{month:%Y-%m}: gain {_money(gain)}, loss {_money(loss)}</summary>'
+                       f'<ul>{items}</ul></details>')
+    return '\n'.join(details)
+
+
+def _figure_div(div_id: str, figure_json: str) -> str:
+    figure_json = figure_json.replace('</', '<\\/')  # '</' would end the script element early
+    return f'<div id="{div_id}" class="figure"></div><script>renderFigure("{div_id}", {figure_json});</script>'
+
+
+def _money(value: float) -> str:
+    return f'-${-value:,.2f}' if value < 0 else f'${abs(value):,.2f}'  # abs: no $-0.00
@@ -0,0 +1,69 @@
+"""
+Pure functions building the report tables and figures from a MetricsResult, shared by the Dash app and the static
+report export. They do not modify the result.
+"""
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+SYMBOL_REALIZED_COLUMNS = ['Symbol', 'Realized Gain', 'Realized Loss', 'Total Realized', 'Trades']
+
+
+def monthly_realized(daily_realized: pd.DataFrame) -> pd.DataFrame:
+    """
+    :param daily_realized: Date, Realized Gain, Realized Loss
+    :return: Month (first day), Realized Gain, Realized Loss
+    """
+    monthly = daily_realized.groupby(daily_realized['Date'].dt.to_period('M').rename('Month')).agg({
+        'Realized Gain': 'sum',
+        'Realized Loss': 'sum'
+    }).reset_index()
+    monthly['Month'] = monthly['Month'].dt.to_timestamp()
+    return monthly
+
+
+def monthly_realized_figure(daily_realized: pd.DataFrame) -> go.Figure:
+    fig = px.bar(monthly_realized(daily_realized), x='Month', y=['Realized Gain', 'Realized Loss'],
+                 barmode='group', title='Monthly Realized Gain/Loss')
+    fig.update_layout(xaxis=dict(dtick="M1"))  # show label for every month
+    return fig
+
+
+def daily_details(daily_realized_symbols: pd.DataFrame, month: str, is_gain: bool) -> pd.DataFrame:
+    """
+    Realized trades of one bar of the monthly realized figure.
+
+    :param daily_realized_symbols: Date, Symbol, Realized
+    :param month: Any date within the month.
+    :param is_gain: Gains (True) or losses (False).
+    :return: Date, Symbol, Realized
+    """
+    month_str = pd.to_datetime(month).strftime('%Y-%m')
+    realized = daily_realized_symbols['Realized']
+    return daily_realized_symbols[(daily_realized_symbols['Date'].dt.strftime('%Y-%m') == month_str)
+                                  & (realized > 0 if is_gain else realized < 0)]
+
+
+def symbol_realized(daily_realized_symbols: pd.DataFrame) -> pd.DataFrame:
+    """
+    :param daily_realized_symbols: Date, Symbol, Realized
+    :return: SYMBOL_REALIZED_COLUMNS, one row per symbol by descending total realized
+    """
+    realized = daily_realized_symbols['Realized'].astype(float)
+    per_symbol = pd.DataFrame({
+        'Symbol': daily_realized_symbols['Symbol'],
+        'Realized Gain': realized.clip(lower=0),
+        'Realized Loss': -realized.clip(upper=0),
+        'Total Realized': realized,
+    }).groupby('Symbol', as_index=False).agg(**{
+        'Realized Gain': ('Realized Gain', 'sum'),
+        'Realized Loss': ('Realized Loss', 'sum'),
+        'Total Realized': ('Total Realized', 'sum'),
+        'Trades': ('Total Realized', 'size'),
+    })
+    return per_symbol.sort_values(by='Total Realized', ascending=False, kind='stable')[SYMBOL_REALIZED_COLUMNS]
+
+
+def symbol_realized_figure(daily_realized_symbols: pd.DataFrame) -> go.Figure:
+    return px.bar(symbol_realized(daily_realized_symbols), x='Symbol', y=['Realized Gain', 'Realized Loss'],
+                  barmode='group', title='Realized Gain/Loss per Symbol')
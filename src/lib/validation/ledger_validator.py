@@ -0,0 +1,163 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from lib.model.enum.action import Action
+from lib.model.enum.anomaly import Anomaly
+
+ANOMALY_COLUMNS = ['Row', 'Date', 'Account Category', 'Symbol', 'Anomaly', 'Detail']
+
+# Anomalies whose rows cannot be applied to a position and are left out of trade processing
+INVALID_TRADE_ANOMALIES = (Anomaly.ORPHAN_SELL, Anomaly.OVERSELL, Anomaly.UNKNOWN_ACTION)
+
+QUANTITY_TOLERANCE = 1e-9
+
+
+@dataclass
+class LedgerReport:
+    """
+    Structured anomaly report of a ledger.
+
+    anomalies: Row (index label in the validated ledger), Date, Account Category, Symbol, Anomaly, Detail
+    """
+    anomalies: pd.DataFrame
+
+    @property
+    def invalid_trade_index(self) -> pd.Index:
+        """Index labels of the trades that processors must skip."""
+        return pd.Index(self.anomalies.loc[self.anomalies['Anomaly'].isin(INVALID_TRADE_ANOMALIES), 'Row'].unique())
+
+    def counts(self) -> pd.Series:
+        return self.anomalies['Anomaly'].value_counts()
+
+    def log_summary(self, logger: logging.Logger) -> None:
+        """Log one message per anomaly type, instead of one per row."""
+        for anomaly, rows in self.anomalies.groupby('Anomaly', sort=False):
+            symbols = ', '.join(sorted(rows['Symbol'].dropna().astype(str).unique()))
+            if anomaly == Anomaly.ORPHAN_SELL:
+                logger.error("Sell transaction found for symbol(s) %s with no prior holdings on %d row(s): %s",
+                             symbols, len(rows), rows['Row'].tolist())
+            elif anomaly == Anomaly.OVERSELL:
+                logger.error("Attempting to sell more shares than available for %s on %d row(s): %s",
+                             symbols, len(rows), rows['Row'].tolist())
+            else:
+                logger.warning("%s on %d row(s): %s", anomaly, len(rows), rows['Row'].tolist())
+
+
+def validate_ledger(txn_df: pd.DataFrame,
+                    holdings_df: Optional[pd.DataFrame] = None,
+                    holdings_date: Optional[datetime] = None,
+                    start_date: Optional[datetime] = None) -> LedgerReport:
+    """
+    Detect ledger anomalies before processing, with vectorized checks over the whole ledger:
+    - orphan sells: sells of a symbol without baseline holdings or any earlier buy.
+    - oversells: sells of more shares than held, from per-symbol cumulative quantities.
+    - duplicate rows.
+    - dates decreasing in ledger order.
+    - trades with an Action outside of the Action enum.
+
+    Orphan sells and oversells follow the semantics of CapitalGainProcessor: trades are applied after the
+    holdings date, or from the start date when it is the holdings date, and a rejected sell does not reduce
+    the position.
+
+    :param txn_df: DataFrame containing transaction data.
+    :param holdings_df: DataFrame containing holdings data (optional).
+    :param holdings_date: The date of the holdings data (optional).
+    :param start_date: The start date of the processed range (optional).
+    :return: LedgerReport
+    """
+    anomalies = [
+        _anomalies(txn_df, txn_df.duplicated(keep='first'), Anomaly.DUPLICATE, 'Same as an earlier row'),
+        _anomalies(txn_df, txn_df['Date'] < txn_df['Date'].cummax().shift(), Anomaly.NON_MONOTONIC_DATE,
+                   'Date is before an earlier row'),
+    ]
+
+    trades = txn_df[txn_df['Activity Type'] == 'Trades']
+    is_unknown = ~trades['Action'].isin([action.value for action in Action])
+    anomalies.append(_anomalies(trades, is_unknown, Anomaly.UNKNOWN_ACTION,
+                                'Action ' + trades['Action'].astype(str)))
+
+    trades = trades[~is_unknown & trades['Action'].isin([Action.BUY, Action.SELL])]
+    if holdings_date is not None:
+        is_applied = trades['Date'] > pd.Timestamp(holdings_date)
+        if start_date is not None:
+            is_applied |= trades['Date'] >= pd.Timestamp(start_date)
+        trades = trades[is_applied]
+    anomalies.extend(_position_anomalies(trades, holdings_df))
+
+    anomalies = [frame for frame in anomalies if not frame.empty]
+    if not anomalies:
+        return LedgerReport(anomalies=pd.DataFrame(columns=ANOMALY_COLUMNS))
+    return LedgerReport(anomalies=pd.concat(anomalies, ignore_index=True).sort_values(by='Row', kind='stable')
+                        .reset_index(drop=True))
+
+
+def _position_anomalies(trades: pd.DataFrame, holdings_df: Optional[pd.DataFrame]) -> list:
+    if 'Account Category' in trades.columns:
+        keys = [trades['Account Category'].astype(str), trades['Symbol']]
+    else:
+        keys = [pd.Series('', index=trades.index), trades['Symbol']]
+
+    baseline_quantity = pd.Series(0.0, index=trades.index)
+    if holdings_df is not None and not holdings_df.empty:
+        holdings = holdings_df.groupby([holdings_df['Account Category'].astype(str), holdings_df['Symbol']])[
+            'Quantity'].sum()
+        baseline_index = pd.MultiIndex.from_arrays(keys)
+        if 'Account Category' not in trades.columns:
+            holdings = holdings.groupby(level=1).sum()
+            baseline_index = keys[1]
+        baseline_quantity = pd.Series(holdings.reindex(baseline_index).to_numpy(), index=trades.index)
+    has_baseline = baseline_quantity.notna()
+    baseline_quantity = baseline_quantity.fillna(0.0)
+
+    is_buy = trades['Action'] == Action.BUY
+    is_sell = ~is_buy
+    signed = np.where(is_buy, 1.0, -1.0) * trades['Quantity'].abs()
+
+    # A symbol only enters the position book with baseline holdings or its first buy
+    prior_buys = is_buy.groupby(keys).cumsum() - is_buy
+    is_orphan = is_sell & (prior_buys == 0) & ~has_baseline
+    signed = signed.where(~is_orphan, 0.0)
+
+    # Rejecting an oversell changes the running quantity after it, so the symbols whose cumulative quantity
+    # goes negative are scanned in order from their first negative row, rejecting oversells as they go.
+    running = (baseline_quantity + signed.groupby(keys).cumsum()).to_numpy()
+    is_negative = running < -QUANTITY_TOLERANCE
+    is_oversell = np.zeros(len(trades), dtype=bool)
+    if is_negative.any():
+        group = trades.groupby(keys, sort=False).ngroup().to_numpy()
+        in_negative_group = np.isin(group, np.unique(group[is_negative]))
+        quantities = signed.to_numpy()
+        rows = np.flatnonzero(in_negative_group)
+        for positions in pd.Series(group[rows]).groupby(group[rows], sort=False).indices.values():
+            positions = rows[positions]
+            first = np.argmax(is_negative[positions])
+            quantity = running[positions[first]] - quantities[positions[first]]
+            for position in positions[first:]:
+                if quantity + quantities[position] < -QUANTITY_TOLERANCE:
+                    is_oversell[position] = True
+                else:
+                    quantity += quantities[position]
+    is_oversell = pd.Series(is_oversell, index=trades.index)
+
+    return [
+        _anomalies(trades, is_orphan, Anomaly.ORPHAN_SELL, 'No prior holdings'),
+        _anomalies(trades, is_oversell, Anomaly.OVERSELL,
+                   'Sell ' + trades['Quantity'].abs().astype(str) + ' exceeds the position'),
+    ]
+
+
+def _anomalies(df: pd.DataFrame, mask: pd.Series, anomaly: Anomaly, detail) -> pd.DataFrame:
+    flagged = df[mask]
+    return pd.DataFrame({
+        'Row': flagged.index,
+        'Date': flagged['Date'].to_numpy(),
+        'Account Category': flagged['Account Category'].to_numpy() if 'Account Category' in df.columns else None,
+        'Symbol': flagged['Symbol'].to_numpy() if 'Symbol' in df.columns else None,
+        'Anomaly': anomaly,
+        'Detail': detail[mask].to_numpy() if isinstance(detail, pd.Series) else detail,
+    }, columns=ANOMALY_COLUMNS)
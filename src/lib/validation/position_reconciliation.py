@@ -0,0 +1,197 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from lib.model.enum.action import Action
+from lib.validation.ledger_validator import QUANTITY_TOLERANCE, validate_ledger
+
+POSITION_KEYS = ['Account Category', 'Symbol']
+RECONCILIATION_COLUMNS = ['Statement Date', 'Account Category', 'Symbol', 'Computed Quantity', 'Statement Quantity',
+                          'Quantity Drift', 'Computed Average Cost', 'Statement Average Cost', 'Average Cost Drift',
+                          'Drift']
+
+# Statements print average costs rounded to the cent
+AVERAGE_COST_TOLERANCE = 0.01
+
+# Largest log of the average cost scale factors computed at once, see _average_costs
+_MAX_LOG_SCALE = 600.0
+
+
+@dataclass
+class ReconciliationReport:
+    """
+    Computed positions compared with the holdings statements.
+
+    positions: one row per statement date and position held by either side, see RECONCILIATION_COLUMNS.
+    """
+    positions: pd.DataFrame
+
+    @property
+    def drift(self) -> pd.DataFrame:
+        return self.positions.loc[self.positions['Drift'].astype(bool)]
+
+    def log_summary(self, logger: logging.Logger) -> None:
+        """Log one message per statement date with drift."""
+        drift = self.drift
+        if drift.empty:
+            logger.info("Positions reconcile with %d statement date(s).", self.positions['Statement Date'].nunique())
+        for statement_date, rows in drift.groupby('Statement Date'):
+            logger.warning("Positions drift from the %s statement for %d position(s): %s", statement_date.date(),
+                           len(rows), ', '.join(rows['Account Category'].astype(str) + ' ' + rows['Symbol']))
+
+
+def reconcile_positions(txn_df: pd.DataFrame,
+                        holdings_df: pd.DataFrame,
+                        holdings_date: datetime,
+                        statements: pd.DataFrame,
+                        quantity_tolerance: float = QUANTITY_TOLERANCE,
+                        average_cost_tolerance: float = AVERAGE_COST_TOLERANCE) -> ReconciliationReport:
+    """
+    Roll positions forward from the baseline holdings through the ledger, and compare the quantity and
+    average cost with every later statement.
+
+    Quantities are per-symbol cumulative sums of the trades; average costs follow from cumulative products
+    of the buys (see `_average_costs`). The position at every statement date is then picked with one
+    `merge_asof`, so all statement dates are reconciled in a single chronological pass over the ledger.
+    Trades follow the semantics of CapitalGainProcessor: those rejected by the ledger validator are skipped.
+
+    :param txn_df: DataFrame containing transaction data.
+    :param holdings_df: DataFrame containing the baseline holdings.
+    :param holdings_date: The date of the baseline holdings.
+    :param statements: Later holdings statements, see `ingest_statements`.
+    :param quantity_tolerance:
+    :param average_cost_tolerance: Absolute tolerance, statements round average costs.
+    :return: ReconciliationReport
+    """
+    holdings_date = pd.Timestamp(holdings_date)
+    statements = statements.assign(**{'Statement Date': statements['Statement Date'].astype('datetime64[ns]')})
+    statements = _aggregate(statements[statements['Statement Date'] > holdings_date], ['Statement Date'])
+    if statements.empty:
+        return ReconciliationReport(positions=pd.DataFrame(columns=RECONCILIATION_COLUMNS))
+
+    last_date = statements['Statement Date'].max() + pd.Timedelta(days=1)
+    trades = txn_df[(txn_df['Activity Type'] == 'Trades') & txn_df['Action'].isin([Action.BUY, Action.SELL])
+                    & (txn_df['Date'] > holdings_date) & (txn_df['Date'] < last_date)]
+    trades = trades.drop(index=validate_ledger(trades, holdings_df, holdings_date).invalid_trade_index,
+                         errors='ignore')
+    baseline = _aggregate(holdings_df, [])
+    rolled = _roll_forward(trades, baseline)
+
+    # every position held by either side at every statement date
+    keys = pd.concat([baseline[POSITION_KEYS], rolled[POSITION_KEYS], statements[POSITION_KEYS]]).drop_duplicates()
+    grid = keys.merge(statements[['Statement Date']].drop_duplicates(), how='cross')
+    grid = grid.merge(statements, on=['Statement Date'] + POSITION_KEYS, how='left')
+
+    # the last trade settled on or before each statement date, else the baseline position
+    grid = pd.merge_asof(grid.sort_values(by='Statement Date', kind='stable'),
+                         rolled.sort_values(by='As Of', kind='stable'),
+                         left_on='Statement Date', right_on='As Of', by=POSITION_KEYS, direction='backward')
+    grid = grid.merge(baseline.rename(columns={'Quantity': 'Baseline Quantity', 'AverageCost': 'Baseline Cost'}),
+                      on=POSITION_KEYS, how='left')
+    has_trades = grid['As Of'].notna()
+    computed_quantity = grid['Computed Quantity'].where(has_trades, grid['Baseline Quantity']).fillna(0.0)
+    computed_cost = grid['Computed Average Cost'].where(has_trades, grid['Baseline Cost'])
+
+    positions = pd.DataFrame({
+        'Statement Date': grid['Statement Date'],
+        'Account Category': grid['Account Category'],
+        'Symbol': grid['Symbol'],
+        'Computed Quantity': computed_quantity,
+        'Statement Quantity': grid['Quantity'].fillna(0.0),
+        'Computed Average Cost': computed_cost.where(computed_quantity.abs() > quantity_tolerance),
+        'Statement Average Cost': grid['AverageCost'],
+    })
+    positions['Quantity Drift'] = positions['Computed Quantity'] - positions['Statement Quantity']
+    positions['Average Cost Drift'] = positions['Computed Average Cost'] - positions['Statement Average Cost']
+    positions['Drift'] = ((positions['Quantity Drift'].abs() > quantity_tolerance)
+                          | (positions['Average Cost Drift'].abs() > average_cost_tolerance))
+    is_held = ((positions['Computed Quantity'].abs() > quantity_tolerance)
+               | (positions['Statement Quantity'].abs() > quantity_tolerance))
+    return ReconciliationReport(positions=positions[is_held][RECONCILIATION_COLUMNS]
+                                .sort_values(by=['Statement Date'] + POSITION_KEYS, kind='stable')
+                                .reset_index(drop=True))
+
+
+def _aggregate(holdings: pd.DataFrame, by: list) -> pd.DataFrame:
+    # one row per position: TFSA and RRSP holdings of a symbol are both in the TFSA_RRSP category
+    holdings = holdings.assign(**{'Account Category': holdings['Account Category'].astype(str),
+                                  'Cost Basis': holdings['Quantity'] * holdings['AverageCost']})
+    aggregated = holdings.groupby(by + POSITION_KEYS, as_index=False)[['Quantity', 'Cost Basis']].sum()
+    aggregated['AverageCost'] = aggregated['Cost Basis'] / aggregated['Quantity']
+    return aggregated.drop(columns='Cost Basis')
+
+
+def _roll_forward(trades: pd.DataFrame, baseline: pd.DataFrame) -> pd.DataFrame:
+    """
+    Position after every trade, in ledger order.
+
+    :return: As Of (settlement day), Account Category, Symbol, Computed Quantity, Computed Average Cost
+    """
+    keys = [trades['Account Category'].astype(str), trades['Symbol']]
+    initial = baseline.set_index(POSITION_KEYS).reindex(pd.MultiIndex.from_arrays(keys))
+    initial_quantity = initial['Quantity'].fillna(0.0).to_numpy()
+    initial_cost = initial['AverageCost'].fillna(0.0).to_numpy()
+
+    is_buy = (trades['Action'] == Action.BUY).to_numpy()
+    quantity = trades['Quantity'].abs().to_numpy(dtype=float)
+    signed = np.where(is_buy, quantity, -quantity)
+    position = initial_quantity + pd.Series(signed, index=trades.index).groupby(keys).cumsum().to_numpy()
+    cost = quantity * trades['Price'].to_numpy(dtype=float) + trades['Commission'].abs().to_numpy(dtype=float)
+
+    group = pd.Series(np.arange(len(trades))).groupby([key.to_numpy() for key in keys]).ngroup().to_numpy()
+    return pd.DataFrame({
+        'As Of': trades['Date'].dt.normalize().to_numpy(dtype='datetime64[ns]'),
+        'Account Category': keys[0].to_numpy(),
+        'Symbol': keys[1].to_numpy(),
+        'Computed Quantity': position,
+        'Computed Average Cost': _average_costs(group, is_buy, position - signed, position, cost, initial_cost),
+    })
+
+
+def _average_costs(group: np.ndarray, is_buy: np.ndarray, previous: np.ndarray, position: np.ndarray,
+                   cost: np.ndarray, initial_cost: np.ndarray) -> np.ndarray:
+    """
+    Average cost after every trade. Sells keep the average cost; a buy of cost c into a position going from
+    q to q' gives a' = (q / q') a + c / q', a linear recurrence a_k = r_k a_(k-1) + b_k. With the prefix
+    products P_k = r_1 ... r_k it has the closed form a_k = P_k (a_0 + sum_(j<=k) b_j / P_j), i.e. a
+    cumulative product and a cumulative sum per position, computed in log space.
+
+    A buy into a closed position starts a new lot (r = 0 would zero the products), so the cumulative
+    products restart there. Lots whose products fall below exp(-_MAX_LOG_SCALE) (hundreds of partial
+    sells and rebuys) would overflow and are computed sequentially.
+    """
+    starts_lot = is_buy & (previous <= QUANTITY_TOLERANCE)
+    lot = pd.Series(starts_lot).groupby(group).cumsum().to_numpy()
+    lot_keys = [group, lot]
+
+    ratio = np.ones(len(group))
+    rebuys = is_buy & ~starts_lot
+    ratio[rebuys] = previous[rebuys] / position[rebuys]
+    log_scale = pd.Series(-np.log(ratio)).groupby(lot_keys).cumsum().to_numpy()  # -log P_k, non-decreasing
+    increment = np.where(is_buy, cost / np.where(is_buy, position, 1.0), 0.0)
+
+    first_cost = np.where(lot == 0, initial_cost, 0.0)  # a_0: the baseline average cost, or none for a new lot
+    with np.errstate(over='ignore', invalid='ignore'):
+        scaled = pd.Series(increment * np.exp(log_scale)).groupby(lot_keys).cumsum().to_numpy()
+        average_cost = np.exp(-log_scale) * (first_cost + scaled)
+
+    overflows = pd.Series(log_scale > _MAX_LOG_SCALE).groupby(lot_keys).transform('any').to_numpy()
+    if overflows.any():
+        for rows in pd.Series(np.flatnonzero(overflows)).groupby(group[overflows]).agg(list):
+            average_cost[rows] = _sequential_average_costs(is_buy[rows], previous[rows], position[rows],
+                                                            cost[rows], initial_cost[rows[0]])
+    return average_cost
+
+
+def _sequential_average_costs(is_buy: np.ndarray, previous: np.ndarray, position: np.ndarray, cost: np.ndarray,
+                              initial_cost: float) -> np.ndarray:
+    average_cost = np.empty(len(is_buy))
+    current = initial_cost
+    for i in range(len(is_buy)):
+        if is_buy[i]:
+            current = (current * max(previous[i], 0.0) + cost[i]) / position[i]
+        average_cost[i] = current
+    return average_cost
@@ -0,0 +1,170 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from lib.logger.logger import get_logger
+
+# A burst of writes is complete once no file changed for DEBOUNCE_SECONDS
+DEBOUNCE_SECONDS = 0.2
+POLL_INTERVAL_SECONDS = 0.5
+
+# inotify(7) event masks
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+_INOTIFY_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len; followed by the NUL padded name
+_INOTIFY_BUFFER_SIZE = 64 * 1024
+
+
+class DirectoryWatcher(ABC):
+    """Reports the paths created, modified, moved or deleted in a set of directories (not recursive)."""
+
+    def __init__(self, directories: Iterable[str], debounce: float = DEBOUNCE_SECONDS):
+        self.directories = [os.path.abspath(directory) for directory in directories]
+        self.debounce = debounce
+
+    def wait_for_changes(self, timeout: Optional[float] = None) -> Set[str]:
+        """
+        Block until files change, then until they have been quiet for `debounce` seconds, so that a
+        burst of writes (e.g. a large export being copied) is reported once.
+
+        :param timeout: Seconds to wait for the first change (None waits forever).
+        :return: Changed paths, empty on timeout.
+        """
+        changes = self._read_changes(timeout)
+        while changes:
+            more = self._read_changes(self.debounce)
+            if not more:
+                break
+            changes |= more
+        return changes
+
+    @abstractmethod
+    def _read_changes(self, timeout: Optional[float]) -> Set[str]:
+        """Block up to `timeout` seconds (None: forever) for changes; return as soon as there are any."""
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> 'DirectoryWatcher':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class InotifyWatcher(DirectoryWatcher):
+    """
+    Linux inotify watcher. The process sleeps in select(2) until the kernel reports an event, so an
+    idle watcher uses no CPU.
+    """
+
+    def __init__(self, directories: Iterable[str], debounce: float = DEBOUNCE_SECONDS):
+        super().__init__(directories, debounce)
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)  # AttributeError outside of Linux
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._directories_by_wd: Dict[int, str] = {}
+        for directory in self.directories:
+            wd = libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                errno = ctypes.get_errno()
+                os.close(self._fd)
+                raise OSError(errno, f'inotify_add_watch failed for {directory}')
+            self._directories_by_wd[wd] = directory
+
+    def _read_changes(self, timeout: Optional[float]) -> Set[str]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        changes = set()
+        try:
+            buffer = os.read(self._fd, _INOTIFY_BUFFER_SIZE)
+        except BlockingIOError:
+            return changes
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = _INOTIFY_EVENT.unpack_from(buffer, offset)
+            offset += _INOTIFY_EVENT.size
+            name = buffer[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if name and wd in self._directories_by_wd:
+                changes.add(os.path.join(self._directories_by_wd[wd], os.fsdecode(name)))
+        return changes
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher(DirectoryWatcher):
+    """Fallback watcher comparing (mtime, size) snapshots of the directories every `poll_interval` seconds."""
+
+    def __init__(self, directories: Iterable[str], debounce: float = DEBOUNCE_SECONDS,
+                 poll_interval: float = POLL_INTERVAL_SECONDS):
+        super().__init__(directories, debounce)
+        self.poll_interval = poll_interval
+        self._snapshot = self._scan()
+
+    def _read_changes(self, timeout: Optional[float]) -> Set[str]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            time.sleep(self.poll_interval if remaining is None else max(min(self.poll_interval, remaining), 0))
+            snapshot = self._scan()
+            changes = {path for path in snapshot.keys() | self._snapshot.keys()
+                       if snapshot.get(path) != self._snapshot.get(path)}
+            self._snapshot = snapshot
+            if changes or (deadline is not None and time.monotonic() >= deadline):
+                return changes
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for directory in self.directories:
+            try:
+                entries: List[os.DirEntry] = list(os.scandir(directory))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+                except FileNotFoundError:  # deleted while scanning
+                    continue
+        return snapshot
+
+
+def create_watcher(directories: Iterable[str], debounce: float = DEBOUNCE_SECONDS,
+                   poll_interval: float = POLL_INTERVAL_SECONDS) -> DirectoryWatcher:
+    """
+    Create an InotifyWatcher, or a PollingWatcher where inotify is unavailable (non-Linux platforms,
+    exhausted watch limits, network file systems without inotify support).
+
+    :param directories:
+    :param debounce: Quiet period closing a burst of changes, in seconds.
+    :param poll_interval: Scan interval of the polling fallback, in seconds.
+    :return:
+    """
+    directories = list(directories)
+    try:
+        return InotifyWatcher(directories, debounce)
+    except (AttributeError, OSError) as e:
+        get_logger().info("inotify is unavailable (%s), polling every %.1fs instead.", e, poll_interval)
+        return PollingWatcher(directories, debounce, poll_interval)
@@ -0,0 +1,43 @@
+import argparse
+import logging
+from datetime import datetime
+from typing import Optional
+
+import pandas as pd
+
+from lib.ingestion.ingest_baseline import ingest_statements
+from lib.ingestion.ingest_transaction import ingest_transaction
+from lib.logger.logger import initialize_logger
+from lib.model.enum.stage import Stage
+from lib.validation.position_reconciliation import reconcile_positions
+
+logger: Optional[logging.Logger] = None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Reconcile the ledger against every statement after a baseline.')
+    parser.add_argument('statements_dir', help='Directory of holdings statements (<Account>-YYYYMMDD.csv)')
+    parser.add_argument('baseline_date', help='Date of the baseline statements (YYYY-MM-DD)')
+    parser.add_argument('transaction_files', nargs='+', help='Questrade transaction exports')
+    parser.add_argument('--output', help='CSV file receiving every reconciled position (optional)')
+    args = parser.parse_args()
+
+    baseline_date = datetime.strptime(args.baseline_date, '%Y-%m-%d')
+    statements = ingest_statements(args.statements_dir)
+    holdings_df = statements[statements['Statement Date'] == baseline_date]
+    if holdings_df.empty:
+        logger.error("No statement dated %s in %s.", args.baseline_date, args.statements_dir)
+        return
+    txn_df = pd.concat([ingest_transaction(path) for path in args.transaction_files], ignore_index=True) \
+        .sort_values(by='Date', kind='stable').reset_index(drop=True)
+
+    report = reconcile_positions(txn_df, holdings_df, baseline_date,
+                                 statements[statements['Statement Date'] > baseline_date])
+    report.log_summary(logger)
+    if args.output:
+        report.positions.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    logger = initialize_logger(Stage.PROD)
+    main()
@@ -0,0 +1,44 @@
+import argparse
+import logging
+from typing import Optional
+
+from lib.batch.manifest import load_manifest
+from lib.logger.logger import initialize_logger
+from lib.metric_processor.window import calendar_windows
+from lib.model.enum.report_format import ReportFormat
+from lib.model.enum.stage import Stage
+from lib.report.export import export_reports, report_tasks
+
+logger: Optional[logging.Logger] = None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Render static reports of every portfolio of a batch manifest.')
+    parser.add_argument('manifest', help='JSON manifest of portfolios, see lib.batch.manifest.load_manifest')
+    parser.add_argument('output_dir', help='Directory receiving one sub-directory of reports per portfolio')
+    parser.add_argument('--start-date', help='With --freq, report every calendar period from this date')
+    parser.add_argument('--end-date', help='With --freq, report every calendar period until this date')
+    parser.add_argument('--freq', choices=['M', 'Q', 'Y'],
+                        help='Calendar periods to report; without it, one report over the manifest dates')
+    parser.add_argument('--format', nargs='+', type=ReportFormat, default=[ReportFormat.HTML],
+                        choices=list(ReportFormat))
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    portfolios = load_manifest(args.manifest)
+    windows = None
+    if args.freq:
+        if not (args.start_date and args.end_date):
+            parser.error('--freq requires --start-date and --end-date')
+        windows = calendar_windows(args.start_date, args.end_date, args.freq)
+    tasks = report_tasks(portfolios, windows)
+    logger.info("Begin rendering %d reports of %d portfolios.", len(tasks), len(portfolios))
+    report = export_reports(tasks, args.output_dir, formats=args.format, max_workers=args.workers)
+    for report_id, error in report.failed.items():
+        logger.error("%s: %s", report_id, error)
+    logger.info("Throughput: %.1f reports/min.", report.items_per_minute)
+
+
+if __name__ == "__main__":
+    logger = initialize_logger(Stage.PROD, structured=True)
+    main()
@@ -0,0 +1,94 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from pandas._testing import assert_frame_equal
+
+from benchmarks.synthetic_ledger import synthetic_holdings, synthetic_ledger, write_questrade_export
+from lib.ingestion.ingest_transaction import ingest_transaction
+from lib.metric_processor.capital_gain import CapitalGainProcessor
+from lib.metric_processor.processor import process_metrics
+from lib.model.enum.account_category import AccountCategory
+from lib.model.enum.backend import Backend
+
+pl = pytest.importorskip('polars')
+pytest.importorskip('pyarrow')
+
+from lib.backend import polars_backend  # noqa: E402
+
+holdings_date = datetime(2023, 12, 31)
+
+
+@pytest.fixture
+def export_path(tmp_path):
+    path = str(tmp_path / 'transactions.csv')
+    write_questrade_export(synthetic_ledger(500), path)
+    return path
+
+
+def test_ingest_transaction_should_match_pandas(export_path):
+    expected = ingest_transaction(export_path)
+    ledger = ingest_transaction(export_path, backend=Backend.POLARS)
+
+    assert isinstance(ledger, pl.LazyFrame)
+    assert_frame_equal(polars_backend.to_pandas(ledger), expected, check_exact=False)
+
+
+def test_process_metrics_should_match_pandas(export_path):
+    holdings_df = synthetic_holdings()
+    expected = process_metrics(ingest_transaction(export_path), holdings_df, holdings_date, None, None)
+    result = process_metrics(ingest_transaction(export_path, backend=Backend.POLARS), pl.from_pandas(holdings_df),
+                             holdings_date, None, None)
+
+    for account_category in AccountCategory:
+        assert result[account_category].summary == pytest.approx(expected[account_category].summary)
+        assert_frame_equal(result[account_category].daily_realized, expected[account_category].daily_realized)
+        assert_frame_equal(result[account_category].daily_realized_symbols,
+                           expected[account_category].daily_realized_symbols.reset_index(drop=True))
+        for name, details in expected[account_category].details.items():
+            assert_frame_equal(result[account_category].details[name].reset_index(drop=True),
+                               details.reset_index(drop=True), check_dtype=False, check_exact=False)
+
+
+def test_processed_ledger_should_push_filters_and_projection_into_the_query(export_path):
+    ledger = ingest_transaction(export_path, backend=Backend.POLARS)
+    expected = ingest_transaction(export_path)
+
+    processed, first_date, last_date = polars_backend.processed_ledger(ledger, [AccountCategory.MARGIN],
+                                                                       ['Trades'])
+
+    assert set(processed.columns) <= set(polars_backend.PROCESSED_COLUMNS)
+    assert (first_date, last_date) == (expected['Date'].min(), expected['Date'].max())
+    margin_trades = expected[(expected['Account Category'] == AccountCategory.MARGIN)
+                             & (expected['Activity Type'] == 'Trades')]
+    assert processed[polars_backend.ROW_INDEX].to_list() == margin_trades.index.tolist()
+
+
+def test_process_metrics_of_some_account_categories_should_match_pandas(export_path):
+    holdings_df = synthetic_holdings()
+    expected = process_metrics(ingest_transaction(export_path), holdings_df, holdings_date, None, None,
+                               account_categories=[AccountCategory.MARGIN])
+    result = process_metrics(ingest_transaction(export_path, backend=Backend.POLARS), holdings_df, holdings_date,
+                             None, None, account_categories=[AccountCategory.MARGIN])
+
+    assert list(result) == [AccountCategory.MARGIN]
+    assert result[AccountCategory.MARGIN].summary == pytest.approx(expected[AccountCategory.MARGIN].summary)
+
+
+def test_capital_gain_processor_should_skip_oversells_on_polars_frames():
+    df = pl.DataFrame({
+        'Date': [datetime(2024, 1, 1), datetime(2024, 1, 2), datetime(2024, 1, 3)],
+        'Activity Type': ['Trades', 'Trades', 'Trades'],
+        'Symbol': ['AAPL', 'AAPL', 'AAPL'],
+        'Quantity': [10, -20, -5],
+        'Price': [100.0, 150.0, 200.0],
+        'Commission': [-10.0, -5.0, -5.0],
+        'Action': ['Buy', 'Sell', 'Sell'],
+    })
+    holdings_df = pd.DataFrame(columns=['Symbol', 'Quantity', 'AverageCost', 'Account Category'])
+
+    result = CapitalGainProcessor(holdings_df, holdings_date).process(
+        df, datetime(2024, 1, 1), datetime(2024, 12, 31), AccountCategory.TFSA_RRSP)
+
+    assert result.total_realized == pytest.approx(490)  # (200 - 1010 / 10) * 5 - 5, the oversell is skipped
+    assert result.daily_realized_symbols['Date'].tolist() == [pd.Timestamp('2024-01-03')]
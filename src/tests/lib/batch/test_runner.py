@@ -0,0 +1,104 @@
+import json
+import os
+from typing import Dict
+
+import pytest
+
+from lib.batch.manifest import load_manifest
+from lib.batch import runner
+from lib.batch.runner import MIN_MEMORY_LIMIT_MB, WorkerMemoryExceeded, run_batch, run_portfolio
+from lib.batch.sink import DirectoryResultSink, ResultSink
+from lib.metric_processor.processor import MetricsResult
+from lib.model.enum.account_category import AccountCategory
+
+CSV_HEADER = ('Transaction Date,Settlement Date,Action,Symbol,Description,Quantity,Price,Gross Amount,Commission,'
+              'Net Amount,Currency,Account #,Activity Type,Account Type\n')
+STATEMENT_HEADER = 'Symbol,Description,Quantity,AverageCost\n'
+
+
+class CollectingSink(ResultSink):
+    def __init__(self):
+        self.results: Dict[str, Dict[AccountCategory, MetricsResult]] = {}
+
+    def write(self, portfolio_id, results):
+        self.results[portfolio_id] = results
+
+
+@pytest.fixture
+def manifest_filepath(tmp_path):
+    statements = tmp_path / 'statements'
+    statements.mkdir()
+    (statements / 'tfsa-20231231.csv').write_text(STATEMENT_HEADER + 'AAPL,APPLE INC,10,100\n')
+
+    (tmp_path / 'a.csv').write_text(CSV_HEADER +
+        '2024-02-01 12:00:00 AM,2024-02-01 12:00:00 AM,Sell,AAPL,APPLE INC,-5,150,750,-5,745,USD,1,Trades,Individual TFSA\n')
+    (tmp_path / 'b.csv').write_text(CSV_HEADER +
+        '2024-03-01 12:00:00 AM,2024-03-01 12:00:00 AM,DIV,MSFT,MSFT CASH DIV,0,0,0,0,7.5,USD,2,Dividends,Individual Margin\n')
+
+    manifest = [
+        {'portfolio_id': 'a', 'transaction_files': ['a.csv'], 'statements_filepath': 'statements',
+         'baseline_date': '2023-12-31', 'start_date': '2024-01-01', 'end_date': '2024-12-31'},
+        {'portfolio_id': 'b', 'transaction_files': ['a.csv', 'b.csv'], 'statements_filepath': 'statements',
+         'baseline_date': '2023-12-31', 'start_date': '2024-01-01', 'end_date': '2024-12-31'},
+        {'portfolio_id': 'broken', 'transaction_files': ['missing.csv'], 'statements_filepath': 'statements',
+         'baseline_date': '2023-12-31'},
+    ]
+    path = tmp_path / 'manifest.json'
+    path.write_text(json.dumps(manifest))
+    return str(path)
+
+
+def test_run_batch_should_stream_every_portfolio_to_sink(manifest_filepath):
+    sink = CollectingSink()
+
+    report = run_batch(load_manifest(manifest_filepath), sink, max_workers=2)
+
+    assert report.total == 3
+    assert report.succeeded == 2
+    assert list(report.failed) == ['broken']
+    assert report.items_per_minute > 0
+    assert sink.results['a'][AccountCategory.TFSA_RRSP].summary['total_realized'] == 245  # (150 - 100) * 5 - 5
+    assert sink.results['b'][AccountCategory.MARGIN].summary['total_dividends'] == 7.5
+
+
+def test_directory_sink_should_write_summary_and_tables(manifest_filepath, tmp_path):
+    output_dir = tmp_path / 'out'
+
+    run_batch(load_manifest(manifest_filepath)[:1], DirectoryResultSink(str(output_dir)), max_workers=1)
+
+    summary = json.loads((output_dir / 'a' / 'summary.json').read_text())
+    assert summary['TFSA_RRSP']['total_realized'] == 245
+    assert (output_dir / 'a' / 'TFSA_RRSP-daily_realized_symbols.csv').exists()
+
+
+def test_run_portfolio_should_reingest_corrected_statement(manifest_filepath, tmp_path):
+    portfolio = load_manifest(manifest_filepath)[0]
+    assert run_portfolio(portfolio)[AccountCategory.TFSA_RRSP].summary['total_realized'] == 245
+
+    statement = tmp_path / 'statements' / 'tfsa-20231231.csv'
+    statement.write_text(STATEMENT_HEADER + 'AAPL,APPLE INC,10,110\n')
+    os.utime(statement, (statement.stat().st_atime, statement.stat().st_mtime + 10))
+
+    assert run_portfolio(portfolio)[AccountCategory.TFSA_RRSP].summary['total_realized'] == 195  # (150 - 110) * 5 - 5
+
+
+def test_run_batch_should_process_every_portfolio_within_the_memory_limit(manifest_filepath):
+    sink = CollectingSink()
+
+    report = run_batch(load_manifest(manifest_filepath), sink, max_workers=2, memory_limit_mb=1024)
+
+    assert report.succeeded == 2
+    assert sink.results['a'][AccountCategory.TFSA_RRSP].summary['total_realized'] == 245
+
+
+def test_run_batch_should_reject_a_memory_limit_too_small_for_the_pipeline(manifest_filepath):
+    with pytest.raises(ValueError):
+        run_batch(load_manifest(manifest_filepath), CollectingSink(), memory_limit_mb=MIN_MEMORY_LIMIT_MB - 1)
+
+
+def test_run_portfolio_should_hand_back_portfolios_over_the_memory_limit(manifest_filepath, monkeypatch):
+    monkeypatch.setattr(runner, '_memory_limit_mb', MIN_MEMORY_LIMIT_MB)
+    monkeypatch.setattr(runner, '_peak_rss_mb', lambda: MIN_MEMORY_LIMIT_MB + 1.0)
+
+    with pytest.raises(WorkerMemoryExceeded):
+        run_portfolio(load_manifest(manifest_filepath)[0])
@@ -0,0 +1,105 @@
+import pandas as pd
+from datetime import datetime
+
+import pytest
+
+from lib.ingestion.corporate_actions import apply_corporate_actions, canonical_symbols, load_corporate_actions
+from lib.metric_processor.capital_gain import CapitalGainProcessor
+from lib.model.enum.account_category import AccountCategory
+
+CORPORATE_ACTIONS_CSV = """Date,Symbol,Type,Ratio,New Symbol
+2024-06-10,NVDA,Split,10,
+2024-03-01,FB,Symbol Change,,META
+2024-09-01,META,Split,2,
+2024-10-01,OLD,Consolidation,0.1,
+"""
+
+
+@pytest.fixture
+def actions(tmp_path):
+    path = tmp_path / 'corporate_actions.csv'
+    path.write_text(CORPORATE_ACTIONS_CSV)
+    return load_corporate_actions(str(path))
+
+
+def _ledger(data):
+    df = pd.DataFrame(data)
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+    df['Activity Type'] = 'Trades'
+    return df
+
+
+def test_canonical_symbols_should_follow_chains_before_their_dates():
+    actions = pd.DataFrame({'Date': pd.to_datetime(['2024-01-01', '2024-02-01']),
+                            'Type': ['Symbol Change', 'Symbol Change'], 'Symbol': ['A', 'B'],
+                            'New Symbol': ['B', 'C']})
+    symbols = pd.Series(['A', 'B', 'A', 'B', 'D'])
+    dates = pd.Series(pd.to_datetime(['2023-12-01', '2024-01-15', '2024-01-15', '2024-03-01', '2023-12-01']))
+
+    # A is reused after its change to B, and B after its change to C
+    assert canonical_symbols(actions, symbols, dates).tolist() == ['C', 'C', 'A', 'B', 'D']
+
+
+def test_symbol_change_back_should_resolve_to_the_latest_symbol():
+    actions = pd.DataFrame({'Date': pd.to_datetime(['2024-01-01', '2024-02-01']),
+                            'Type': ['Symbol Change', 'Symbol Change'], 'Symbol': ['A', 'B'],
+                            'New Symbol': ['B', 'A']})
+    symbols = pd.Series(['A', 'B'])
+    dates = pd.Series(pd.to_datetime(['2023-12-01', '2024-01-15']))
+
+    assert canonical_symbols(actions, symbols, dates).tolist() == ['A', 'A']
+
+
+def test_splits_and_renames_should_be_applied_before_their_date(actions):
+    txn_df = _ledger({
+        'Date': ['2024-01-02', '2024-06-10', '2024-02-01', '2024-04-01', '2024-12-01'],
+        'Symbol': ['NVDA', 'NVDA', 'FB', 'META', 'OLD'],
+        'Quantity': [5, 10, 3, 1, 100],
+        'Price': [500, 120, 300, 500, 1],
+        'Action': ['Buy', 'Buy', 'Buy', 'Buy', 'Buy'],
+    })
+    holdings_df = pd.DataFrame({'Symbol': ['FB', 'OLD'], 'Quantity': [2, 50], 'AverageCost': [200, 2.0]})
+
+    adjusted, adjusted_holdings = apply_corporate_actions(txn_df, actions, holdings_df, datetime(2023, 12, 31))
+
+    assert adjusted['Symbol'].tolist() == ['NVDA', 'NVDA', 'META', 'META', 'OLD']
+    assert adjusted['Original Symbol'].tolist() == ['NVDA', 'NVDA', 'FB', 'META', 'OLD']
+    assert adjusted['Quantity'].tolist() == [50, 10, 6, 2, 100]
+    assert adjusted['Price'].tolist() == [50, 120, 150, 250, 1]
+    assert adjusted_holdings['Symbol'].tolist() == ['META', 'OLD']
+    assert adjusted_holdings['Quantity'].tolist() == [4, 5]
+    assert adjusted_holdings['AverageCost'].tolist() == [100, 20]
+
+
+def test_reused_symbol_should_not_be_renamed_after_its_change(actions):
+    txn_df = _ledger({
+        'Date': ['2024-02-01', '2024-05-01'],
+        'Symbol': ['FB', 'FB'],
+        'Quantity': [3, 7],
+        'Price': [300, 10],
+        'Action': ['Buy', 'Buy'],
+    })
+
+    adjusted, _ = apply_corporate_actions(txn_df, actions)
+
+    # the META split does not apply to the later, unrelated FB
+    assert adjusted['Symbol'].tolist() == ['META', 'FB']
+    assert adjusted['Quantity'].tolist() == [6, 7]
+
+
+def test_selling_post_split_shares_should_not_oversell(actions):
+    txn_df = _ledger({
+        'Date': ['2024-01-02', '2024-07-01'],
+        'Symbol': ['NVDA', 'NVDA'],
+        'Quantity': [5, -50],
+        'Price': [500, 120],
+        'Commission': [0, 0],
+        'Action': ['Buy', 'Sell'],
+    })
+    holdings_df = pd.DataFrame(columns=['Symbol', 'Quantity', 'AverageCost', 'Account Category'])
+    adjusted, _ = apply_corporate_actions(txn_df, actions)
+
+    result = CapitalGainProcessor(holdings_df, datetime(2023, 12, 31)).process(
+        adjusted, datetime(2024, 1, 1), datetime(2024, 12, 31), AccountCategory.MARGIN)
+
+    assert result.total_realized == 3500  # (120 - 500 / 10) * 50
@@ -0,0 +1,26 @@
+from datetime import datetime
+
+import pandas as pd
+
+from lib.ingestion.ingest_baseline import ingest_baseline, ingest_statements
+from lib.model.enum.account_category import AccountCategory
+
+
+def _write_statement(path, quantity):
+    pd.DataFrame({'Symbol': ['AAPL'], 'Quantity': [quantity], 'AverageCost': [100.0]}).to_csv(path, index=False)
+
+
+def test_baseline_and_statements_should_match_file_names_case_insensitively(tmp_path):
+    _write_statement(tmp_path / 'Margin-20231231.csv', 10)
+    _write_statement(tmp_path / 'tfsa-20231231.csv', 5)
+    _write_statement(tmp_path / 'MARGIN-20240131.csv', 12)
+    _write_statement(tmp_path / 'notes-20231231.csv', 1)
+
+    baseline = ingest_baseline(datetime(2023, 12, 31), str(tmp_path))
+    statements = ingest_statements(str(tmp_path), after=datetime(2023, 12, 31))
+
+    assert sorted(baseline) == ['MARGIN', 'TFSA']
+    assert baseline['MARGIN']['Quantity'].tolist() == [10]
+    assert baseline['TFSA']['Account Category'].tolist() == [AccountCategory.TFSA_RRSP]
+    assert statements['Statement Date'].tolist() == [pd.Timestamp('2024-01-31')]
+    assert statements['Quantity'].tolist() == [12]
@@ -0,0 +1,82 @@
+import pandas as pd
+from datetime import datetime
+
+import pytest
+from pandas._testing import assert_frame_equal
+
+from lib.ingestion.ingest_transaction import ingest_transaction, ingest_transaction_to_store
+from lib.ingestion.ledger_store import LedgerStore
+from lib.metric_processor.processor import process_metrics, process_metrics_from_store
+from lib.model.enum.account_category import AccountCategory
+
+CSV_HEADER = ('Transaction Date,Settlement Date,Action,Symbol,Description,Quantity,Price,Gross Amount,Commission,'
+              'Net Amount,Currency,Account #,Activity Type,Account Type\n')
+CSV_ROWS = [
+    '2024-01-02 12:00:00 AM,2024-01-04 12:00:00 AM,Buy,AAPL,APPLE INC,10,100,-1000,-5,-1005,USD,1,Trades,Individual TFSA\n',
+    '2024-02-01 12:00:00 AM,2024-02-05 12:00:00 AM,Sell,AAPL,APPLE INC,-5,150,750,-5,745,USD,1,Trades,Individual TFSA\n',
+    '2024-02-10 12:00:00 AM,2024-02-10 12:00:00 AM,DIV,AAPL,APPLE INC CASH DIV,0,0,0,0,2.5,USD,1,Dividends,Individual TFSA\n',
+    '2024-03-01 12:00:00 AM,2024-03-01 12:00:00 AM,DIV,MSFT,MICROSOFT CASH DIV,0,0,0,0,7.5,USD,2,Dividends,Individual Margin\n',
+    '2024-03-02 12:00:00 AM,2024-03-02 12:00:00 AM,CON,,CONTRIBUTION,0,0,0,0,500,USD,2,Deposits,Individual Margin\n',
+    '2024-03-03 12:00:00 AM,2024-03-03 12:00:00 AM,FXT,,CAD CONVERSION,0,0,0,0,100,CAD,2,Other,Individual Margin\n',
+]
+holdings_date = datetime(2023, 12, 31)
+
+
+@pytest.fixture
+def txn_filepath(tmp_path):
+    path = tmp_path / 'txns.csv'
+    path.write_text(CSV_HEADER + ''.join(CSV_ROWS))
+    return str(path)
+
+
+@pytest.fixture
+def store():
+    with LedgerStore() as store:
+        store.insert_baseline(holdings_date, {'TFSA': pd.DataFrame({
+            'Symbol': ['MSFT'], 'Quantity': [3], 'AverageCost': [300.0],
+            'Account Category': [AccountCategory.TFSA_RRSP]})})
+        yield store
+
+
+def test_query_transactions_should_push_down_filters(txn_filepath, store):
+    ingest_transaction(txn_filepath, store=store)
+
+    df = store.query_transactions(account_category=AccountCategory.TFSA_RRSP, activity_types=['Trades'],
+                                  end_date=datetime(2024, 1, 31))
+
+    assert df['Symbol'].tolist() == ['AAPL']
+    assert df['Date'].tolist() == [pd.Timestamp('2024-01-04')]
+    assert df['Account Category'].tolist() == [AccountCategory.TFSA_RRSP]
+
+
+def test_reimport_should_replace_rows_of_same_file(txn_filepath, store):
+    ingest_transaction(txn_filepath, store=store)
+    ingest_transaction(txn_filepath, store=store)
+    inserted = ingest_transaction_to_store(txn_filepath, store, chunksize=2)
+
+    assert inserted == 5  # CAD row is filtered out
+    assert len(store.query_transactions()) == 5
+
+
+def test_aggregations_should_run_in_store(txn_filepath, store):
+    ingest_transaction_to_store(txn_filepath, store, chunksize=2)
+
+    totals = store.dividend_totals(start_date=datetime(2024, 1, 1), end_date=datetime(2024, 12, 31))
+    assert dict(zip(totals['Account Category'], totals['Total Dividends'])) == {
+        AccountCategory.MARGIN: 7.5, AccountCategory.TFSA_RRSP: 2.5}
+
+    rollup = store.daily_rollup(account_category=AccountCategory.MARGIN)
+    assert rollup['Activity Type'].tolist() == ['Dividends', 'Deposits']
+    assert rollup['Net Amount'].tolist() == [7.5, 500.0]
+
+
+def test_process_metrics_from_store_should_match_in_memory(txn_filepath, store):
+    txn_df = ingest_transaction(txn_filepath, store=store)
+    holdings_df = store.query_baseline(holdings_date)
+
+    expected = process_metrics(txn_df, holdings_df, holdings_date, '2024-01-01', '2024-12-31')
+    result = process_metrics_from_store(store, holdings_date, '2024-01-01', '2024-12-31')
+
+    for account_category in AccountCategory:
+        assert result[account_category].summary == expected[account_category].summary
+        assert_frame_equal(result[account_category].daily_realized, expected[account_category].daily_realized)
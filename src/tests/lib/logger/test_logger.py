@@ -0,0 +1,93 @@
+import io
+import json
+import logging
+import sys
+
+import pytest
+
+from lib.logger.logger import RateLimitFilter, initialize_logger
+from lib.model.enum.stage import Stage
+
+
+def _record(msg, *args, level=logging.ERROR):
+    return logging.LogRecord('test', level, __file__, 1, msg, args, None)
+
+
+def test_rate_limit_filter_should_sample_per_message_type():
+    rate_limit = RateLimitFilter(burst=2, interval=60, sample_every=3)
+
+    passed = [rate_limit.filter(_record("Oversell of %s on row %d.", 'AAPL', i)) for i in range(8)]
+    assert passed == [True, True, False, False, True, False, False, True]
+
+    # other message types have their own budget
+    assert rate_limit.filter(_record("Orphan sell of %s.", 'ZIM'))
+
+
+def test_rate_limit_filter_should_report_suppressed_count():
+    rate_limit = RateLimitFilter(burst=1, interval=60, sample_every=2)
+    records = [_record("Oversell on row %d.", i) for i in range(3)]
+
+    assert [rate_limit.filter(record) for record in records] == [True, False, True]
+    assert records[2].suppressed == 1
+
+
+@pytest.fixture
+def structured_output():
+    stream = io.StringIO()
+    stderr, sys.stderr = sys.stderr, stream
+    try:
+        logger = initialize_logger(Stage.DEV, structured=True)
+    finally:
+        sys.stderr = stderr
+    yield logger, stream
+    initialize_logger(Stage.DEV)
+
+
+def _entries(stream):
+    # back to inline logging, which writes the records still queued
+    initialize_logger(Stage.DEV)
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_queued_records_should_be_formatted_as_json(structured_output):
+    logger, stream = structured_output
+
+    logger.error("Oversell of %s on row %d.", 'AAPL', 3)
+    entry = _entries(stream)[0]
+
+    assert entry['message'] == 'Oversell of AAPL on row 3.'
+    assert entry['template'] == 'Oversell of %s on row %d.'
+    assert entry['level'] == 'ERROR'
+
+
+def test_queued_exceptions_should_keep_their_traceback(structured_output):
+    logger, stream = structured_output
+
+    try:
+        raise ValueError('bad row')
+    except ValueError:
+        logger.exception("Failed on row %d.", 3)
+    entry = _entries(stream)[0]
+
+    assert entry['message'] == 'Failed on row 3.'
+    assert 'ValueError: bad row' in entry['exception']
+
+
+def test_structured_logging_should_not_be_ignored_with_other_handlers(structured_output):
+    logger, stream = structured_output
+    root_handler = logging.NullHandler()
+    logging.getLogger().addHandler(root_handler)
+    try:
+        assert logger.hasHandlers()
+        stderr, sys.stderr = sys.stderr, stream
+        try:
+            initialize_logger(Stage.DEV)
+            initialize_logger(Stage.DEV, structured=True)
+        finally:
+            sys.stderr = stderr
+        logger.info("Structured again.")
+        entries = _entries(stream)
+    finally:
+        logging.getLogger().removeHandler(root_handler)
+
+    assert entries[-1]['message'] == 'Structured again.'
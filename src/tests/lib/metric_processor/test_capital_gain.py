@@ -8,6 +8,7 @@ from lib.metric_processor.capital_gain import CapitalGainProcessor
 from pandas._testing import assert_frame_equal
 
 from lib.model.enum.account_category import AccountCategory
+from lib.validation.ledger_validator import ANOMALY_COLUMNS, LedgerReport
 
 holdings_data = {
     'Symbol': ['TSLA', 'BRK.B'],
@@ -60,7 +61,9 @@ def test_capital_gain_processor_when_no_holding():
     expected_daily_realized_symbols = pd.DataFrame({
         'Date': [pd.Timestamp('2024-01-02')],
         'Symbol': ['AAPL'],
-        'Realized': [240.0]
+        'Realized': [240.0],
+        'Denied Loss': [0.0],
+        'Row': [1]
     })
     assert_frame_equal(result.daily_realized_symbols, expected_daily_realized_symbols)
 
@@ -102,8 +105,8 @@ def test_capital_gain_processor_when_no_holding_no_sell():
     })
     assert_frame_equal(result.daily_realized, expected_df)
 
-    expected_df = pd.DataFrame(columns=['Date', 'Symbol', 'Realized'])
-    expected_df['Realized'] = expected_df['Realized'].astype(float)
+    expected_df = pd.DataFrame(columns=['Date', 'Symbol', 'Realized', 'Denied Loss', 'Row']).astype(
+        {'Date': 'datetime64[ns]', 'Realized': float, 'Denied Loss': float, 'Row': 'int64'})
     assert_frame_equal(result.daily_realized_symbols, expected_df)
 
 
@@ -161,6 +164,55 @@ def test_capital_gain_processor_when_no_holding_sell_without_bought_should_log_e
     assert any("Sell transaction found for symbol" in message for message in caplog.messages)
 
 
+def test_capital_gain_processor_when_selling_on_holdings_date_should_skip_orphan_sell(caplog):
+    data = {
+        'Date': ['2022-01-01', '2022-01-02'],
+        'Activity Type': ['Trades', 'Trades'],
+        'Symbol': ['ZIM', 'TSLA'],
+        'Quantity': [-5, -5],
+        'Price': [100, 200],
+        'Commission': [0, 0],
+        'Action': ['Sell', 'Sell']
+    }
+    df = pd.DataFrame(data)
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+
+    processor = CapitalGainProcessor(holdings_df, holdings_date)
+
+    with caplog.at_level(logging.ERROR):
+        result = processor.process(df=df, start_date=holdings_date, end_date=datetime(2022, 12, 31),
+                                   account_category=AccountCategory.TFSA_RRSP)
+
+    assert result.total_realized == 500  # (200 - 100) * 5, the ZIM sell is skipped
+    assert any("Sell transaction found for symbol" in message for message in caplog.messages)
+
+
+def test_capital_gain_processor_should_log_negative_positions_left_by_sells_missed_by_the_ledger_report(caplog):
+    data = {
+        'Date': ['2024-01-01', '2024-01-02'],
+        'Activity Type': ['Trades', 'Trades'],
+        'Symbol': ['ZIM', 'TSLA'],
+        'Quantity': [-5, -15],
+        'Price': [100, 200],
+        'Commission': [0, 0],
+        'Action': ['Sell', 'Sell']
+    }
+    df = pd.DataFrame(data)
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+
+    processor = CapitalGainProcessor(holdings_df, holdings_date, LedgerReport(anomalies=pd.DataFrame(
+        columns=ANOMALY_COLUMNS)))
+
+    with caplog.at_level(logging.ERROR):
+        result = processor.process(df=df, start_date=datetime(2024, 1, 1), end_date=datetime(2024, 12, 31),
+                                   account_category=AccountCategory.TFSA_RRSP)
+
+    assert (result.position_history.set_index('Symbol')['Quantity'] == -5).all()
+    errors = [message for message in caplog.messages if "left negative positions" in message]
+    assert errors == ["Sells missed by the ledger report left negative positions: ZIM on 2024-01-01, "
+                      "TSLA on 2024-01-02"]
+
+
 def test_capital_gain_processor_when_no_holding_before_trades_should_affect_cumulative_position():
     data = {
         'Date': ['2023-11-01', '2023-12-01', '2024-01-01', '2024-01-02'],
@@ -196,6 +248,8 @@ def test_capital_gain_processor_when_no_holding_before_trades_should_affect_cumu
     })
     expected_df.loc[expected_df['Date'] == pd.Timestamp('2024-01-02'), 'Realized Gain'] = 240.0
     assert_frame_equal(result.daily_realized, expected_df)
+    assert result.realized_history['Date'].tolist() == [pd.Timestamp('2023-12-01'), pd.Timestamp('2024-01-02')]
+    assert result.daily_realized_symbols['Row'].tolist() == [3]
 
 
 def test_capital_gain_processor_when_no_holding_after_trades_should_not_affect_cap_gain():
@@ -277,7 +331,9 @@ def test_capital_gain_processor_when_holding_should_affect_cap_gain():
     expected_daily_realized_symbols = pd.DataFrame({
         'Date': [pd.Timestamp('2024-01-02')],
         'Symbol': ['TSLA'],
-        'Realized': [245.0]
+        'Realized': [245.0],
+        'Denied Loss': [0.0],
+        'Row': [1]
     })
     assert_frame_equal(result.daily_realized_symbols, expected_daily_realized_symbols)
 #
@@ -1,7 +1,9 @@
 import pytest
 import pandas as pd
 from datetime import datetime
+from lib.ingestion.dividend_description import parse_dividend_description
 from lib.metric_processor.dividend import DividendProcessor
+from lib.model.enum.account_category import AccountCategory
 
 
 def test_dividend_processor():
@@ -74,3 +76,80 @@ def test_dividend_outside_of_date_range_should_be_ignored():
 
     # Assert results
     assert result.total_dividends == 200  # Only the second dividend should be included
+
+
+def test_dividend_processor_should_break_down_by_symbol_and_month():
+    data = {
+        'Date': ['2024-07-31 12:00:00 AM', '2024-07-31 12:00:00 AM', '2024-10-31 12:00:00 AM'],
+        'Activity Type': ['Dividends', 'Dividends', 'Dividends'],
+        'Symbol': ['JPM', 'JPM', 'JPM'],
+        'Description': ['JPMORGAN CHASE & CO CASH DIV ON 16 SHS REC 07/05/24 PAY 07/31/24',
+                        'JPMORGAN CHASE & CO NON-RES TAX WITHHELD',
+                        'JPMORGAN CHASE & CO CASH DIV ON 16 SHS REC 10/04/24 PAY 10/31/24'],
+        'Net Amount': [18.40, -2.76, 20.00]
+    }
+    df = pd.DataFrame(data)
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d %I:%M:%S %p')
+    holdings_df = pd.DataFrame({'Symbol': ['JPM'], 'Quantity': [16], 'AverageCost': [170.0],
+                                'Account Category': [AccountCategory.MARGIN]})
+
+    processor = DividendProcessor(holdings_df)
+    result = processor.process(df, datetime(2024, 1, 1), datetime(2024, 12, 31), AccountCategory.MARGIN)
+
+    assert result.total_dividends == pytest.approx(35.64)
+    assert result.total_withholding_tax == pytest.approx(2.76)
+
+    monthly = result.monthly_dividends.set_index('Month')
+    assert monthly.loc['2024-07-01', 'Gross Dividends'] == pytest.approx(18.40)
+    assert monthly.loc['2024-07-01', 'Net Dividends'] == pytest.approx(15.64)
+    assert monthly.loc['2024-07-01', 'Dividend Per Share'] == pytest.approx(1.15)
+    assert monthly.loc['2024-10-01', 'Dividend Per Share'] == pytest.approx(1.25)
+
+    yield_on_cost = result.yield_on_cost.set_index('Symbol')
+    assert yield_on_cost.loc['JPM', 'Yield On Cost'] == pytest.approx(38.40 / (16 * 170.0))
+
+
+def test_parse_dividend_description():
+    df = pd.DataFrame({
+        'Activity Type': ['Dividends', 'Trades'],
+        'Description': ['APPLE INC CASH DIV ON 1,200 SHS REC 02/12/24 PAY 02/15/24', 'APPLE INC DIV ON 5 SHS'],
+        'Net Amount': [288.0, 0.0]
+    })
+
+    result = parse_dividend_description(df)
+
+    assert result['Dividend Shares'].iloc[0] == 1200
+    assert result['Record Date'].iloc[0] == pd.Timestamp('2024-02-12')
+    assert result['Pay Date'].iloc[0] == pd.Timestamp('2024-02-15')
+    assert pd.isna(result['Dividend Shares'].iloc[1])
+    assert not result['Withholding Tax'].any()
+
+
+def test_dividend_processor_should_use_positions_held_on_record_dates():
+    data = {
+        'Date': ['2024-02-01', '2024-07-02', '2024-07-20', '2024-07-31', '2024-07-31'],
+        'Activity Type': ['Trades', 'Trades', 'Dividends', 'Trades', 'Dividends'],
+        'Action': ['Buy', 'Buy', 'DIV', 'Sell', 'DIV'],
+        'Symbol': ['JPM', 'JPM', 'JPM', 'JPM', 'JPM'],
+        'Description': ['', '', 'JPMORGAN CHASE & CO CASH DIV ON 10 SHS REC 07/01/24 PAY 07/20/24', '',
+                        'JPMORGAN CHASE & CO CASH DIV ON 20 SHS REC 07/05/24 PAY 07/31/24'],
+        'Quantity': [10, 10, 0, -20, 0],
+        'Price': [150.0, 200.0, 0.0, 210.0, 0.0],
+        'Commission': [0.0, 0.0, 0.0, 0.0, 0.0],
+        'Net Amount': [0.0, 0.0, 10.0, 0.0, 30.0],
+    }
+    df = pd.DataFrame(data)
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+    holdings_df = pd.DataFrame(columns=['Symbol', 'Quantity', 'AverageCost', 'Account Category'])
+
+    processor = DividendProcessor(holdings_df, datetime(2023, 12, 31))
+    result = processor.process(df, datetime(2024, 1, 1), datetime(2024, 12, 31), AccountCategory.MARGIN)
+
+    monthly = result.monthly_dividends.set_index('Month')
+    assert monthly.loc['2024-07-01', 'Shares'] == 20
+    assert monthly.loc['2024-07-01', 'Dividend Per Share'] == pytest.approx(1.0 + 1.5)
+
+    # bought after the baseline: 10 at 150 on the first record date, 20 at 175 on the second
+    yield_on_cost = result.yield_on_cost.set_index('Symbol')
+    assert yield_on_cost.loc['JPM', 'Yield On Cost'] == pytest.approx(10 / 1500 + 30 / 3500)
+    assert yield_on_cost.loc['JPM', 'Cost Basis'] == pytest.approx(40 / (10 / 1500 + 30 / 3500))
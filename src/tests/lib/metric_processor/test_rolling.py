@@ -0,0 +1,138 @@
+import math
+
+import pandas as pd
+from datetime import datetime
+
+import pytest
+
+from lib.metric_processor.rolling import RollingProcessor
+from lib.model.enum.account_category import AccountCategory
+
+
+@pytest.fixture
+def df():
+    df = pd.DataFrame({
+        'Date': ['2024-01-01', '2024-01-05', '2024-01-10', '2024-01-20', '2024-02-15'],
+        'Activity Type': ['Trades', 'Trades', 'Dividends', 'Trades', 'Trades'],
+        'Symbol': ['AAPL', 'AAPL', 'AAPL', 'TSLA', 'AAPL'],
+        'Quantity': [-10, -10, 0, -5, -10],
+        'Price': [110, 90, 0, 220, 120],
+        'Commission': [0, 0, 0, 0, 0],
+        'Net Amount': [0, 0, 5, 0, 0],
+        'Action': ['Sell', 'Sell', 'DIV', 'Sell', 'Sell'],
+    })
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+    return df
+
+
+@pytest.fixture
+def daily_realized_symbols():
+    # cost basis of 100 per share for every sale
+    df = pd.DataFrame({
+        'Date': ['2024-01-01', '2024-01-05', '2024-01-20', '2024-02-15'],
+        'Symbol': ['AAPL', 'AAPL', 'TSLA', 'AAPL'],
+        'Realized': [100.0, -100.0, 100.0, 200.0],
+        'Denied Loss': 0.0,
+        'Row': [0, 1, 3, 4],
+    })
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+    return df
+
+
+def test_rolling_should_sum_over_trailing_days(df, daily_realized_symbols):
+    processor = RollingProcessor(windows=[30])
+    result = processor.process(df, datetime(2024, 1, 1), datetime(2024, 2, 29), AccountCategory.MARGIN,
+                               daily_realized_symbols)
+
+    rolling = result.rolling.set_index('Date')
+    assert rolling.loc['2024-01-20', 'Realized P&L'] == 100  # 100 - 100 + 100
+    assert rolling.loc['2024-01-20', 'Dividends'] == 5
+    assert rolling.loc['2024-01-20', 'Win Rate'] == pytest.approx(2 / 3)
+    # 2024-01-01 and 2024-01-05 have left the 30-day window by 2024-02-15
+    assert rolling.loc['2024-02-15', 'Realized P&L'] == 300
+    assert rolling.loc['2024-02-15', 'Win Rate'] == 1
+    assert rolling.loc['2024-02-15', 'Volatility'] == pytest.approx(pd.Series([0.1, 0.2]).std())
+    assert math.isnan(rolling.loc['2024-01-01', 'Volatility'])
+
+
+def test_rolling_symbols_should_only_report_days_with_activity(df, daily_realized_symbols):
+    processor = RollingProcessor(windows=[30, 90])
+    result = processor.process(df, datetime(2024, 1, 1), datetime(2024, 2, 29), AccountCategory.MARGIN,
+                               daily_realized_symbols)
+
+    aapl = result.rolling_symbols[(result.rolling_symbols['Symbol'] == 'AAPL')
+                                  & (result.rolling_symbols['Window'] == 90)]
+    assert aapl['Date'].dt.strftime('%Y-%m-%d').tolist() == ['2024-01-01', '2024-01-05', '2024-01-10',
+                                                            '2024-02-15']
+    assert aapl['Realized P&L'].tolist() == [100, 0, 0, 200]
+    assert aapl['Dividends'].tolist() == [0, 0, 5, 5]
+
+
+def test_drawdown_of_cumulative_realized(df, daily_realized_symbols):
+    processor = RollingProcessor(windows=[30])
+    result = processor.process(df, datetime(2024, 1, 1), datetime(2024, 2, 29), AccountCategory.MARGIN,
+                               daily_realized_symbols)
+
+    assert result.max_drawdown == 100
+    drawdown = result.drawdown.set_index('Date')
+    assert drawdown.loc['2024-01-05', 'Drawdown'] == -100
+    assert drawdown.loc['2024-02-15', 'Cumulative Realized'] == 300
+    assert result.rolling.set_index('Date').loc['2024-01-05', 'Drawdown'] == -100
+
+
+def test_rolling_windows_should_include_sales_before_start_date(df, daily_realized_symbols):
+    processor = RollingProcessor(windows=[30])
+    result = processor.process(df, datetime(2024, 1, 10), datetime(2024, 2, 29), AccountCategory.MARGIN,
+                               daily_realized_symbols)
+
+    rolling = result.rolling.set_index('Date')
+    assert rolling.index.min() == pd.Timestamp('2024-01-10')
+    assert rolling.loc['2024-01-10', 'Realized P&L'] == 0  # 100 - 100 before the start date
+    assert rolling.loc['2024-01-10', 'Win Rate'] == 0.5
+    assert rolling.loc['2024-01-20', 'Realized P&L'] == 100
+    assert result.drawdown['Date'].min() == pd.Timestamp('2024-01-10')
+    assert result.drawdown.set_index('Date').loc['2024-02-15', 'Cumulative Realized'] == 300
+    aapl = result.rolling_symbols[result.rolling_symbols['Symbol'] == 'AAPL']
+    assert aapl['Date'].min() == pd.Timestamp('2024-01-10')
+    assert aapl.set_index('Date').loc['2024-01-10', 'Realized P&L'] == 0
+
+
+def test_rolling_drawdown_should_start_from_zero_like_the_drawdown(df, daily_realized_symbols):
+    losses = daily_realized_symbols.assign(Realized=[-200.0, 50.0, 0.0, 0.0])
+    processor = RollingProcessor(windows=[30])
+    result = processor.process(df, datetime(2024, 1, 1), datetime(2024, 2, 29), AccountCategory.MARGIN, losses)
+
+    rolling = result.rolling.set_index('Date')
+    drawdown = result.drawdown.set_index('Date')
+    assert rolling.loc['2024-01-01', 'Drawdown'] == drawdown.loc['2024-01-01', 'Drawdown'] == -200
+    assert rolling.loc['2024-01-05', 'Drawdown'] == drawdown.loc['2024-01-05', 'Drawdown'] == -150
+    # both sales have left the window: no drawdown within it
+    assert rolling.loc['2024-02-15', 'Drawdown'] == 0
+    assert result.max_drawdown == 200
+
+
+def test_win_rate_and_volatility_should_count_each_sale():
+    df = pd.DataFrame({
+        'Date': ['2024-01-05', '2024-01-05', '2024-01-05'],
+        'Activity Type': ['Trades', 'Trades', 'Trades'],
+        'Symbol': ['AAPL', 'AAPL', 'AAPL'],
+        'Quantity': [-10, -10, -10],
+        'Price': [130, 90, 500],
+        'Commission': [0, 0, 0],
+        'Net Amount': [0, 0, 0],
+        'Action': ['Sell', 'Sell', 'Sell'],
+    })
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+    # cost basis of 100 per share; the third sell was rejected by the ledger validator
+    realized = pd.DataFrame({'Date': pd.to_datetime(['2024-01-05', '2024-01-05']), 'Symbol': ['AAPL', 'AAPL'],
+                             'Realized': [300.0, -100.0], 'Denied Loss': 0.0, 'Row': [0, 1]})
+
+    result = RollingProcessor(windows=[30]).process(df, datetime(2024, 1, 1), datetime(2024, 1, 31),
+                                                    AccountCategory.MARGIN, realized)
+
+    rolling = result.rolling.set_index('Date')
+    assert rolling.loc['2024-01-05', 'Realized P&L'] == 200
+    assert rolling.loc['2024-01-05', 'Win Rate'] == 0.5
+    assert rolling.loc['2024-01-05', 'Volatility'] == pytest.approx(pd.Series([0.3, -0.1]).std())
+    aapl = result.rolling_symbols.set_index('Date')
+    assert aapl.loc['2024-01-05', 'Win Rate'] == 0.5
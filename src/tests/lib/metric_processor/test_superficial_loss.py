@@ -0,0 +1,157 @@
+import pandas as pd
+from datetime import datetime
+
+from lib.metric_processor.capital_gain import CapitalGainProcessor
+from lib.metric_processor.superficial_loss import SuperficialLossProcessor
+
+from lib.model.enum.account_category import AccountCategory
+
+holdings_data = {
+    'Symbol': ['TSLA'],
+    'Quantity': [10],
+    'AverageCost': [100],
+    'Account Category': [AccountCategory.MARGIN]
+}
+holdings_df = pd.DataFrame(holdings_data)
+holdings_date = datetime(2022, 1, 1)
+
+
+def _realize(data, start_date=datetime(2024, 1, 1), end_date=datetime(2024, 12, 31),
+             account_category=AccountCategory.MARGIN):
+    df = pd.DataFrame(data)
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+    df['Activity Type'] = 'Trades'
+
+    realized = CapitalGainProcessor(holdings_df, holdings_date).process(
+        df=df, start_date=start_date, end_date=end_date, account_category=account_category)
+    processor = SuperficialLossProcessor()
+    return realized, processor.process(df=df, start_date=start_date, end_date=end_date,
+                                       account_category=account_category,
+                                       daily_realized_symbols=realized.daily_realized_symbols)
+
+
+def _process(data, start_date=datetime(2024, 1, 1), end_date=datetime(2024, 12, 31)):
+    return _realize(data, start_date, end_date)[1]
+
+
+def test_loss_with_repurchase_within_30_days_should_be_denied():
+    result = _process({
+        'Date': ['2024-01-01', '2024-02-01', '2024-02-20'],
+        'Symbol': ['AAPL', 'AAPL', 'AAPL'],
+        'Quantity': [10, -10, 10],
+        'Price': [100, 80, 85],
+        'Commission': [0, 0, 0],
+        'Action': ['Buy', 'Sell', 'Buy']
+    })
+
+    assert result.total_denied_loss == 200  # (80 - 100) * 10, fully replaced
+    row = result.superficial_losses.iloc[0]
+    assert row['Symbol'] == 'AAPL'
+    assert row['Replacement Quantity'] == 10
+    assert row['Allowed Loss'] == 0
+    assert result.acb_adjustments.set_index('Symbol').loc['AAPL', 'ACB Adjustment'] == 200
+
+
+def test_loss_without_repurchase_should_be_allowed():
+    result = _process({
+        'Date': ['2024-01-01', '2024-02-01', '2024-03-20'],
+        'Symbol': ['AAPL', 'AAPL', 'AAPL'],
+        'Quantity': [10, -10, 10],
+        'Price': [100, 80, 85],
+        'Commission': [0, 0, 0],
+        'Action': ['Buy', 'Sell', 'Buy']
+    })
+
+    assert result.total_denied_loss == 0
+    assert result.superficial_losses.empty
+    assert result.acb_adjustments.empty
+
+
+def test_partial_repurchase_should_deny_proportional_loss():
+    # baseline holds 10 TSLA @ 100; selling them at a loss then re-buying 4 within the window
+    result = _process({
+        'Date': ['2024-03-01', '2024-03-15'],
+        'Symbol': ['TSLA', 'TSLA'],
+        'Quantity': [-10, 4],
+        'Price': [90, 95],
+        'Commission': [0, 0],
+        'Action': ['Sell', 'Buy']
+    })
+
+    assert result.total_denied_loss == 40  # 100 loss * min(10, 4, 4) / 10
+    assert result.superficial_losses.iloc[0]['Allowed Loss'] == -60
+
+
+def test_shares_sold_before_window_end_should_not_count_as_replacement():
+    result = _process({
+        'Date': ['2024-01-01', '2024-02-01', '2024-02-05', '2024-02-10'],
+        'Symbol': ['AAPL', 'AAPL', 'AAPL', 'AAPL'],
+        'Quantity': [10, -10, 10, -10],
+        'Price': [100, 80, 85, 90],
+        'Commission': [0, 0, 0, 0],
+        'Action': ['Buy', 'Sell', 'Buy', 'Sell']
+    })
+
+    assert result.total_denied_loss == 0
+
+
+def test_denied_loss_should_be_added_to_acb_of_replacement_shares():
+    realized, result = _realize({
+        'Date': ['2024-01-01', '2024-02-01', '2024-02-20', '2024-06-03'],
+        'Symbol': ['AAPL', 'AAPL', 'AAPL', 'AAPL'],
+        'Quantity': [10, -10, 10, -10],
+        'Price': [100, 80, 85, 90],
+        'Commission': [0, 0, 0, 0],
+        'Action': ['Buy', 'Sell', 'Buy', 'Sell']
+    })
+
+    assert result.total_denied_loss == 200
+    # the denied loss is not realized, and the replacement shares cost (85 * 10 + 200) / 10 = 105
+    assert realized.daily_realized_symbols['Realized'].tolist() == [0.0, -150.0]
+    assert realized.total_realized == -150
+
+
+def test_overlapping_losses_should_not_share_replacement_shares():
+    result = _process({
+        'Date': ['2024-01-01', '2024-02-01', '2024-02-10', '2024-02-15'],
+        'Symbol': ['AAPL', 'AAPL', 'AAPL', 'AAPL'],
+        'Quantity': [20, -10, -10, 10],
+        'Price': [100, 80, 80, 85],
+        'Commission': [0, 0, 0, 0],
+        'Action': ['Buy', 'Sell', 'Sell', 'Buy']
+    })
+
+    assert result.total_denied_loss == 200  # only the first loss is replaced by the 10 shares bought back
+    assert result.superficial_losses['Replacement Quantity'].tolist() == [10]
+    assert result.acb_adjustments.set_index('Symbol').loc['AAPL', 'Replacement Quantity'] == 10
+
+
+def test_same_day_sells_should_keep_their_own_quantity():
+    result = _process({
+        'Date': ['2024-01-01', '2024-02-01', '2024-02-01', '2024-02-15'],
+        'Symbol': ['AAPL', 'AAPL', 'AAPL', 'AAPL'],
+        'Quantity': [20, -5, -10, 5],
+        'Price': [100, 80, 80, 85],
+        'Commission': [0, 0, 0, 0],
+        'Action': ['Buy', 'Sell', 'Sell', 'Buy']
+    })
+
+    row = result.superficial_losses.iloc[0]
+    assert (row['Sold Quantity'], row['Replacement Quantity'], row['Denied Loss']) == (5, 5, 100)
+    assert len(result.superficial_losses) == 1
+
+
+def test_registered_account_losses_should_not_be_denied():
+    realized, result = _realize({
+        'Date': ['2024-01-01', '2024-02-01', '2024-02-10'],
+        'Symbol': ['AAPL', 'AAPL', 'AAPL'],
+        'Quantity': [10, -10, 10],
+        'Price': [100, 80, 85],
+        'Commission': [0, 0, 0],
+        'Action': ['Buy', 'Sell', 'Buy']
+    }, account_category=AccountCategory.TFSA_RRSP)
+
+    assert realized.total_realized == -200
+    assert (realized.daily_realized_symbols['Denied Loss'] == 0).all()
+    assert result.total_denied_loss == 0
+    assert result.superficial_losses.empty
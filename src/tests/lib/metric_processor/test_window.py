@@ -0,0 +1,85 @@
+import pandas as pd
+from datetime import datetime
+
+import pytest
+
+from lib.metric_processor.processor import process_metrics
+from lib.metric_processor.window import (MetricWindow, calendar_windows, process_metrics_windows,
+                                         trailing_twelve_months, year_to_date)
+from lib.model.enum.account_category import AccountCategory
+
+holdings_df = pd.DataFrame({
+    'Symbol': ['TSLA'],
+    'Quantity': [10],
+    'AverageCost': [100],
+    'Account Category': [AccountCategory.MARGIN]
+})
+holdings_date = datetime(2023, 12, 31)
+
+
+@pytest.fixture
+def txn_df():
+    df = pd.DataFrame({
+        'Date': ['2024-01-05', '2024-01-20', '2024-02-03', '2024-02-10', '2024-04-01', '2024-05-15', '2024-06-01'],
+        'Activity Type': ['Trades', 'Trades', 'Dividends', 'Trades', 'Trades', 'Dividends', 'Trades'],
+        'Symbol': ['AAPL', 'AAPL', 'AAPL', 'TSLA', 'AAPL', 'TSLA', 'TSLA'],
+        'Quantity': [10, -5, 0, -4, 5, 0, -6],
+        'Price': [100, 120, 0, 90, 110, 0, 130],
+        'Commission': [-5, -5, 0, -5, -5, 0, -5],
+        'Net Amount': [0, 0, 3.5, 0, 0, 12.25, 0],
+        'Action': ['Buy', 'Sell', 'DIV', 'Sell', 'Buy', 'DIV', 'Sell'],
+        'Account Category': [AccountCategory.MARGIN, AccountCategory.MARGIN, AccountCategory.MARGIN,
+                             AccountCategory.MARGIN, AccountCategory.TFSA_RRSP, AccountCategory.MARGIN,
+                             AccountCategory.MARGIN],
+    })
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+    return df
+
+
+def test_calendar_windows_should_be_clipped_to_range():
+    windows = calendar_windows(datetime(2024, 1, 15), datetime(2024, 7, 10), 'Q')
+
+    assert [window.label for window in windows] == ['2024Q1', '2024Q2', '2024Q3']
+    assert windows[0].start == pd.Timestamp('2024-01-15')
+    assert windows[-1].end == pd.Timestamp('2024-07-10')
+
+
+def test_trailing_windows():
+    assert year_to_date(datetime(2024, 6, 30)) == MetricWindow('YTD', pd.Timestamp('2024-01-01'),
+                                                               pd.Timestamp('2024-06-30'))
+    assert trailing_twelve_months(datetime(2024, 6, 30)) == MetricWindow('TTM', pd.Timestamp('2023-07-01'),
+                                                                         pd.Timestamp('2024-06-30'))
+
+
+def test_cube_should_match_separate_process_metrics_calls(txn_df):
+    windows = calendar_windows(datetime(2024, 1, 1), datetime(2024, 6, 30), 'M') + [
+        MetricWindow('H1', pd.Timestamp('2024-01-01'), pd.Timestamp('2024-06-30'))]
+
+    cube = process_metrics_windows(txn_df, holdings_df, holdings_date, windows=windows)
+
+    for window in windows:
+        expected = process_metrics(txn_df, holdings_df, holdings_date, window.start, window.end)
+        for account_category in AccountCategory:
+            summary = expected[account_category].summary
+            for metric in ['total_realized', 'total_dividends', 'total_denied_loss']:
+                assert cube[(window.label, account_category, metric)] == pytest.approx(summary[metric])
+
+    assert cube[('H1', AccountCategory.MARGIN, 'realized_loss')] == pytest.approx(45)  # (90 - 100) * 4 + 5
+    assert cube[('H1', AccountCategory.MARGIN, 'realized_gain')] == pytest.approx(
+        (120 - 100.5) * 5 - 5 + (130 - 100) * 6 - 5)
+
+
+def test_cube_should_reject_window_before_holdings_date(txn_df):
+    with pytest.raises(ValueError):
+        process_metrics_windows(txn_df, holdings_df, holdings_date,
+                                windows=[MetricWindow('2023', pd.Timestamp('2023-01-01'), pd.Timestamp('2023-12-31'))])
+
+
+def test_freq_windows_should_start_after_holdings_date(txn_df):
+    # a ledger export reaching back before the baseline holdings
+    earlier = txn_df.iloc[[0]].assign(Date=pd.Timestamp('2023-11-15'))
+    txn_df = pd.concat([earlier, txn_df], ignore_index=True)
+
+    cube = process_metrics_windows(txn_df, holdings_df, holdings_date, freq='Q')
+
+    assert cube.index.get_level_values('Window').unique().tolist() == ['2024Q1', '2024Q2']
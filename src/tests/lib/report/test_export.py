@@ -0,0 +1,59 @@
+import json
+import os
+
+import pytest
+
+from lib.batch.manifest import load_manifest
+from lib.metric_processor.window import calendar_windows
+from lib.report.export import ASSETS_DIR, FIGURE_CACHE_DIR, export_reports, report_tasks
+
+CSV_HEADER = ('Transaction Date,Settlement Date,Action,Symbol,Description,Quantity,Price,Gross Amount,Commission,'
+              'Net Amount,Currency,Account #,Activity Type,Account Type\n')
+STATEMENT_HEADER = 'Symbol,Description,Quantity,AverageCost\n'
+
+
+@pytest.fixture
+def manifest_filepath(tmp_path):
+    statements = tmp_path / 'statements'
+    statements.mkdir()
+    (statements / 'tfsa-20231231.csv').write_text(STATEMENT_HEADER + 'AAPL,APPLE INC,10,100\n')
+    (tmp_path / 'a.csv').write_text(CSV_HEADER +
+        '2024-02-01 12:00:00 AM,2024-02-01 12:00:00 AM,Sell,AAPL,APPLE INC,-5,150,750,-5,745,USD,1,Trades,Individual TFSA\n')
+
+    manifest = [
+        {'portfolio_id': 'a', 'transaction_files': ['a.csv'], 'statements_filepath': 'statements',
+         'baseline_date': '2023-12-31'},
+        {'portfolio_id': 'broken', 'transaction_files': ['missing.csv'], 'statements_filepath': 'statements',
+         'baseline_date': '2023-12-31'},
+    ]
+    path = tmp_path / 'manifest.json'
+    path.write_text(json.dumps(manifest))
+    return str(path)
+
+
+def test_report_tasks_should_cover_every_portfolio_and_period(manifest_filepath):
+    tasks = report_tasks(load_manifest(manifest_filepath), calendar_windows('2024-01-01', '2024-06-30', 'Q'))
+
+    assert [(task.portfolio.portfolio_id, task.period) for task in tasks] == [
+        ('a', '2024Q1'), ('a', '2024Q2'), ('broken', '2024Q1'), ('broken', '2024Q2')]
+    assert (tasks[1].portfolio.start_date, tasks[1].portfolio.end_date) == ('2024-04-01', '2024-06-30')
+
+
+def test_export_reports_should_write_pages_sharing_assets_and_cached_figures(manifest_filepath, tmp_path):
+    output_dir = tmp_path / 'reports'
+    tasks = report_tasks(load_manifest(manifest_filepath), calendar_windows('2024-01-01', '2024-06-30', 'Q'))
+
+    report = export_reports(tasks, str(output_dir), max_workers=2)
+
+    assert report.succeeded == 2
+    assert sorted(report.failed) == ['broken/2024Q1', 'broken/2024Q2']
+    assert sorted(os.listdir(output_dir / ASSETS_DIR)) == ['plotly.min.js', 'report-template.js', 'report.css']
+    page = (output_dir / 'a' / '2024Q1.html').read_text()
+    assert f'../{ASSETS_DIR}/plotly.min.js' in page
+    assert '"template":{}' in page  # the shared template is not embedded
+    assert '2024-02: gain $245.00' in page  # (150 - 100) * 5 - 5
+    assert (output_dir / 'a' / '2024Q2.html').exists()
+
+    cached = set(os.listdir(output_dir / FIGURE_CACHE_DIR))
+    export_reports(tasks[:2], str(output_dir), max_workers=1)
+    assert set(os.listdir(output_dir / FIGURE_CACHE_DIR)) == cached
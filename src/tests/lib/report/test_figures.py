@@ -0,0 +1,49 @@
+import pandas as pd
+
+from lib.report.figures import daily_details, monthly_realized, monthly_realized_figure, symbol_realized
+
+DAILY_REALIZED = pd.DataFrame({
+    'Date': pd.to_datetime(['2024-01-02', '2024-01-03', '2024-02-01']),
+    'Realized Gain': [10.0, 5.0, 0.0],
+    'Realized Loss': [0.0, 2.0, 3.0],
+})
+DAILY_REALIZED_SYMBOLS = pd.DataFrame({
+    'Date': pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-03', '2024-02-01']),
+    'Symbol': ['AAPL', 'AAPL', 'MSFT', 'MSFT'],
+    'Realized': [10.0, 5.0, -2.0, -3.0],
+})
+
+
+def test_monthly_realized_should_sum_per_month_without_modifying_input():
+    daily_realized = DAILY_REALIZED.copy()
+
+    monthly = monthly_realized(daily_realized)
+
+    assert monthly['Month'].tolist() == [pd.Timestamp('2024-01-01'), pd.Timestamp('2024-02-01')]
+    assert monthly['Realized Gain'].tolist() == [15.0, 0.0]
+    assert monthly['Realized Loss'].tolist() == [2.0, 3.0]
+    pd.testing.assert_frame_equal(daily_realized, DAILY_REALIZED)
+
+
+def test_monthly_realized_figure_should_group_gains_and_losses():
+    fig = monthly_realized_figure(DAILY_REALIZED)
+
+    assert [trace.name for trace in fig.data] == ['Realized Gain', 'Realized Loss']
+    assert fig.layout.barmode == 'group'
+
+
+def test_daily_details_should_select_the_trades_of_a_bar():
+    gains = daily_details(DAILY_REALIZED_SYMBOLS, '2024-01-01', is_gain=True)
+    losses = daily_details(DAILY_REALIZED_SYMBOLS, '2024-01-01', is_gain=False)
+
+    assert gains['Realized'].tolist() == [10.0, 5.0]
+    assert losses['Symbol'].tolist() == ['MSFT']
+
+
+def test_symbol_realized_should_total_each_symbol():
+    per_symbol = symbol_realized(DAILY_REALIZED_SYMBOLS)
+
+    assert per_symbol['Symbol'].tolist() == ['AAPL', 'MSFT']
+    assert per_symbol['Realized Gain'].tolist() == [15.0, 0.0]
+    assert per_symbol['Realized Loss'].tolist() == [0.0, 5.0]
+    assert per_symbol['Trades'].tolist() == [2, 2]
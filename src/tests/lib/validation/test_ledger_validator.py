@@ -0,0 +1,103 @@
+import pandas as pd
+from datetime import datetime
+
+from lib.model.enum.account_category import AccountCategory
+from lib.model.enum.anomaly import Anomaly
+from lib.validation.ledger_validator import validate_ledger
+
+holdings_df = pd.DataFrame({
+    'Symbol': ['TSLA'],
+    'Quantity': [10],
+    'AverageCost': [100],
+    'Account Category': [AccountCategory.TFSA_RRSP]
+})
+holdings_date = datetime(2023, 12, 31)
+
+
+def _ledger(data):
+    df = pd.DataFrame(data)
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+    df['Activity Type'] = df.get('Activity Type', 'Trades')
+    df['Account Category'] = AccountCategory.TFSA_RRSP
+    return df
+
+
+def _anomalies(report, anomaly):
+    return report.anomalies.loc[report.anomalies['Anomaly'] == anomaly, 'Row'].tolist()
+
+
+def test_orphan_sells_should_not_consume_positions():
+    report = validate_ledger(_ledger({
+        'Date': ['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04'],
+        'Symbol': ['AAPL', 'ZIM', 'AAPL', 'TSLA'],
+        'Quantity': [-5, -5, 5, -10],
+        'Action': ['Sell', 'Sell', 'Buy', 'Sell'],
+    }), holdings_df, holdings_date)
+
+    assert _anomalies(report, Anomaly.ORPHAN_SELL) == [0, 1]
+    assert _anomalies(report, Anomaly.OVERSELL) == []
+    assert report.invalid_trade_index.tolist() == [0, 1]
+
+
+def test_rejected_oversell_should_not_reduce_position():
+    # holding 10: selling 15 is rejected, so the following sells of 5 and 5 are valid, the last 1 is not
+    report = validate_ledger(_ledger({
+        'Date': ['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04', '2024-01-05', '2024-01-06'],
+        'Symbol': ['TSLA', 'TSLA', 'TSLA', 'TSLA', 'AAPL', 'AAPL'],
+        'Quantity': [-15, -5, -5, -1, 2, -3],
+        'Action': ['Sell', 'Sell', 'Sell', 'Sell', 'Buy', 'Sell'],
+    }), holdings_df, holdings_date)
+
+    assert _anomalies(report, Anomaly.OVERSELL) == [0, 3, 5]
+
+
+def test_oversells_should_be_rejected_per_symbol_in_ledger_order():
+    # TSLA goes negative twice around a buy, AAPL is interleaved and only oversold at the end
+    report = validate_ledger(_ledger({
+        'Date': ['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04', '2024-01-05', '2024-01-06', '2024-01-07',
+                 '2024-01-08'],
+        'Symbol': ['TSLA', 'AAPL', 'TSLA', 'TSLA', 'AAPL', 'TSLA', 'TSLA', 'AAPL'],
+        'Quantity': [-8, 4, -3, 5, -4, -4, -1, -1],
+        'Action': ['Sell', 'Buy', 'Sell', 'Buy', 'Sell', 'Sell', 'Sell', 'Sell'],
+    }), holdings_df, holdings_date)
+
+    assert _anomalies(report, Anomaly.OVERSELL) == [2, 7]
+
+
+def test_trades_on_holdings_date_should_be_checked_from_start_date():
+    ledger = _ledger({
+        'Date': ['2023-12-31', '2024-01-02'],
+        'Symbol': ['ZIM', 'TSLA'],
+        'Quantity': [-5, -10],
+        'Action': ['Sell', 'Sell'],
+    })
+
+    assert validate_ledger(ledger, holdings_df, holdings_date).anomalies.empty
+    report = validate_ledger(ledger, holdings_df, holdings_date, start_date=holdings_date)
+    assert _anomalies(report, Anomaly.ORPHAN_SELL) == [0]
+
+
+def test_trades_before_holdings_date_should_be_ignored():
+    report = validate_ledger(_ledger({
+        'Date': ['2023-06-01', '2024-01-02'],
+        'Symbol': ['TSLA', 'TSLA'],
+        'Quantity': [-100, -10],
+        'Action': ['Sell', 'Sell'],
+    }), holdings_df, holdings_date)
+
+    assert report.anomalies.empty
+
+
+def test_duplicates_dates_and_actions():
+    report = validate_ledger(_ledger({
+        'Date': ['2024-01-02', '2024-01-02', '2024-01-01', '2024-01-03'],
+        'Symbol': ['TSLA', 'TSLA', 'TSLA', 'TSLA'],
+        'Quantity': [1, 1, 1, 1],
+        'Action': ['Buy', 'Buy', 'Buy', 'Split'],
+    }), holdings_df, holdings_date)
+
+    assert _anomalies(report, Anomaly.DUPLICATE) == [1]
+    assert _anomalies(report, Anomaly.NON_MONOTONIC_DATE) == [2]
+    assert _anomalies(report, Anomaly.UNKNOWN_ACTION) == [3]
+    assert report.invalid_trade_index.tolist() == [3]
+    assert report.counts()[Anomaly.DUPLICATE] == 1
@@ -0,0 +1,103 @@
+import logging
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from lib.model.enum.account_category import AccountCategory
+from lib.validation import position_reconciliation
+from lib.validation.position_reconciliation import reconcile_positions
+
+holdings_df = pd.DataFrame({
+    'Symbol': ['TSLA', 'JPM', 'JPM'],
+    'Quantity': [10, 4, 6],
+    'AverageCost': [100.0, 150.0, 160.0],
+    'Account Category': [AccountCategory.TFSA_RRSP] * 3,  # JPM is held in both the TFSA and the RRSP
+})
+holdings_date = datetime(2023, 12, 31)
+
+
+def _ledger(data):
+    df = pd.DataFrame(data)
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+    df['Activity Type'] = 'Trades'
+    df['Commission'] = 0.0
+    df['Account Category'] = AccountCategory.TFSA_RRSP
+    return df
+
+
+def _statement(date, symbols, quantities, average_costs):
+    return pd.DataFrame({'Statement Date': pd.Timestamp(date), 'Symbol': symbols, 'Quantity': quantities,
+                         'AverageCost': average_costs, 'Account Category': AccountCategory.TFSA_RRSP})
+
+
+txn_df = _ledger({
+    'Date': ['2024-01-10', '2024-01-20', '2024-02-05', '2024-02-10', '2024-02-20', '2024-03-05'],
+    'Symbol': ['TSLA', 'AAPL', 'TSLA', 'AAPL', 'AAPL', 'AAPL'],
+    'Quantity': [10, 5, -20, -5, 4, 50],
+    'Price': [200.0, 180.0, 210.0, 190.0, 170.0, 175.0],
+    'Action': ['Buy', 'Buy', 'Sell', 'Sell', 'Buy', 'Sell'],
+})
+
+
+def test_positions_should_reconcile_at_every_statement_date():
+    statements = pd.concat([
+        _statement('2024-01-31', ['TSLA', 'JPM', 'AAPL'], [20, 10, 5], [150.0, 156.0, 180.0]),
+        _statement('2024-02-29', ['JPM', 'AAPL'], [10, 4], [156.0, 170.0]),
+    ])
+
+    report = reconcile_positions(txn_df, holdings_df, holdings_date, statements)
+
+    # the AAPL oversell of 2024-03-05 is after the last statement, TSLA is closed by 2024-02-29
+    assert report.drift.empty
+    assert report.positions[['Statement Date', 'Symbol', 'Computed Quantity']].values.tolist() == [
+        [pd.Timestamp('2024-01-31'), 'AAPL', 5.0], [pd.Timestamp('2024-01-31'), 'JPM', 10.0],
+        [pd.Timestamp('2024-01-31'), 'TSLA', 20.0],
+        [pd.Timestamp('2024-02-29'), 'AAPL', 4.0], [pd.Timestamp('2024-02-29'), 'JPM', 10.0],
+    ]
+
+
+def test_drift_should_be_reported():
+    statements = pd.concat([
+        _statement('2024-01-31', ['TSLA', 'JPM'], [20, 10], [150.0, 150.0]),  # AAPL missing, JPM cost differs
+        _statement('2024-02-29', ['JPM', 'AAPL', 'TSLA'], [10, 4, 1], [156.0, 170.0, 150.0]),
+    ])
+
+    report = reconcile_positions(txn_df, holdings_df, holdings_date, statements)
+
+    drift = report.drift.set_index(['Statement Date', 'Symbol'])
+    assert drift.index.tolist() == [(pd.Timestamp('2024-01-31'), 'AAPL'), (pd.Timestamp('2024-01-31'), 'JPM'),
+                                    (pd.Timestamp('2024-02-29'), 'TSLA')]
+    assert drift.loc[(pd.Timestamp('2024-01-31'), 'AAPL'), 'Quantity Drift'] == 5
+    assert drift.loc[(pd.Timestamp('2024-01-31'), 'JPM'), 'Average Cost Drift'] == pytest.approx(6)
+    assert drift.loc[(pd.Timestamp('2024-02-29'), 'TSLA'), 'Quantity Drift'] == -1
+
+
+@pytest.mark.parametrize('max_log_scale', [600.0, -1.0])  # -1 forces the sequential fallback
+def test_average_cost_should_follow_partial_sells_and_rebuys(monkeypatch, max_log_scale):
+    monkeypatch.setattr(position_reconciliation, '_MAX_LOG_SCALE', max_log_scale)
+    ledger = _ledger({
+        'Date': ['2024-01-02', '2024-01-03', '2024-01-04', '2024-01-05', '2024-01-06', '2024-01-07'],
+        'Symbol': ['AAPL'] * 6,
+        'Quantity': [10, -8, 6, -8, 3, 1],
+        'Price': [100.0, 150.0, 110.0, 120.0, 130.0, 90.0],
+        'Action': ['Buy', 'Sell', 'Buy', 'Sell', 'Buy', 'Buy'],
+    })
+    statements = _statement('2024-01-31', ['AAPL'], [4], [0.0])
+
+    report = reconcile_positions(ledger, holdings_df, holdings_date, statements)
+
+    # 10 @ 100, sell 8, 2 @ 100 + 6 @ 110 = 107.5, sell 8 (closed), 3 @ 130 + 1 @ 90 = 120
+    aapl = report.positions.set_index('Symbol').loc['AAPL']
+    assert aapl['Computed Quantity'] == 4
+    assert aapl['Computed Average Cost'] == pytest.approx(120)
+
+
+def test_no_later_statement_should_report_nothing():
+    statements = _statement('2023-12-31', ['TSLA'], [10], [100.0])
+
+    report = reconcile_positions(txn_df, holdings_df, holdings_date, statements)
+    report.log_summary(logging.getLogger(__name__))
+
+    assert report.positions.empty
+    assert report.drift.empty
@@ -0,0 +1,140 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_ledger import synthetic_holdings, write_questrade_export
+from lib.model.enum.account_category import AccountCategory
+from lib.watch.live_ledger import LiveLedger
+
+baseline_date = datetime(2023, 12, 31)
+
+
+def _ledger(account_category, dates, quantities, prices):
+    return pd.DataFrame({
+        'Date': pd.to_datetime(dates),
+        'Action': ['Buy' if quantity > 0 else 'Sell' for quantity in quantities],
+        'Symbol': 'AAPL',
+        'Description': 'APPLE INC',
+        'Quantity': quantities,
+        'Price': prices,
+        'Commission': 0.0,
+        'Net Amount': 0.0,
+        'Currency': 'USD',
+        'Activity Type': 'Trades',
+        'Account Category': account_category,
+    })
+
+
+def _write_statements(directory):
+    holdings = synthetic_holdings()
+    for account_name, account_category in [('margin', AccountCategory.MARGIN), ('tfsa', AccountCategory.TFSA_RRSP)]:
+        holdings[holdings['Account Category'] == account_category].drop(columns='Account Category').to_csv(
+            directory / f'{account_name}-20231231.csv', index=False)
+
+
+def test_apply_changes_should_recompute_only_the_affected_account_category(tmp_path):
+    activity_dir, statements_dir = tmp_path / 'activity', tmp_path / 'statements'
+    activity_dir.mkdir()
+    statements_dir.mkdir()
+    _write_statements(statements_dir)
+    write_questrade_export(_ledger(AccountCategory.MARGIN, ['2024-01-02', '2024-01-05'], [10, -10], [100, 110]),
+                           activity_dir / 'margin.csv')
+    write_questrade_export(_ledger(AccountCategory.TFSA_RRSP, ['2024-01-03', '2024-01-04'], [5, -5], [100, 90]),
+                           activity_dir / 'tfsa.csv')
+
+    live_ledger = LiveLedger(str(activity_dir), str(statements_dir), baseline_date, '2024-01-01', '2024-12-31')
+    tfsa_result = live_ledger.results[AccountCategory.TFSA_RRSP]
+    assert live_ledger.version == 1
+    assert live_ledger.results[AccountCategory.MARGIN].summary['total_realized'] == 100
+
+    write_questrade_export(_ledger(AccountCategory.MARGIN, ['2024-02-01', '2024-02-02'], [10, -10], [100, 120]),
+                           activity_dir / 'margin-february.csv')
+    affected = live_ledger.apply_changes([str(activity_dir / 'margin-february.csv')])
+
+    assert affected == {AccountCategory.MARGIN}
+    assert live_ledger.version == 2
+    assert live_ledger.results[AccountCategory.MARGIN].summary['total_realized'] == 300
+    assert live_ledger.results[AccountCategory.TFSA_RRSP] is tfsa_result
+
+
+def test_apply_changes_should_ignore_rows_outside_of_the_date_range(tmp_path):
+    activity_dir, statements_dir = tmp_path / 'activity', tmp_path / 'statements'
+    activity_dir.mkdir()
+    statements_dir.mkdir()
+    _write_statements(statements_dir)
+    write_questrade_export(_ledger(AccountCategory.MARGIN, ['2024-01-02', '2024-01-05'], [10, -10], [100, 110]),
+                           activity_dir / 'margin.csv')
+    live_ledger = LiveLedger(str(activity_dir), str(statements_dir), baseline_date, '2024-01-01', '2024-06-30')
+
+    write_questrade_export(_ledger(AccountCategory.TFSA_RRSP, ['2024-08-01'], [5], [100]), activity_dir / 'tfsa.csv')
+    (activity_dir / 'margin.csv').unlink()
+    affected = live_ledger.apply_changes([str(activity_dir / 'tfsa.csv'), str(activity_dir / 'margin.csv')])
+
+    assert affected == {AccountCategory.MARGIN}
+    assert live_ledger.results[AccountCategory.MARGIN].summary['total_realized'] == 0
+
+
+def test_results_for_another_date_range_should_not_change_the_watched_range(tmp_path):
+    activity_dir, statements_dir = tmp_path / 'activity', tmp_path / 'statements'
+    activity_dir.mkdir()
+    statements_dir.mkdir()
+    _write_statements(statements_dir)
+    write_questrade_export(_ledger(AccountCategory.MARGIN, ['2024-01-02', '2024-01-05', '2024-03-01'],
+                                   [10, -5, -5], [100, 110, 120]), activity_dir / 'margin.csv')
+    live_ledger = LiveLedger(str(activity_dir), str(statements_dir), baseline_date, '2024-01-01', '2024-12-31')
+
+    january = live_ledger.results_for('2024-01-01', '2024-01-31')
+
+    assert january[AccountCategory.MARGIN].summary['total_realized'] == 50
+    assert live_ledger.results_for('2024-01-01', '2024-01-31') is january
+    assert (live_ledger.start_date, live_ledger.end_date) == ('2024-01-01', '2024-12-31')
+    assert live_ledger.results[AccountCategory.MARGIN].summary['total_realized'] == 150
+    assert live_ledger.version == 1
+
+    write_questrade_export(_ledger(AccountCategory.MARGIN, ['2024-01-10'], [-1], [150]), activity_dir / 'late.csv')
+    live_ledger.apply_changes([str(activity_dir / 'late.csv')])
+    assert live_ledger.results_for('2024-01-01', '2024-01-31')[AccountCategory.MARGIN].summary[
+               'total_realized'] == 100
+
+
+def test_results_for_the_resolved_watched_range_should_be_the_watched_results(tmp_path):
+    activity_dir, statements_dir = tmp_path / 'activity', tmp_path / 'statements'
+    activity_dir.mkdir()
+    statements_dir.mkdir()
+    _write_statements(statements_dir)
+    write_questrade_export(_ledger(AccountCategory.MARGIN, ['2024-01-02', '2024-01-05'], [10, -10], [100, 110]),
+                           activity_dir / 'margin.csv')
+    live_ledger = LiveLedger(str(activity_dir), str(statements_dir), baseline_date)
+
+    assert live_ledger.watched_range() == ('2024-01-02', '2024-01-05')
+    assert live_ledger.results_for(*live_ledger.watched_range()) is live_ledger.results
+
+
+def test_results_for_another_date_range_should_recompute_only_the_affected_account_category(tmp_path):
+    activity_dir, statements_dir = tmp_path / 'activity', tmp_path / 'statements'
+    activity_dir.mkdir()
+    statements_dir.mkdir()
+    _write_statements(statements_dir)
+    write_questrade_export(_ledger(AccountCategory.MARGIN, ['2024-01-02', '2024-01-05'], [10, -10], [100, 110]),
+                           activity_dir / 'margin.csv')
+    write_questrade_export(_ledger(AccountCategory.TFSA_RRSP, ['2024-01-03', '2024-01-04'], [5, -5], [100, 90]),
+                           activity_dir / 'tfsa.csv')
+    live_ledger = LiveLedger(str(activity_dir), str(statements_dir), baseline_date, '2024-01-01', '2024-06-30')
+    january = live_ledger.results_for('2024-01-01', '2024-01-31')
+
+    write_questrade_export(_ledger(AccountCategory.MARGIN, ['2024-01-10', '2024-01-11'], [10, -10], [100, 120]),
+                           activity_dir / 'margin-january.csv')
+    live_ledger.apply_changes([str(activity_dir / 'margin-january.csv')])
+    updated = live_ledger.results_for('2024-01-01', '2024-01-31')
+
+    assert live_ledger.version == 2
+    assert updated[AccountCategory.MARGIN].summary['total_realized'] == 300
+    assert updated[AccountCategory.TFSA_RRSP] is january[AccountCategory.TFSA_RRSP]
+
+
+def test_statements_in_the_activity_directory_should_be_rejected(tmp_path):
+    _write_statements(tmp_path)
+
+    with pytest.raises(ValueError):
+        LiveLedger(str(tmp_path), str(tmp_path), baseline_date)
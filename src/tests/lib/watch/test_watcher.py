@@ -0,0 +1,49 @@
+import os
+import threading
+import time
+
+import pytest
+
+from lib.watch.watcher import InotifyWatcher, PollingWatcher
+
+
+def _create_watcher(watcher_class, directory):
+    if watcher_class is PollingWatcher:
+        return PollingWatcher([directory], debounce=0.1, poll_interval=0.05)
+    try:
+        return InotifyWatcher([directory], debounce=0.1)
+    except (AttributeError, OSError):
+        pytest.skip('inotify is unavailable')
+
+
+@pytest.mark.parametrize('watcher_class', [InotifyWatcher, PollingWatcher])
+def test_wait_for_changes_should_report_a_burst_of_writes_once(tmp_path, watcher_class):
+    watcher = _create_watcher(watcher_class, str(tmp_path))
+
+    def write_export():
+        time.sleep(0.05)
+        for _ in range(3):
+            with open(tmp_path / 'activity.csv', 'a') as f:
+                f.write('x' * 1000)
+            time.sleep(0.03)
+        (tmp_path / 'Margin-20240131.csv').write_text('Symbol')
+
+    writer = threading.Thread(target=write_export)
+    writer.start()
+    changes = watcher.wait_for_changes(timeout=2)
+    writer.join()
+
+    assert changes == {os.path.join(str(tmp_path), 'activity.csv'), os.path.join(str(tmp_path), 'Margin-20240131.csv')}
+    assert watcher.wait_for_changes(timeout=0.2) == set()
+    watcher.close()
+
+
+@pytest.mark.parametrize('watcher_class', [InotifyWatcher, PollingWatcher])
+def test_wait_for_changes_should_report_deleted_files(tmp_path, watcher_class):
+    (tmp_path / 'activity.csv').write_text('x')
+    watcher = _create_watcher(watcher_class, str(tmp_path))
+
+    os.remove(tmp_path / 'activity.csv')
+
+    assert watcher.wait_for_changes(timeout=2) == {os.path.join(str(tmp_path), 'activity.csv')}
+    watcher.close()